@@ -1,12 +1,104 @@
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 import app.models as models
 import app.schemas as schemas
 import app.image_store as image_store
+import app.events as events
+from app.db import mark_account_written
 from datetime import datetime, timedelta, timezone
+import math
+import os
+import re
 import secrets
+import uuid
 from app.security import get_password_hash, verify_password, PASSWORD_RESET_TOKEN_EXPIRE_MINUTES
 
 
+# Change log
+
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+
+
+def _record_changes(db: Session, account_id: str, entity_type: str, entity_ids, op: str = CHANGE_UPSERT) -> None:
+    """Append change log rows for entity_ids within the caller's transaction."""
+    _record_change_groups(db, account_id, [(entity_type, entity_ids, op)])
+
+
+def _record_change_groups(db: Session, account_id: str, groups) -> None:
+    """Append change log rows for several (entity_type, entity_ids, op) groups at once.
+
+    Bumping accounts.change_seq takes a row lock on the account, so sequence
+    numbers become visible to sync clients in commit order. All groups share
+    one sequence bump and one INSERT.
+    """
+    changes = []
+    for entity_type, entity_ids, op in groups:
+        changes += [(entity_type, entity_id, op) for entity_id in dict.fromkeys(entity_ids)]
+    if not changes:
+        return
+    mark_account_written(db, account_id)
+    stmt = (
+        update(models.Account)
+        .where(models.Account.id == account_id)
+        .values(change_seq=models.Account.change_seq + len(changes))
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        end = db.execute(stmt.returning(models.Account.change_seq)).scalar_one()
+    else:
+        db.execute(stmt)
+        end = db.query(models.Account.change_seq).filter(models.Account.id == account_id).scalar()
+    start = end - len(changes) + 1
+    now = datetime.utcnow()
+    db.execute(insert(models.ChangeLog), [
+        {
+            "account_id": account_id,
+            "seq": start + offset,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "op": op,
+            "changed_at": now,
+        }
+        for offset, (entity_type, entity_id, op) in enumerate(changes)
+    ])
+    events.queue_change(db, account_id, end, [
+        {"entity_type": entity_type, "id": entity_id, "op": op} for entity_type, entity_id, op in changes
+    ])
+
+
+def get_changes_since(db: Session, account_id: str, since: int) -> tuple[int, dict[str, dict[str, str]]] | None:
+    """Collapse change log rows after `since` to the latest op per entity.
+
+    Returns (version, {entity_type: {entity_id: op}}), or None when `since` is
+    ahead of the account's sequence and the client must do a full resync.
+    """
+    current = db.query(models.Account.change_seq).filter(models.Account.id == account_id).scalar()
+    if current is None or since > current:
+        return None
+    rows = (
+        db.query(models.ChangeLog.seq, models.ChangeLog.entity_type, models.ChangeLog.entity_id, models.ChangeLog.op)
+        .filter(models.ChangeLog.account_id == account_id, models.ChangeLog.seq > since)
+        .order_by(models.ChangeLog.seq)
+        .all()
+    )
+    changes: dict[str, dict[str, str]] = {}
+    version = since
+    for seq, entity_type, entity_id, op in rows:
+        changes.setdefault(entity_type, {})[entity_id] = op
+        version = seq
+    return version, changes
+
+
+def get_entities_by_ids(db: Session, model, ids, account_id: str) -> list:
+    ids = list(ids)
+    if not ids:
+        return []
+    return db.query(model).filter(model.id.in_(ids), model.account_id == account_id).all()
+
+
 # Accounts
 
 
@@ -43,26 +135,363 @@ def create_account(db: Session, account: schemas.AccountCreate) -> tuple[models.
     db.refresh(owner)
     return account_model, owner
 
+# Tree paths
+
+
+def _subtree_filter(path_col, path: str):
+    """Match `path` and all paths beneath it, expressed as an index range scan."""
+    return and_(path_col >= path, path_col < path[:-1] + chr(ord(path[-1]) + 1))
+
+
+def _update_subtree(db: Session, model, account_id: str, root_path: str, **values) -> list[str]:
+    """Apply `values` to root_path and everything beneath it in one UPDATE; returns the ids touched.
+
+    The ids come back through UPDATE ... RETURNING where the dialect supports
+    it, so callers don't need a separate _subtree_ids query.
+    """
+    stmt = (
+        update(model)
+        .where(model.account_id == account_id, _subtree_filter(model.path, root_path))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        return list(db.execute(stmt.returning(model.id)).scalars())
+    ids = _subtree_ids(db, model, account_id, root_path)
+    db.execute(stmt)
+    return ids
+
+
+def _rewrite_subtree_paths(db: Session, model, account_id: str, old_prefix: str, new_prefix: str, **values) -> list[str]:
+    """Re-root every path under old_prefix onto new_prefix (plus any `values`) in a single UPDATE."""
+    path = literal(new_prefix) + func.substr(model.path, len(old_prefix) + 1)
+    return _update_subtree(db, model, account_id, old_prefix, path=path, **values)
+
+
+def _subtree_ids(db: Session, model, account_id: str, path: str) -> list[str]:
+    return [
+        mid for (mid,) in db.query(model.id).filter(model.account_id == account_id, _subtree_filter(model.path, path))
+    ]
+
+
+# Soft deletes
+
+# How long a deleted tote, item or location can still be restored
+DELETE_RETENTION = timedelta(seconds=int(os.getenv("DELETE_RETENTION_SECONDS", str(7 * 24 * 3600))))
+# Lets a statement reach soft-deleted rows (see models._hide_soft_deleted)
+INCLUDE_DELETED = {"include_deleted": True}
+
+
+def _add_deletion(db: Session, account_id: str, entity_type: str, entity_id: str) -> models.Deletion:
+    deletion = models.Deletion(
+        account_id=account_id, entity_type=entity_type, entity_id=entity_id, deleted_at=datetime.utcnow(),
+    )
+    db.add(deletion)
+    db.flush()
+    return deletion
+
+
+def _set_deleted_by(db: Session, model, deletion_id: str | None, *where) -> list[str]:
+    """Hide the rows matching `where` (or unhide them, with None) in one UPDATE; returns their ids."""
+    stmt = (
+        update(model)
+        .where(*where)
+        .values(deleted_by=deletion_id)
+        .execution_options(synchronize_session=False, **INCLUDE_DELETED)
+    )
+    if db.get_bind().dialect.update_returning:
+        return list(db.execute(stmt.returning(model.id)).scalars())
+    ids = list(db.execute(select(model.id).where(*where).execution_options(**INCLUDE_DELETED)).scalars())
+    db.execute(stmt)
+    return ids
+
+
+def get_deletion(db: Session, account_id: str, entity_type: str, entity_id: str) -> models.Deletion | None:
+    """The entity's soft delete, if it is still within DELETE_RETENTION."""
+    D = models.Deletion
+    return (
+        db.query(D)
+        .filter(
+            D.account_id == account_id, D.entity_type == entity_type, D.entity_id == entity_id,
+            D.deleted_at > datetime.utcnow() - DELETE_RETENTION,
+        )
+        .order_by(D.deleted_at.desc())
+        .first()
+    )
+
+
+def restore_deletion(db: Session, deletion: models.Deletion):
+    """Undo a soft delete; returns the restored tote, item or location.
+
+    Everything the delete hid comes back (a tote with its items). What it
+    moved stays moved: nested totes and sub-locations keep their new
+    parent, and a location's totes their new location. If the entity's own
+    tote, parent or location has been deleted since, it returns without it.
+    """
+    account_id = deletion.account_id
+    groups = [
+        (entity_type, _set_deleted_by(db, model, None, model.deleted_by == deletion.id), CHANGE_UPSERT)
+        for entity_type, model in models.SOFT_DELETE_MODELS.items()
+    ]
+    db.execute(delete(models.Deletion).where(models.Deletion.id == deletion.id))
+    entity = db.get(models.SOFT_DELETE_MODELS[deletion.entity_type], deletion.entity_id, populate_existing=True)
+    if isinstance(entity, models.Tote):
+        parent = get_tote(db, entity.parent_tote_id, account_id) if entity.parent_tote_id else None
+        entity.parent_tote_id = parent.id if parent else None
+        entity.path = f"{parent.path if parent else '/'}{entity.id}/"
+        if parent:
+            entity.location_id = parent.location_id
+        elif entity.location_id and not get_location(db, entity.location_id, account_id):
+            entity.location_id = None
+    elif isinstance(entity, models.Location):
+        parent = get_location(db, entity.parent_id, account_id) if entity.parent_id else None
+        entity.parent_id = parent.id if parent else None
+        entity.path = f"{parent.path if parent else '/'}{entity.id}/"
+    elif entity.tote_id and not get_tote(db, entity.tote_id, account_id):
+        entity.tote_id = None
+    _record_change_groups(db, account_id, groups)
+    db.commit()
+    return entity
+
+
+def purge_deletion(db: Session, deletion: models.Deletion, batch_size: int = 1000) -> int:
+    """Hard-delete the rows a soft delete hid; returns how many were removed.
+
+    Items go first, batch_size per round with their index and checkout
+    rows, each round committed on its own (images are removed as it
+    commits). The tote or location goes last, once references other hidden
+    rows still hold to it are cleared. Running it again after an
+    interruption finishes the job.
+    """
+    account_id = deletion.account_id
+    Item = models.Item
+    removed = 0
+    while True:
+        batch = db.execute(
+            select(Item.id, Item.image_path)
+            .where(Item.account_id == account_id, Item.deleted_by == deletion.id)
+            .limit(batch_size)
+            .execution_options(**INCLUDE_DELETED)
+        ).all()
+        if not batch:
+            break
+        for _, image_path in batch:
+            image_store.discard_image(db, image_path)
+        _delete_items(db, account_id, [item_id for item_id, _ in batch])
+        db.commit()
+        removed += len(batch)
+
+    options = dict(synchronize_session=False, **INCLUDE_DELETED)
+    entity_id = deletion.entity_id
+    if deletion.entity_type == "tote":
+        Tote = models.Tote
+        db.execute(
+            update(Item).where(Item.account_id == account_id, Item.tote_id == entity_id)
+            .values(tote_id=None).execution_options(**options)
+        )
+        db.execute(
+            update(Tote).where(Tote.account_id == account_id, Tote.parent_tote_id == entity_id)
+            .values(parent_tote_id=None).execution_options(**options)
+        )
+        db.execute(delete(models.ToteAttribute).where(models.ToteAttribute.tote_id == entity_id))
+        removed += db.execute(delete(Tote).where(Tote.id == entity_id).execution_options(**options)).rowcount
+    elif deletion.entity_type == "location":
+        Tote, Location = models.Tote, models.Location
+        db.execute(
+            update(Tote).where(Tote.account_id == account_id, Tote.location_id == entity_id)
+            .values(location_id=None).execution_options(**options)
+        )
+        db.execute(
+            update(Location).where(Location.account_id == account_id, Location.parent_id == entity_id)
+            .values(parent_id=None).execution_options(**options)
+        )
+        removed += db.execute(delete(Location).where(Location.id == entity_id).execution_options(**options)).rowcount
+    db.execute(delete(models.Deletion).where(models.Deletion.id == deletion.id))
+    db.commit()
+    return removed
+
+
+def purge_deletions(
+    db: Session, older_than: datetime, batch_size: int = 1000, account_id: str | None = None
+) -> dict:
+    """Purge every soft delete made before older_than, oldest first; only account_id's if given.
+
+    Returns {"purged_deletions": n, "purged_rows": m}.
+    """
+    D = models.Deletion
+    report = {"purged_deletions": 0, "purged_rows": 0}
+    expired = [D.deleted_at < older_than]
+    if account_id is not None:
+        expired.append(D.account_id == account_id)
+    while True:
+        deletion = db.query(D).filter(*expired).order_by(D.deleted_at).first()
+        if deletion is None:
+            return report
+        report["purged_rows"] += purge_deletion(db, deletion, batch_size)
+        report["purged_deletions"] += 1
+
+
+# List filtering and sorting
+
+# Sortable fields per list endpoint; each is backed by an (account_id, field) index
+ITEM_SORT_FIELDS = {
+    "name": func.lower(models.Item.name),
+    "quantity": models.Item.quantity,
+}
+TOTE_SORT_FIELDS = {
+    "name": func.lower(models.Tote.name),
+}
+
+
+def _apply_sort(query, sort: str | None, fields: dict):
+    """Order by a whitelisted field; "-field" sorts descending. Raises ValueError."""
+    if not sort:
+        return query
+    descending = sort.startswith("-")
+    column = fields.get(sort.lstrip("-"))
+    if column is None:
+        raise ValueError(f"Cannot sort by {sort.lstrip('-')!r}; choose from {', '.join(sorted(fields))}")
+    return query.order_by(column.desc() if descending else column.asc())
+
+
+def _name_prefix_filter(name_col, prefix: str):
+    """Case-insensitive prefix match as a range on the lower(name) index.
+
+    The range alone is exact under bytewise collations; the LIKE keeps it
+    exact under linguistic ones, where the range can admit near-misses.
+    """
+    lowered = func.lower(name_col)
+    prefix = prefix.lower()
+    return and_(
+        lowered >= prefix,
+        lowered < prefix[:-1] + chr(ord(prefix[-1]) + 1),
+        lowered.startswith(prefix, autoescape=True),
+    )
+
+
 # Totes
 
 
 def create_tote(db: Session, tote: schemas.ToteCreate, account_id: str) -> models.Tote:
+    """Raises ValueError if parent_tote_id is not a tote in the account."""
+    parent_path = "/"
+    location_id = tote.location_id
+    if tote.parent_tote_id:
+        parent = get_tote(db, tote.parent_tote_id, account_id)
+        if not parent:
+            raise ValueError("Parent tote not found")
+        parent_path = parent.path
+        location_id = parent.location_id
+    tote_id = str(uuid.uuid4())
     m = models.Tote(
+        id=tote_id,
         account_id=account_id,
         name=tote.name,
         location=tote.location,
-        location_id=tote.location_id,
+        location_id=location_id,
         metadata_json=tote.metadata_json,
         description=tote.description,
+        parent_tote_id=tote.parent_tote_id or None,
+        path=f"{parent_path}{tote_id}/",
     )
+    _set_tote_attributes(m, tote.attributes or {})
     db.add(m)
+    db.flush()
+    _record_changes(db, account_id, "tote", [m.id])
     db.commit()
     db.refresh(m)
     return m
 
 
-def list_totes(db: Session, account_id: str):
-    return db.query(models.Tote).filter(models.Tote.account_id == account_id).all()
+def _attribute_row_values(value) -> tuple[str, float | None]:
+    """Text and numeric forms of an attribute value; numeric strings get both."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        num = float(value)
+        return (str(int(num)) if num.is_integer() else str(num)), num
+    text = str(value)
+    try:
+        num = float(text)
+    except ValueError:
+        return text, None
+    return text, num if math.isfinite(num) else None
+
+
+def _set_tote_attributes(tote: models.Tote, attributes: dict) -> None:
+    # Update rows in place: the unit of work inserts before it deletes, so
+    # replacing a row with the same key would trip uq_tote_attributes_tote_key
+    existing = {a.key: a for a in tote.attribute_rows}
+    for key in set(existing) - set(attributes):
+        tote.attribute_rows.remove(existing[key])
+    for key, value in attributes.items():
+        text, num = _attribute_row_values(value)
+        row = existing.get(key)
+        if row is None:
+            tote.attribute_rows.append(
+                models.ToteAttribute(account_id=tote.account_id, key=key, value=text, num_value=num)
+            )
+        else:
+            row.value, row.num_value = text, num
+
+
+ATTRIBUTE_FILTER_RE = re.compile(r"^([\w.-]+)(:|>=|<=|>|<)(.+)$")
+
+
+def parse_attribute_filter(expr: str) -> tuple[str, str, str]:
+    """Split "color:red" or "capacity_gal>=20" into (key, op, value). Raises ValueError."""
+    match = ATTRIBUTE_FILTER_RE.match(expr)
+    if not match:
+        raise ValueError(f"Invalid attribute filter {expr!r}; expected key:value or key>=number")
+    key, op, value = match.groups()
+    if op != ":":
+        try:
+            float(value)
+        except ValueError:
+            raise ValueError(f"Attribute filter {expr!r} compares against a non-number")
+    return key, op, value
+
+
+def _attribute_condition(op: str, value: str):
+    Attr = models.ToteAttribute
+    if op == ":":
+        text, num = _attribute_row_values(value)
+        # Numbers match numerically so "27", "27.0" and 27 are the same size
+        return Attr.num_value == num if num is not None else Attr.value == text
+    num = float(value)
+    return {">": Attr.num_value > num, ">=": Attr.num_value >= num, "<": Attr.num_value < num, "<=": Attr.num_value <= num}[op]
+
+
+def totes_query(
+    db: Session,
+    account_id: str,
+    *,
+    attribute_filters: list[tuple[str, str, str]] | None = None,
+    location_id: str | None = None,
+    name_prefix: str | None = None,
+    sort: str | None = None,
+):
+    """Totes in the account, optionally narrowed by location, name and attributes.
+
+    Each attribute filter is an indexed lookup on tote_attributes
+    (account_id, key, value|num_value); all filters must match.
+    Raises ValueError for an unsupported sort field.
+    """
+    query = db.query(models.Tote).filter(models.Tote.account_id == account_id)
+    if location_id is not None:
+        query = query.filter(models.Tote.location_id == location_id)
+    if name_prefix:
+        query = query.filter(_name_prefix_filter(models.Tote.name, name_prefix))
+    for key, op, value in attribute_filters or ():
+        matching = select(models.ToteAttribute.tote_id).where(
+            models.ToteAttribute.account_id == account_id,
+            models.ToteAttribute.key == key,
+            _attribute_condition(op, value),
+        )
+        query = query.filter(models.Tote.id.in_(matching))
+    return _apply_sort(query, sort, TOTE_SORT_FIELDS)
+
+
+def list_totes(db: Session, account_id: str, **filters):
+    return totes_query(db, account_id, **filters).all()
 
 
 def get_tote(db: Session, tote_id: str, account_id: str):
@@ -81,37 +510,203 @@ def get_tote_by_id(db: Session, tote_id: str, account_id: str):
     )
 
 
-def delete_tote(db: Session, tote: models.Tote):
-    db.delete(tote)
+def list_tote_contents(db: Session, tote: models.Tote) -> tuple[list[models.Tote], list[models.Item]]:
+    """Totes and items transitively inside `tote`, one indexed range query each."""
+    nested = (
+        db.query(models.Tote)
+        .filter(models.Tote.account_id == tote.account_id, _subtree_filter(models.Tote.path, tote.path))
+        .filter(models.Tote.id != tote.id)
+        .order_by(models.Tote.path)
+        .all()
+    )
+    items = (
+        db.query(models.Item)
+        .join(models.Tote, models.Item.tote_id == models.Tote.id)
+        .filter(
+            models.Item.account_id == tote.account_id,
+            models.Tote.account_id == tote.account_id,
+            _subtree_filter(models.Tote.path, tote.path),
+        )
+        .all()
+    )
+    return nested, items
+
+
+def get_item_tote_path(db: Session, item: models.Item) -> list[models.Tote]:
+    """Totes enclosing an item, outermost first; ancestor ids come from the tote's path."""
+    if not item.tote:
+        return []
+    ancestor_ids = item.tote.path.strip("/").split("/")
+    by_id = {
+        t.id: t
+        for t in db.query(models.Tote).filter(
+            models.Tote.account_id == item.account_id, models.Tote.id.in_(ancestor_ids),
+        )
+    }
+    return [by_id[tid] for tid in ancestor_ids if tid in by_id]
+
+
+def delete_tote(db: Session, tote: models.Tote) -> models.Deletion:
+    """Soft-delete a tote and the items in it; returns the deletion.
+
+    However many items the tote holds, this is a handful of set-based
+    statements: the rows are only hidden, and purge_deletion removes them
+    and their images once DELETE_RETENTION has passed. Nested totes move
+    up to the deleted tote's parent. Deleting an item checks it in.
+    """
+    account_id = tote.account_id
+    deletion = _add_deletion(db, account_id, "tote", tote.id)
+    in_tote = and_(models.Item.account_id == account_id, models.Item.tote_id == tote.id, models.Item.deleted_by.is_(None))
+    _release_checkouts(db, account_id, models.CheckedOutItem.item_id.in_(select(models.Item.id).where(in_tote)))
+    item_ids = _set_deleted_by(db, models.Item, deletion.id, in_tote)
+    _set_deleted_by(db, models.Tote, deletion.id, models.Tote.id == tote.id)
+    set_committed_value(tote, "deleted_by", deletion.id)
+    # Nested totes move up to the deleted tote's parent; the hidden tote itself is no longer matched
+    moved = _rewrite_subtree_paths(
+        db, models.Tote, account_id, tote.path, tote.path[:-len(tote.id) - 1],
+        parent_tote_id=case((models.Tote.parent_tote_id == tote.id, tote.parent_tote_id), else_=models.Tote.parent_tote_id),
+    )
+    _record_change_groups(db, account_id, [
+        ("item", item_ids, CHANGE_DELETE),
+        ("tote", moved, CHANGE_UPSERT),
+        ("tote", [tote.id], CHANGE_DELETE),
+    ])
     db.commit()
+    return deletion
+
+
+# Per-id statuses returned by the bulk operations (move_totes, checkout_items, checkin_items)
+BULK_NOT_FOUND = "not_found"
+BULK_MOVED = "moved"
+BULK_ALREADY_THERE = "already_there"
+BULK_NESTED = "nested"
+
+
+def move_totes(db: Session, account_id: str, tote_ids: list[str], location_id: str | None) -> dict[str, str]:
+    """Move a batch of totes to one location in a single UPDATE. Returns {tote_id: status}.
+
+    The destination is validated once (ValueError if it isn't a location in
+    the account). Everything packed inside a moved tote moves with it;
+    nested totes can't be moved on their own and are reported as such.
+    """
+    if location_id is not None and not get_location(db, location_id, account_id):
+        raise ValueError("Location not found")
+    ids = list(dict.fromkeys(tote_ids))
+    Tote = models.Tote
+    found = {
+        row.id: row
+        for row in db.execute(
+            select(Tote.id, Tote.path, Tote.location_id, Tote.parent_tote_id)
+            .where(Tote.account_id == account_id, Tote.id.in_(ids))
+        )
+    }
+    roots = [row for row in found.values() if row.parent_tote_id is None and row.location_id != location_id]
+    if roots:
+        in_subtrees = and_(Tote.account_id == account_id, or_(*(_subtree_filter(Tote.path, row.path) for row in roots)))
+        stmt = (
+            update(Tote).where(in_subtrees).values(location_id=location_id).execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.update_returning:
+            changed = list(db.execute(stmt.returning(Tote.id)).scalars())
+        else:
+            changed = list(db.execute(select(Tote.id).where(in_subtrees)).scalars())
+            db.execute(stmt)
+        _record_changes(db, account_id, "tote", changed)
+        db.commit()
+
+    def status(tote_id: str) -> str:
+        row = found.get(tote_id)
+        if row is None:
+            return BULK_NOT_FOUND
+        if row.parent_tote_id is not None:
+            return BULK_NESTED
+        return BULK_ALREADY_THERE if row.location_id == location_id else BULK_MOVED
+
+    return {tid: status(tid) for tid in ids}
 
 
 def update_tote(db: Session, tote: models.Tote, upd: schemas.ToteUpdate):
+    """Raises ValueError if the new parent tote is missing or inside the tote itself.
+
+    Moving a tote (to another parent or location) carries everything packed
+    inside it along in a single UPDATE over the whole subtree.
+    """
     if upd.name is not None:
         tote.name = upd.name
     if upd.location is not None:
         tote.location = upd.location
-    if upd.location_id is not None:
-        tote.location_id = upd.location_id
     if upd.metadata_json is not None:
         tote.metadata_json = upd.metadata_json
     if upd.description is not None:
         tote.description = upd.description
+    if upd.attributes is not None:
+        _set_tote_attributes(tote, upd.attributes)
+    location_id = upd.location_id
+    # A tote nested under a parent takes the parent's location, even when that is None
+    inherit_location = False
+    new_path = None
+    if upd.parent_tote_id is not None and (upd.parent_tote_id or None) != tote.parent_tote_id:
+        parent_path = "/"
+        if upd.parent_tote_id:
+            parent = db.execute(
+                select(models.Tote.path, models.Tote.location_id)
+                .where(models.Tote.id == upd.parent_tote_id, models.Tote.account_id == tote.account_id)
+            ).first()
+            if not parent:
+                raise ValueError("Parent tote not found")
+            if parent.path.startswith(tote.path):
+                raise ValueError("Cannot nest a tote inside itself")
+            parent_path = parent.path
+            location_id = parent.location_id
+            inherit_location = True
+        new_path = f"{parent_path}{tote.id}/"
+    elif tote.parent_tote_id and location_id is not None and location_id != tote.location_id:
+        raise ValueError("Nested totes take their location from the enclosing tote")
+    # Columns written by the subtree UPDATE below rather than by the ORM flush
+    moved = {}
+    if new_path is not None:
+        parent_tote_id = upd.parent_tote_id or None
+        moved["parent_tote_id"] = case((models.Tote.id == tote.id, parent_tote_id), else_=models.Tote.parent_tote_id)
+    if (location_id is not None or inherit_location) and location_id != tote.location_id:
+        moved["location_id"] = location_id
+    subtree = None
+    if new_path is not None:
+        subtree = _rewrite_subtree_paths(db, models.Tote, tote.account_id, tote.path, new_path, **moved)
+        set_committed_value(tote, "path", new_path)
+        set_committed_value(tote, "parent_tote_id", parent_tote_id)
+    elif moved:
+        subtree = _update_subtree(db, models.Tote, tote.account_id, tote.path, **moved)
+    if "location_id" in moved:
+        set_committed_value(tote, "location_id", location_id)
+        db.expire(tote, ["location_obj"])
     db.add(tote)
+    _record_changes(db, tote.account_id, "tote", subtree or [tote.id])
     db.commit()
-    db.refresh(tote)
     return tote
 
 # Locations
 
 
 def create_location(db: Session, location: schemas.LocationCreate, account_id: str) -> models.Location:
+    """Raises ValueError if parent_id is not a location in the account."""
+    parent_path = "/"
+    if location.parent_id:
+        parent = get_location(db, location.parent_id, account_id)
+        if not parent:
+            raise ValueError("Parent location not found")
+        parent_path = parent.path
+    location_id = str(uuid.uuid4())
     m = models.Location(
+        id=location_id,
         account_id=account_id,
         name=location.name,
         description=location.description,
+        parent_id=location.parent_id or None,
+        path=f"{parent_path}{location_id}/",
     )
     db.add(m)
+    db.flush()
+    _record_changes(db, account_id, "location", [m.id])
     db.commit()
     db.refresh(m)
     return m
@@ -137,21 +732,116 @@ def get_location_by_id(db: Session, location_id: str, account_id: str):
     )
 
 
-def delete_location(db: Session, location: models.Location):
-    # Remove location association from totes that reference this location
-    db.query(models.Tote).filter(models.Tote.location_id == location.id).update({"location_id": None})
-    db.delete(location)
+def list_totes_in_location(db: Session, location: models.Location, recursive: bool = False):
+    """Totes at a location, or with recursive=True anywhere in its subtree (one indexed join)."""
+    if not recursive:
+        return location.totes
+    return (
+        db.query(models.Tote)
+        .join(models.Location, models.Tote.location_id == models.Location.id)
+        .filter(models.Location.account_id == location.account_id, _subtree_filter(models.Location.path, location.path))
+        .all()
+    )
+
+
+def get_location_subtree_stats(db: Session, location: models.Location) -> dict:
+    in_subtree = (
+        select(models.Location.id)
+        .where(models.Location.account_id == location.account_id, _subtree_filter(models.Location.path, location.path))
+        .scalar_subquery()
+    )
+    locations_count, totes_count, items_count = db.execute(select(
+        select(func.count()).where(models.Location.id.in_(in_subtree)).scalar_subquery(),
+        select(func.count(models.Tote.id)).where(models.Tote.location_id.in_(in_subtree)).scalar_subquery(),
+        select(func.count(models.Item.id))
+        .join(models.Tote, models.Item.tote_id == models.Tote.id)
+        .where(models.Item.account_id == location.account_id, models.Tote.location_id.in_(in_subtree))
+        .scalar_subquery(),
+    )).one()
+    return {
+        "location_id": location.id,
+        "locations_count": locations_count,
+        "totes_count": totes_count,
+        "items_count": items_count,
+    }
+
+
+def delete_location(
+    db: Session, location: models.Location, reassign_to: str | None = None, batch_size: int = 5000
+) -> models.Deletion:
+    """Soft-delete a location, moving its totes to `reassign_to` (or to no location).
+
+    Totes are reassigned in batches of batch_size, one UPDATE and one commit
+    per batch, so a location holding tens of thousands of totes never keeps
+    the table locked for long. If the delete fails midway, the totes already
+    moved stay moved and calling it again finishes the job. Sub-locations
+    move up to the deleted location's parent. The location itself is only
+    hidden until purge_deletion; returns the deletion. Raises ValueError if
+    reassign_to isn't another location in the account.
+    """
+    account_id = location.account_id
+    if reassign_to is not None:
+        if reassign_to == location.id or not get_location(db, reassign_to, account_id):
+            raise ValueError("Target location not found")
+    Tote = models.Tote
+    while True:
+        batch = select(Tote.id).where(Tote.account_id == account_id, Tote.location_id == location.id).limit(batch_size)
+        stmt = update(Tote).values(location_id=reassign_to).execution_options(synchronize_session=False)
+        if db.get_bind().dialect.update_returning:
+            tote_ids = list(db.execute(
+                stmt.where(Tote.account_id == account_id, Tote.id.in_(batch.scalar_subquery())).returning(Tote.id)
+            ).scalars())
+        else:
+            tote_ids = list(db.execute(batch).scalars())
+            db.execute(stmt.where(Tote.id.in_(tote_ids)))
+        if not tote_ids:
+            break
+        _record_changes(db, account_id, "tote", tote_ids)
+        db.commit()
+    deletion = _add_deletion(db, account_id, "location", location.id)
+    _set_deleted_by(db, models.Location, deletion.id, models.Location.id == location.id)
+    set_committed_value(location, "deleted_by", deletion.id)
+    # Children move up to the deleted location's parent
+    moved = _rewrite_subtree_paths(
+        db, models.Location, account_id, location.path, location.path[:-len(location.id) - 1],
+        parent_id=case((models.Location.parent_id == location.id, location.parent_id), else_=models.Location.parent_id),
+    )
+    _record_change_groups(db, account_id, [
+        ("location", moved, CHANGE_UPSERT),
+        ("location", [location.id], CHANGE_DELETE),
+    ])
     db.commit()
+    return deletion
 
 
 def update_location(db: Session, location: models.Location, upd: schemas.LocationUpdate):
+    """Raises ValueError if the new parent is missing or inside the location's own subtree."""
     if upd.name is not None:
         location.name = upd.name
     if upd.description is not None:
         location.description = upd.description
+    changed = [location.id]
+    if upd.parent_id is not None and (upd.parent_id or None) != location.parent_id:
+        parent_path = "/"
+        if upd.parent_id:
+            parent = get_location(db, upd.parent_id, location.account_id)
+            if not parent:
+                raise ValueError("Parent location not found")
+            if parent.path.startswith(location.path):
+                raise ValueError("Cannot move a location beneath itself")
+            parent_path = parent.path
+        new_path = f"{parent_path}{location.id}/"
+        parent_id = upd.parent_id or None
+        changed = _rewrite_subtree_paths(
+            db, models.Location, location.account_id, location.path, new_path,
+            parent_id=case((models.Location.id == location.id, parent_id), else_=models.Location.parent_id),
+        )
+        # Already written by the subtree UPDATE; don't flush them again
+        set_committed_value(location, "path", new_path)
+        set_committed_value(location, "parent_id", parent_id)
     db.add(location)
+    _record_changes(db, location.account_id, "location", changed)
     db.commit()
-    db.refresh(location)
     return location
 
 
@@ -167,15 +857,57 @@ def add_item(db: Session, account_id: str, item: schemas.ItemCreate, tote_id: st
         quantity=item.quantity,
         image_path=image_path,
     )
+    if image_path:
+        i.image_width, i.image_height = image_store.stored_image_size(db, image_path) or (None, None)
     db.add(i)
+    db.flush()
+    _index_item_names(db, account_id, {i.id: i.name})
+    _record_changes(db, account_id, "item", [i.id])
     db.commit()
     db.refresh(i)
     return i
 
 
-def list_items(db: Session, account_id: str):
-    # Include orphan items (no tote) by filtering on item.account_id
-    return db.query(models.Item).filter(models.Item.account_id == account_id).all()
+def items_query(
+    db: Session,
+    account_id: str,
+    *,
+    tote_id: str | None = None,
+    location_id: str | None = None,
+    checked_out: bool | None = None,
+    min_quantity: int | None = None,
+    max_quantity: int | None = None,
+    name_prefix: str | None = None,
+    sort: str | None = None,
+):
+    """Items in the account (including orphans) narrowed by indexed filters.
+
+    Raises ValueError for an unsupported sort field.
+    """
+    query = db.query(models.Item).filter(models.Item.account_id == account_id)
+    if tote_id is not None:
+        query = query.filter(models.Item.tote_id == tote_id)
+    if location_id is not None:
+        at_location = select(models.Tote.id).where(
+            models.Tote.location_id == location_id, models.Tote.account_id == account_id,
+        )
+        query = query.filter(models.Item.tote_id.in_(at_location))
+    if checked_out is not None:
+        is_out = models.Item.id.in_(
+            select(models.CheckedOutItem.item_id).where(models.CheckedOutItem.account_id == account_id)
+        )
+        query = query.filter(is_out if checked_out else ~is_out)
+    if min_quantity is not None:
+        query = query.filter(models.Item.quantity >= min_quantity)
+    if max_quantity is not None:
+        query = query.filter(models.Item.quantity <= max_quantity)
+    if name_prefix:
+        query = query.filter(_name_prefix_filter(models.Item.name, name_prefix))
+    return _apply_sort(query, sort, ITEM_SORT_FIELDS)
+
+
+def list_items(db: Session, account_id: str, **filters):
+    return items_query(db, account_id, **filters).all()
 
 
 def list_items_in_tote(db: Session, tote_id: str, account_id: str):
@@ -192,29 +924,305 @@ def get_item(db: Session, item_id: str, account_id: str):
 
 def update_item(db: Session, item: models.Item, upd: schemas.ItemUpdate, image_path: str | None = None):
     # Only overwrite provided (non-None) fields
-    if upd.name is not None:
+    if upd.name is not None and upd.name != item.name:
         item.name = upd.name
+        _index_item_names(db, item.account_id, {item.id: item.name})
     if upd.description is not None:
         item.description = upd.description
     if upd.quantity is not None:
         item.quantity = upd.quantity
     if image_path is not None:
-        # delete old image if present and different
+        # delete old image if present and different, once this commits
         if item.image_path and item.image_path != image_path:
-            image_store.delete_image(item.image_path)
+            image_store.discard_image(db, item.image_path)
         item.image_path = image_path
+        item.image_width, item.image_height = image_store.stored_image_size(db, image_path) or (None, None)
+        # The new image is hashed after commit (index_item_image)
+        item.image_phash = None
+        _drop_image_hashes(db, [item.id])
     db.add(item)
+    _record_changes(db, item.account_id, "item", [item.id])
     db.commit()
-    db.refresh(item)
     return item
 
 
-def delete_item(db: Session, item: models.Item):
-    # delete associated image file if any
+def clear_item_image(db: Session, item: models.Item):
     if item.image_path:
-        image_store.delete_image(item.image_path)
-    db.delete(item)
+        image_store.discard_image(db, item.image_path)
+        item.image_path = None
+        item.image_width = item.image_height = None
+        item.image_phash = None
+        _drop_image_hashes(db, [item.id])
+        db.add(item)
+        _record_changes(db, item.account_id, "item", [item.id])
+        db.commit()
+    return item
+
+
+def _delete_items(db: Session, account_id: str, item_ids: list[str]) -> None:
+    """Delete items and their index and checkout rows, one statement per table."""
+    if not item_ids:
+        return
+    _drop_item_trigrams(db, item_ids)
+    _drop_image_hashes(db, item_ids)
+    Out = models.CheckedOutItem
+    db.execute(delete(Out).where(Out.account_id == account_id, Out.item_id.in_(item_ids)))
+    db.execute(
+        delete(models.Item)
+        .where(models.Item.account_id == account_id, models.Item.id.in_(item_ids))
+        .execution_options(**INCLUDE_DELETED)
+    )
+
+
+def delete_item(db: Session, item: models.Item) -> models.Deletion:
+    """Soft-delete an item, checking it in; purge_deletion removes it and its image later."""
+    deletion = _add_deletion(db, item.account_id, "item", item.id)
+    _release_checkouts(db, item.account_id, models.CheckedOutItem.item_id == item.id)
+    _set_deleted_by(db, models.Item, deletion.id, models.Item.account_id == item.account_id, models.Item.id == item.id)
+    set_committed_value(item, "deleted_by", deletion.id)
+    _record_changes(db, item.account_id, "item", [item.id], CHANGE_DELETE)
+    db.commit()
+    return deletion
+
+
+# Fuzzy name matching
+
+# pg_trgm's default thresholds for word_similarity (autocomplete) and similarity (duplicates)
+WORD_SIMILARITY_THRESHOLD = 0.6
+DUPLICATE_THRESHOLD = 0.5
+
+
+def name_trigrams(name: str) -> set[str]:
+    """Trigrams as pg_trgm extracts them: per lowercased word, padded "  word "."""
+    grams = set()
+    for word in re.findall(r"[^\W_]+", name.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _uses_pg_trgm(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _index_item_names(db: Session, account_id: str, names: dict[str, str]) -> None:
+    """Refresh item_trigrams for {item_id: name}; PostgreSQL indexes names itself."""
+    if not names or _uses_pg_trgm(db):
+        return
+    _drop_item_trigrams(db, list(names))
+    rows = []
+    for item_id, name in names.items():
+        grams = name_trigrams(name)
+        rows.extend(
+            {"account_id": account_id, "trigram": g, "item_id": item_id, "trigram_count": len(grams)} for g in grams
+        )
+    if rows:
+        db.execute(insert(models.ItemTrigram), rows)
+
+
+def _drop_item_trigrams(db: Session, item_ids: list[str]) -> None:
+    if item_ids and not _uses_pg_trgm(db):
+        db.execute(delete(models.ItemTrigram).where(models.ItemTrigram.item_id.in_(item_ids)))
+
+
+def _trigram_matches(
+    db: Session, account_id: str, text: str, limit: int, threshold: float, whole_name: bool
+) -> list[tuple[models.Item, float]]:
+    """Items trigram-similar to `text`, best match first.
+
+    whole_name scores pg_trgm similarity (shared / trigrams in either name);
+    otherwise the share of `text`'s trigrams found anywhere in the name,
+    like word_similarity, so one misspelt word still finds a long name.
+    On PostgreSQL the GIN index answers the `%` / `<%` operators; elsewhere
+    one grouped range scan over item_trigrams counts shared trigrams.
+    """
+    if _uses_pg_trgm(db):
+        if whole_name:
+            score, match = func.similarity(models.Item.name, text), models.Item.name.op("%")(text)
+        else:
+            score, match = func.word_similarity(text, models.Item.name), literal(text).op("<%")(models.Item.name)
+        return [
+            (item, float(sim))
+            for item, sim in db.query(models.Item, score)
+            .filter(models.Item.account_id == account_id, match, score >= threshold)
+            .order_by(score.desc())
+            .limit(limit)
+        ]
+    grams = name_trigrams(text)
+    if not grams:
+        return []
+    T = models.ItemTrigram
+    shared = func.count()
+    similarity = shared * 1.0 / (len(grams) + func.max(T.trigram_count) - shared)
+    score = similarity if whole_name else shared * 1.0 / len(grams)
+    # Either score reaching the threshold needs at least this many shared
+    # trigrams, so names with fewer can't match; for whole-name similarity
+    # a name that is too long can't either
+    min_shared = math.ceil(len(grams) * threshold - 1e-9)
+    size = [T.trigram_count >= min_shared]
+    if whole_name:
+        size.append(T.trigram_count <= math.floor(len(grams) / threshold + 1e-9))
+    ranked = (
+        select(T.item_id, score.label("score"), similarity.label("similarity"))
+        # Soft-deleted items keep their trigrams until purged; skip them before LIMIT
+        .join(models.Item, and_(models.Item.account_id == T.account_id, models.Item.id == T.item_id))
+        .where(T.account_id == account_id, T.trigram.in_(grams), models.Item.deleted_by.is_(None), *size)
+        .group_by(T.item_id)
+        .having(score >= threshold)
+        .order_by(score.desc(), similarity.desc())
+        .limit(limit)
+        .subquery()
+    )
+    return [
+        (item, float(sim))
+        for item, sim in db.query(models.Item, ranked.c.score)
+        .join(ranked, models.Item.id == ranked.c.item_id)
+        .filter(models.Item.account_id == account_id)
+        .order_by(ranked.c.score.desc(), ranked.c.similarity.desc())
+    ]
+
+
+def suggest_items(db: Session, account_id: str, text: str, limit: int = 10) -> list[tuple[models.Item, float]]:
+    """Typo-tolerant autocomplete: names containing something close to `text`."""
+    return _trigram_matches(db, account_id, text, limit, WORD_SIMILARITY_THRESHOLD, whole_name=False)
+
+
+def find_duplicate_items(db: Session, account_id: str, name: str) -> list[tuple[models.Item, float]]:
+    """Existing items whose whole name is close to `name`."""
+    return _trigram_matches(db, account_id, name, 5, DUPLICATE_THRESHOLD, whole_name=True)
+
+
+def backfill_item_trigrams(db: Session, batch_size: int = 1000) -> int:
+    """Index the names of items that have no item_trigrams rows yet; returns how many.
+
+    Items created before the index existed were never added to it. Walks
+    items in id order, batch_size per commit, so it can be stopped and rerun.
+    """
+    if _uses_pg_trgm(db):
+        return 0
+    Item, T = models.Item, models.ItemTrigram
+    indexed, last_id = 0, ""
+    while True:
+        batch = db.execute(
+            select(Item.id, Item.account_id, Item.name)
+            .where(Item.id > last_id, ~select(T.item_id).where(T.item_id == Item.id).exists())
+            .order_by(Item.id)
+            .limit(batch_size)
+            # Soft-deleted items keep their trigrams so a restore finds them again
+            .execution_options(**INCLUDE_DELETED)
+        ).all()
+        if not batch:
+            return indexed
+        by_account: dict[str, dict[str, str]] = {}
+        for item_id, account_id, name in batch:
+            by_account.setdefault(account_id, {})[item_id] = name
+        for account_id, names in by_account.items():
+            _index_item_names(db, account_id, names)
+        db.commit()
+        indexed += len(batch)
+        last_id = batch[-1].id
+
+
+# Image similarity
+
+# 64-bit hashes split into 8 bands of 8 bits: two hashes within HASH_MATCH_DISTANCE
+# bits of each other differ in at most 7 bands, so they share at least one exactly
+HASH_BANDS = 8
+HASH_BAND_BITS = 64 // HASH_BANDS
+HASH_MATCH_DISTANCE = HASH_BANDS - 1
+
+
+def _hash_buckets(phash: int) -> list[int]:
+    """One LSH bucket per band: the band number packed with that band's bits."""
+    mask = (1 << HASH_BAND_BITS) - 1
+    return [band << HASH_BAND_BITS | (phash >> (band * HASH_BAND_BITS)) & mask for band in range(HASH_BANDS)]
+
+
+def _to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _drop_image_hashes(db: Session, item_ids: list[str]) -> None:
+    if item_ids:
+        db.execute(delete(models.ItemImageBand).where(models.ItemImageBand.item_id.in_(item_ids)))
+
+
+def index_item_image(db: Session, account_id: str, item_id: str, image_path: str) -> bool:
+    """Hash an item's image and index it for similarity lookups.
+
+    Runs after the upload has committed (as a background task). Does nothing
+    if the item is gone or its image has since been replaced; returns whether
+    a hash was stored.
+    """
+    item = get_item(db, item_id, account_id)
+    if item is None or item.image_path != image_path:
+        return False
+    try:
+        phash = image_store.perceptual_hash(image_path)
+    except OSError:  # file vanished or isn't decodable
+        return False
+    item.image_phash = _to_signed64(phash)
+    _drop_image_hashes(db, [item.id])
+    db.execute(insert(models.ItemImageBand), [
+        {"account_id": item.account_id, "bucket": bucket, "item_id": item.id} for bucket in _hash_buckets(phash)
+    ])
     db.commit()
+    return True
+
+
+def find_similar_images(
+    db: Session, account_id: str, phash: int, limit: int = 10, max_distance: int = HASH_MATCH_DISTANCE,
+    exclude_item_id: str | None = None,
+) -> list[tuple[models.Item, int]]:
+    """Items whose image hash is within max_distance bits of `phash`, closest first.
+
+    Candidates come from the bucket index (one primary-key seek per band);
+    only those are compared bit by bit, so no image is scanned or decoded.
+    """
+    max_distance = min(max_distance, HASH_MATCH_DISTANCE)
+    B = models.ItemImageBand
+    query = (
+        db.query(models.Item.id, models.Item.image_phash)
+        .select_from(B)
+        .join(models.Item, and_(models.Item.account_id == B.account_id, models.Item.id == B.item_id))
+        .filter(B.account_id == account_id, B.bucket.in_(_hash_buckets(phash)))
+    )
+    if exclude_item_id is not None:
+        query = query.filter(B.item_id != exclude_item_id)
+    distances = {}
+    for item_id, item_hash in query:
+        distance = ((item_hash & (1 << 64) - 1) ^ phash).bit_count()
+        if distance <= max_distance:
+            distances[item_id] = distance
+    closest = sorted(distances, key=distances.get)[:limit]
+    by_id = {
+        item.id: item
+        for item in db.query(models.Item).filter(models.Item.account_id == account_id, models.Item.id.in_(closest))
+    }
+    return [(by_id[item_id], distances[item_id]) for item_id in closest if item_id in by_id]
+
+
+def backfill_image_hashes(db: Session, batch_size: int = 1000) -> dict:
+    """Hash images of items uploaded before hashing existed; returns counts hashed and failed.
+
+    A failure is an image file that is missing or can't be decoded; those
+    items stay unhashed and are retried on the next run.
+    """
+    Item = models.Item
+    report = {"hashed": 0, "failed": 0}
+    last_id = ""
+    while True:
+        batch = db.execute(
+            select(Item.id, Item.account_id, Item.image_path)
+            .where(Item.id > last_id, Item.image_path.isnot(None), Item.image_phash.is_(None))
+            .order_by(Item.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return report
+        for item_id, account_id, image_path in batch:
+            report["hashed" if index_item_image(db, account_id, item_id, image_path) else "failed"] += 1
+        last_id = batch[-1].id
 
 
 # Users
@@ -289,6 +1297,10 @@ def update_user(db: Session, user: models.User, user_in: schemas.UserUpdate):
 def delete_user(db: Session, user: models.User):
     if user.is_superuser and not _account_superuser_exists(db, user.account_id, exclude_user_id=user.id):
         raise ValueError("Cannot delete the only superuser for this account")
+    # Releasing the user's checkouts changes the checkout status of those items
+    released = _release_checkouts(db, user.account_id, models.CheckedOutItem.user_id == user.id)
+    _record_changes(db, user.account_id, "item", released)
+    db.expire(user, ["checked_out_items"])
     db.delete(user)
     db.commit()
 
@@ -339,61 +1351,283 @@ def consume_reset_token(db: Session, token: str, new_password: str):
 
 # Checkout functionality
 
-def checkout_item(db: Session, item_id: str, user: models.User) -> models.CheckedOutItem | None:
-    """Check out an item to a user. Returns None if item is already checked out or doesn't exist."""
-    item = get_item(db, item_id, user.account_id)
-    if not item:
+CHECKOUT_EVENT_CHECKOUT = "checkout"
+CHECKOUT_EVENT_CHECKIN = "checkin"
+# Columns of uq_checked_out_items_account_item, the ON CONFLICT target for claims
+CHECKOUT_CONFLICT_COLUMNS = ["account_id", "item_id"]
+
+
+def _record_checkout_events(
+    db: Session, user: models.User, action: str, item_ids: list[str], occurred_at: datetime | None = None
+) -> None:
+    if not item_ids:
+        return
+    occurred_at = occurred_at or datetime.utcnow()
+    db.execute(insert(models.CheckoutEvent), [
+        {
+            "account_id": user.account_id,
+            "item_id": iid,
+            "user_id": user.id,
+            "action": action,
+            "occurred_at": occurred_at,
+        }
+        for iid in item_ids
+    ])
+
+
+def _release_checkouts(db: Session, account_id: str, condition) -> list[str]:
+    """Delete the account's checkouts matching `condition`, recording a checkin for each holder.
+
+    Used when deleting a tote, item or user checks items in implicitly, so the
+    history still shows when each checkout ended. Returns the released item ids.
+    """
+    Out = models.CheckedOutItem
+    matched = and_(Out.account_id == account_id, condition)
+    stmt = delete(Out).where(matched).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.delete_returning:
+        released = db.execute(stmt.returning(Out.item_id, Out.user_id)).all()
+    else:
+        released = db.execute(select(Out.item_id, Out.user_id).where(matched)).all()
+        db.execute(stmt)
+    if released:
+        occurred_at = datetime.utcnow()
+        db.execute(insert(models.CheckoutEvent), [
+            {
+                "account_id": account_id,
+                "item_id": item_id,
+                "user_id": user_id,
+                "action": CHECKOUT_EVENT_CHECKIN,
+                "occurred_at": occurred_at,
+            }
+            for item_id, user_id in released
+        ])
+    return [item_id for item_id, _ in released]
+
+
+def _conflict_insert(db: Session):
+    """Return the dialect's insert() supporting ON CONFLICT DO NOTHING, or None."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
         return None
+    return dialect_insert
 
-    # Check if already checked out
-    existing_checkout = (
-        db.query(models.CheckedOutItem)
-        .filter(models.CheckedOutItem.item_id == item_id)
-        .first()
-    )
-    if existing_checkout:
-        return None  # Already checked out
-
-    # Create checkout record
-    checkout = models.CheckedOutItem(
-        item_id=item_id,
-        user_id=user.id,
-        checked_out_at=datetime.utcnow()
+
+def checkout_item(db: Session, item_id: str, user: models.User) -> models.CheckedOutItem | None:
+    """Check out an item to a user. Returns None if item is already checked out or doesn't exist.
+
+    A single INSERT ... SELECT both verifies the item belongs to the user's
+    account and claims it; uq_checked_out_items_account_item arbitrates
+    concurrent checkouts, so there is no check-then-act window.
+    """
+    checkout_id = str(uuid.uuid4())
+    checked_out_at = datetime.utcnow()
+    owned = select(
+        literal(checkout_id),
+        models.Item.account_id,
+        models.Item.id,
+        literal(user.id),
+        literal(checked_out_at, models.CheckedOutItem.checked_out_at.type),
+    ).where(
+        # INSERT ... SELECT isn't filtered for soft deletes automatically
+        models.Item.id == item_id, models.Item.account_id == user.account_id, models.Item.deleted_by.is_(None),
     )
-    db.add(checkout)
+    columns = ["id", "account_id", "item_id", "user_id", "checked_out_at"]
+
+    dialect_insert = _conflict_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(models.CheckedOutItem).from_select(columns, owned)
+        inserted = db.execute(stmt.on_conflict_do_nothing(index_elements=CHECKOUT_CONFLICT_COLUMNS)).rowcount
+    else:
+        # No ON CONFLICT support: let the unique constraint reject the loser inside a savepoint
+        try:
+            with db.begin_nested():
+                inserted = db.execute(insert(models.CheckedOutItem).from_select(columns, owned)).rowcount
+        except IntegrityError:
+            inserted = 0
+    if not inserted:
+        db.rollback()
+        return None
+
+    _record_changes(db, user.account_id, "item", [item_id])
+    _record_checkout_events(db, user, CHECKOUT_EVENT_CHECKOUT, [item_id], checked_out_at)
     db.commit()
-    db.refresh(checkout)
-    return checkout
+    return db.get(models.CheckedOutItem, checkout_id)
 
 
 def checkin_item(db: Session, item_id: str, user: models.User) -> bool:
     """Check in an item. Returns True if successful, False if not checked out or not owned by user."""
-    item = get_item(db, item_id, user.account_id)
-    if not item:
-        return False
-
-    # Find and delete the checkout record
-    checkout = (
-        db.query(models.CheckedOutItem)
-        .filter(models.CheckedOutItem.item_id == item_id)
-        .first()
+    stmt = (
+        delete(models.CheckedOutItem)
+        .where(models.CheckedOutItem.account_id == user.account_id, models.CheckedOutItem.item_id == item_id)
+        .execution_options(synchronize_session=False)
     )
-    if not checkout:
-        return False  # Not checked out
+    if not db.execute(stmt).rowcount:
+        db.rollback()
+        return False  # Not checked out, or not in the user's account
 
-    db.delete(checkout)
+    _record_changes(db, user.account_id, "item", [item_id])
+    _record_checkout_events(db, user, CHECKOUT_EVENT_CHECKIN, [item_id])
     db.commit()
     return True
 
 
+BULK_CHECKED_OUT = "checked_out"
+BULK_CHECKED_IN = "checked_in"
+BULK_ALREADY_CHECKED_OUT = "already_checked_out"
+BULK_NOT_CHECKED_OUT = "not_checked_out"
+
+
+def _owned_item_ids(db: Session, item_ids: list[str], account_id: str) -> set[str]:
+    return {
+        iid for (iid,) in db.query(models.Item.id).filter(models.Item.id.in_(item_ids), models.Item.account_id == account_id)
+    }
+
+
+def checkout_items(db: Session, item_ids: list[str], user: models.User) -> dict[str, str]:
+    """Check out a batch of items in one transaction. Returns {item_id: status}."""
+    ids = list(dict.fromkeys(item_ids))
+    owned = _owned_item_ids(db, ids, user.account_id)
+    checked_out_at = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "account_id": user.account_id,
+            "item_id": iid,
+            "user_id": user.id,
+            "checked_out_at": checked_out_at,
+        }
+        for iid in ids if iid in owned
+    ]
+
+    claimed: set[str] = set()
+    dialect_insert = _conflict_insert(db)
+    if rows and dialect_insert is not None:
+        stmt = dialect_insert(models.CheckedOutItem).values(rows).on_conflict_do_nothing(index_elements=CHECKOUT_CONFLICT_COLUMNS)
+        if db.get_bind().dialect.insert_returning:
+            claimed = set(db.execute(stmt.returning(models.CheckedOutItem.item_id)).scalars())
+        else:
+            db.execute(stmt)
+            claimed = {
+                iid for (iid,) in db.query(models.CheckedOutItem.item_id)
+                .filter(models.CheckedOutItem.id.in_([r["id"] for r in rows]))
+            }
+    elif rows:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(models.CheckedOutItem).values(row))
+                claimed.add(row["item_id"])
+            except IntegrityError:
+                pass
+
+    _record_changes(db, user.account_id, "item", [iid for iid in ids if iid in claimed])
+    _record_checkout_events(db, user, CHECKOUT_EVENT_CHECKOUT, [iid for iid in ids if iid in claimed], checked_out_at)
+    db.commit()
+    return {
+        iid: BULK_CHECKED_OUT if iid in claimed else BULK_ALREADY_CHECKED_OUT if iid in owned else BULK_NOT_FOUND
+        for iid in ids
+    }
+
+
+def checkin_items(db: Session, item_ids: list[str], user: models.User) -> dict[str, str]:
+    """Check in a batch of items in one transaction. Returns {item_id: status}."""
+    ids = list(dict.fromkeys(item_ids))
+    owned = _owned_item_ids(db, ids, user.account_id)
+    released: set[str] = set()
+    if owned:
+        stmt = (
+            delete(models.CheckedOutItem)
+            .where(models.CheckedOutItem.account_id == user.account_id, models.CheckedOutItem.item_id.in_(owned))
+            .execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.delete_returning:
+            released = set(db.execute(stmt.returning(models.CheckedOutItem.item_id)).scalars())
+        else:
+            released = {
+                iid for (iid,) in db.query(models.CheckedOutItem.item_id)
+                .filter(models.CheckedOutItem.account_id == user.account_id, models.CheckedOutItem.item_id.in_(owned))
+                .with_for_update()
+            }
+            db.execute(stmt)
+
+    _record_changes(db, user.account_id, "item", [iid for iid in ids if iid in released])
+    _record_checkout_events(db, user, CHECKOUT_EVENT_CHECKIN, [iid for iid in ids if iid in released])
+    db.commit()
+    return {
+        iid: BULK_CHECKED_IN if iid in released else BULK_NOT_CHECKED_OUT if iid in owned else BULK_NOT_FOUND
+        for iid in ids
+    }
+
+
+def encode_event_cursor(ev: models.CheckoutEvent) -> str:
+    return f"{ev.occurred_at.isoformat()}_{ev.id}"
+
+
+def decode_event_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError for malformed cursors."""
+    occurred_at, _, event_id = cursor.rpartition("_")
+    return datetime.fromisoformat(occurred_at), int(event_id)
+
+
+def list_checkout_events(
+    db: Session,
+    account_id: str,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    item_id: str | None = None,
+    user_id: str | None = None,
+    before: tuple[datetime, int] | None = None,
+    limit: int = 100,
+) -> list[models.CheckoutEvent]:
+    """Newest-first checkout history in [start, end), keyset-paginated.
+
+    `before` is the (occurred_at, id) of the last event of the previous page,
+    so each page is an index range scan regardless of how deep it is.
+    """
+    Ev = models.CheckoutEvent
+    query = db.query(Ev).filter(Ev.account_id == account_id)
+    if item_id is not None:
+        query = query.filter(Ev.item_id == item_id)
+    if user_id is not None:
+        query = query.filter(Ev.user_id == user_id)
+    if start is not None:
+        query = query.filter(Ev.occurred_at >= start)
+    if end is not None:
+        query = query.filter(Ev.occurred_at < end)
+    if before is not None:
+        query = query.filter(tuple_(Ev.occurred_at, Ev.id) < tuple_(*before))
+    return query.order_by(Ev.occurred_at.desc(), Ev.id.desc()).limit(limit).all()
+
+
+def compact_checkout_events(
+    db: Session, older_than: datetime, account_id: str | None = None, batch_size: int = 5000
+) -> int:
+    """Delete events older than `older_than` in bounded batches; returns rows removed.
+
+    Each batch commits separately so retention runs never hold long write locks.
+    """
+    Ev = models.CheckoutEvent
+    removed = 0
+    while True:
+        batch = select(Ev.id).where(Ev.occurred_at < older_than)
+        if account_id is not None:
+            batch = batch.where(Ev.account_id == account_id)
+        ids = db.execute(batch.order_by(Ev.occurred_at).limit(batch_size)).scalars().all()
+        if not ids:
+            return removed
+        db.execute(delete(Ev).where(Ev.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        removed += len(ids)
+
+
 def get_checked_out_items(db: Session, account_id: str) -> list[models.CheckedOutItem]:
     """Get all items checked out for an account."""
-    return (
-        db.query(models.CheckedOutItem)
-        .join(models.Item, models.CheckedOutItem.item_id == models.Item.id)
-        .filter(models.Item.account_id == account_id)
-        .all()
-    )
+    return db.query(models.CheckedOutItem).filter(models.CheckedOutItem.account_id == account_id).all()
 
 
 def get_item_with_checkout_status(db: Session, item_id: str, account_id: str) -> models.Item | None:
@@ -411,10 +1645,7 @@ def get_statistics(db: Session, account_id: str) -> dict:
     
     # Count checked out items for this user
     checked_out_items_count = (
-        db.query(models.CheckedOutItem)
-        .join(models.Item, models.CheckedOutItem.item_id == models.Item.id)
-        .filter(models.Item.account_id == account_id)
-        .count()
+        db.query(models.CheckedOutItem).filter(models.CheckedOutItem.account_id == account_id).count()
     )
     
     return {
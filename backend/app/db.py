@@ -1,14 +1,42 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+import itertools
 import os
+import threading
+import time
 
 # Allow overriding via env for containerized deployments
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./totes.db")
+# Comma-separated replica URLs; read-only routes prefer these when set
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+# After an account writes, its reads stay on the primary this long so replica lag can't hide the write
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# A replica that failed a connection attempt is skipped this long before being retried
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# PostgreSQL only: hash-partition the per-account hot tables into this many
+# partitions (0 = off); see app.partitioning
+TENANT_PARTITIONS = int(os.getenv("TENANT_PARTITIONS", "0"))
 
-# SQLite needs special connect args
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def make_engine(url: str):
+    # SQLite needs special connect args
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine_kwargs = {}
+    if not url.startswith("sqlite"):
+        # Each worker process owns a pool; keep workers * (size + overflow) under the server's max_connections
+        engine_kwargs = {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+            "pool_pre_ping": True,
+        }
+    return create_engine(url, connect_args=connect_args, **engine_kwargs)
+
+
+engine = make_engine(DATABASE_URL)
+# Loaded objects stay usable after commit: routes serialise what crud just
+# wrote without a refresh SELECT per object
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
@@ -24,3 +52,106 @@ def get_session():
         yield db
     finally:
         db.close()
+
+
+# Read replicas
+
+
+class ReplicaRouter:
+    """Choose where an account's read-only request runs.
+
+    Replicas are used round-robin while healthy; an account that committed a
+    write within the stickiness window reads from the primary. Write times are
+    tracked per process, so with several workers a follow-up request served by
+    another worker may still see replica lag up to the window.
+    """
+
+    def __init__(self, replicas, sticky_seconds: float = READ_YOUR_WRITES_SECONDS, retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._down_until: dict[int, float] = {}
+        self._last_write: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def note_write(self, account_id: str) -> None:
+        with self._lock:
+            self._last_write[account_id] = time.monotonic()
+
+    def mark_down(self, replica) -> None:
+        with self._lock:
+            self._down_until[self.replicas.index(replica)] = time.monotonic() + self.retry_seconds
+
+    def replica_for(self, account_id: str):
+        """Return a healthy replica engine, or None to read from the primary."""
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_write.get(account_id)
+            if last is not None:
+                if now - last < self.sticky_seconds:
+                    return None
+                del self._last_write[account_id]
+            for _ in range(len(self.replicas)):
+                idx = next(self._cycle)
+                if self._down_until.get(idx, 0) <= now:
+                    return self.replicas[idx]
+        return None
+
+
+router = ReplicaRouter([make_engine(url) for url in READ_REPLICA_URLS])
+
+_WRITTEN_ACCOUNTS_KEY = "written_accounts"
+
+
+def mark_account_written(db: Session, account_id: str) -> None:
+    """Note that this transaction writes account data; takes effect on commit."""
+    db.info.setdefault(_WRITTEN_ACCOUNTS_KEY, set()).add(account_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_writes(session: Session) -> None:
+    for account_id in session.info.pop(_WRITTEN_ACCOUNTS_KEY, ()):
+        router.note_write(account_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session: Session) -> None:
+    session.info.pop(_WRITTEN_ACCOUNTS_KEY, None)
+
+
+def read_session(
+    account_id: str,
+    replica_router: ReplicaRouter | None = None,
+    session_factory=SessionLocal,
+    primary: Session | None = None,
+):
+    """Yield a session for read-only work, on a replica when one is eligible.
+
+    The replica connection is opened up front so an unreachable replica is
+    marked down and the request falls back to the primary instead of failing.
+    The primary session is `primary` when given (its owner closes it), else a
+    new one from session_factory.
+    """
+    replica_router = replica_router or router
+    replica = replica_router.replica_for(account_id)
+    db = None
+    if replica is not None:
+        db = session_factory(bind=replica)
+        try:
+            db.connection()
+        except DBAPIError:
+            db.close()
+            replica_router.mark_down(replica)
+            db = None
+    if db is None:
+        if primary is not None:
+            yield primary
+            return
+        db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,278 @@
+"""Per-account change notifications pushed to connected clients.
+
+crud queues a change on the session whenever it records one in the change
+log; after the transaction commits the batch is handed to the broker's
+sender thread, which publishes it to every subscriber of that account.
+Rolled back transactions publish nothing, and a backend that fails to
+publish is logged, never raised out of the commit that already succeeded.
+
+The broker's backend decides how batches reach other processes:
+LocalBackend delivers in-process only (single worker, tests), RedisBackend
+relays through Redis pub/sub and PostgresNotifyBackend through LISTEN/NOTIFY
+on the application database, so every worker sees every commit. Selected
+via EVENTS_BACKEND_URL; when unset, a PostgreSQL DATABASE_URL implies
+PostgresNotifyBackend and anything else falls back to local.
+"""
+import asyncio
+import json
+import os
+import queue
+import select
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+EVENTS_BACKEND_URL = os.getenv("EVENTS_BACKEND_URL", "")
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_SUBSCRIBER_QUEUE_SIZE", "1000"))
+# Committed batches waiting for the sender thread; more are dropped while the backend is stuck
+OUTBOX_SIZE = int(os.getenv("EVENTS_OUTBOX_SIZE", "10000"))
+# Idle streams send a comment this often so proxies don't close them
+KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
+# Sent instead of the dropped batch when a slow subscriber's queue overflows
+RESYNC = {"type": "resync"}
+
+
+class LocalBackend:
+    """In-process backend: published batches are delivered straight back."""
+
+    def start(self, deliver: Callable[[str, dict], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, account_id: str, payload: dict) -> None:
+        self._deliver(account_id, payload)
+
+
+class RedisBackend:
+    """Relay batches between processes over a single Redis pub/sub channel."""
+
+    channel = "totetrack:events"
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for multi-process fan-out
+
+        self._client = redis.Redis.from_url(url)
+
+    def start(self, deliver: Callable[[str, dict], None]) -> None:
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+
+        def listen():
+            for message in pubsub.listen():
+                try:
+                    data = json.loads(message["data"])
+                    deliver(data["account_id"], data["payload"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+        threading.Thread(target=listen, name="events-redis-listener", daemon=True).start()
+
+    def publish(self, account_id: str, payload: dict) -> None:
+        self._client.publish(self.channel, json.dumps({"account_id": account_id, "payload": payload}))
+
+
+class PostgresNotifyBackend:
+    """Relay batches between processes with PostgreSQL LISTEN/NOTIFY."""
+
+    channel = "totetrack_events"
+    # NOTIFY payloads are capped at 8000 bytes; bigger batches become a resync hint
+    max_payload = 7900
+
+    def __init__(self, url: str):
+        from sqlalchemy.engine import make_url
+
+        self._dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self._dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def start(self, deliver: Callable[[str, dict], None]) -> None:
+        def listen():
+            while True:
+                try:
+                    conn = self._connect()
+                    conn.cursor().execute(f"LISTEN {self.channel}")
+                    while True:
+                        if select.select([conn], [], [], 30) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            try:
+                                data = json.loads(notify.payload)
+                                deliver(data["account_id"], data["payload"])
+                            except (ValueError, KeyError, TypeError):
+                                continue
+                except Exception:
+                    # Connection lost; reconnect after a pause
+                    time.sleep(2)
+
+        threading.Thread(target=listen, name="events-pg-listener", daemon=True).start()
+
+    def publish(self, account_id: str, payload: dict) -> None:
+        message = json.dumps({"account_id": account_id, "payload": payload})
+        if len(message.encode()) > self.max_payload:
+            message = json.dumps({"account_id": account_id, "payload": RESYNC})
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = self._connect()
+                    self._publish_conn.cursor().execute("SELECT pg_notify(%s, %s)", (self.channel, message))
+                    return
+                except Exception:
+                    self._publish_conn = None
+                    if attempt:
+                        raise
+
+
+class Subscription:
+    def __init__(self, broker: "Broker", account_id: str):
+        self.broker = broker
+        self.account_id = account_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, payload: dict) -> None:
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Drop everything queued; the client catches up through /sync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, backend=None):
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._backend = backend
+        self._started = False
+        self._outbox: queue.Queue = queue.Queue(maxsize=OUTBOX_SIZE)
+        self._sender: threading.Thread | None = None
+
+    @property
+    def backend(self):
+        # Started lazily so importing the app opens no connections or threads
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    if self._backend is None:
+                        self._backend = _make_backend()
+                    self._backend.start(self._fan_out)
+                    self._started = True
+        return self._backend
+
+    def subscribe(self, account_id: str) -> Subscription:
+        """Register a subscriber; must be called from within a running event loop."""
+        self.backend  # start the backend before the first event can arrive
+        sub = Subscription(self, account_id)
+        with self._lock:
+            self._subscribers.setdefault(account_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.account_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.account_id]
+
+    def publish(self, account_id: str, payload: dict) -> None:
+        self.backend.publish(account_id, payload)
+
+    def publish_later(self, account_id: str, payload: dict) -> None:
+        """Queue a batch for the sender thread; never raises."""
+        with self._lock:
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._send_forever, name="events-sender", daemon=True)
+                self._sender.start()
+        try:
+            self._outbox.put_nowait((account_id, payload))
+        except queue.Full:
+            print(f"[events] outbox full, dropping a batch for account {account_id}")
+
+    def _send_forever(self) -> None:
+        while True:
+            account_id, payload = self._outbox.get()
+            try:
+                self.publish(account_id, payload)
+            except Exception as exc:
+                # Backend unreachable; clients still catch up through /sync
+                print(f"[events] publish failed: {exc!r}")
+
+    def _fan_out(self, account_id: str, payload: dict) -> None:
+        # May be called from any thread; hand off to each subscriber's loop
+        with self._lock:
+            subs = list(self._subscribers.get(account_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, payload)
+            except RuntimeError:
+                # Loop already closed; the subscription is stale
+                self.unsubscribe(sub)
+
+
+def format_sse(payload: dict) -> str:
+    return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _make_backend():
+    url = EVENTS_BACKEND_URL or os.getenv("DATABASE_URL", "")
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    if url.startswith("postgresql"):
+        return PostgresNotifyBackend(url)
+    return LocalBackend()
+
+
+broker = Broker()
+
+
+# Session integration
+
+_PENDING_KEY = "pending_events"
+
+
+def queue_change(db: Session, account_id: str, version: int, changes: list[dict]) -> None:
+    """Stage changes to publish once the session's transaction commits."""
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    batch = pending.setdefault(account_id, {"version": version, "changes": []})
+    batch["version"] = max(batch["version"], version)
+    batch["changes"].extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for account_id, batch in pending.items():
+        broker.publish_later(account_id, {"type": "changes", **batch})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,307 @@
+"""Idempotency-Key support for mutating requests.
+
+A client that sends `Idempotency-Key: <unique value>` with a POST, PUT,
+PATCH or DELETE can safely retry it: the first response is stored for
+IDEMPOTENCY_TTL_SECONDS and replayed (with `Idempotent-Replayed: true`) to
+every retry carrying the same key, without running the route again, so no
+second insert, upload or image job happens. Keys are scoped to the caller
+(the token's user, else the client address). Reusing a key on a different
+route is rejected with 422, and a retry that arrives while the first
+attempt is still running gets 409. Only successes and deterministic
+rejections (409, 422) are stored; any other failure (400-404, 429, server
+errors) can be retried for real, e.g. once the caller has logged in again.
+
+The body is deliberately not part of the match: a retried multipart upload
+is re-encoded with a new boundary, and requests stream through untouched.
+
+Responses are stored in the application database (idempotency_keys) by
+default, so a retry is recognised whichever worker or replica it reaches.
+IDEMPOTENCY_BACKEND_URL=redis://... keeps them in Redis instead (redis is an
+optional dependency), and IDEMPOTENCY_BACKEND_URL=memory in process memory,
+which only suits a single worker.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app import db, security
+import app.models as models
+
+IDEMPOTENCY_BACKEND_URL = os.getenv("IDEMPOTENCY_BACKEND_URL", "")
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a key stays locked by an attempt that never finishes (crashed worker)
+IN_FLIGHT_TTL_SECONDS = 60
+# Share of stored responses that also sweep expired rows from the database store
+CLEANUP_PROBABILITY = 0.01
+
+MUTATING_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+# Error responses a retry would only get again; every other failure is re-attempted
+STORED_ERROR_STATUSES = (409, 422)
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+def _encode(fingerprint: str, status: int, headers: list, body: bytes) -> bytes:
+    """Pack a response as zlib-compressed JSON metadata + body."""
+    meta = json.dumps({"f": fingerprint, "s": status, "h": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers]})
+    return zlib.compress(meta.encode() + b"\n" + body)
+
+
+def _decode(record: bytes) -> tuple[str, int, list, bytes]:
+    meta, _, body = zlib.decompress(record).partition(b"\n")
+    data = json.loads(meta)
+    return data["f"], data["s"], [(k.encode("latin-1"), v.encode("latin-1")) for k, v in data["h"]], body
+
+
+class InMemoryResponseStore:
+    """Stored responses in process memory, evicted oldest-first once expired or over max_keys."""
+
+    max_keys = 20_000
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.ttl = ttl
+        # key -> (expires_at, record); every entry gets the same TTL, so insertion order is expiry order
+        self._records: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._in_flight: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._records.get(key)
+            return entry[1] if entry else None
+
+    def reserve(self, key: str) -> bool:
+        """Mark key as being worked on; False if another attempt holds it or already stored its response."""
+        now = time.monotonic()
+        with self._lock:
+            if self._in_flight.get(key, 0) > now or self._records.get(key, (0,))[0] > now:
+                return False
+            self._in_flight[key] = now + IN_FLIGHT_TTL_SECONDS
+            return True
+
+    def put(self, key: str, record: bytes) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._records.pop(key, None)
+            self._records[key] = (now + self.ttl, record)
+            self._in_flight.pop(key, None)
+            self._evict(now)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        while self._records:
+            key, (expires_at, _) = next(iter(self._records.items()))
+            if expires_at > now and len(self._records) <= self.max_keys:
+                return
+            del self._records[key]
+
+
+class DatabaseResponseStore:
+    """Stored responses in the application database's idempotency_keys table."""
+
+    # Calls do I/O, so the middleware runs them in the threadpool
+    blocking = True
+
+    def __init__(self, engine=None, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self._engine = engine
+        self.ttl = ttl
+
+    @property
+    def engine(self):
+        return self._engine or db.engine
+
+    def get(self, key: str) -> bytes | None:
+        K = models.IdempotencyKey
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(K.record).where(K.key == key, K.record.is_not(None), K.expires_at > datetime.utcnow())
+            ).scalar()
+
+    def reserve(self, key: str) -> bool:
+        K = models.IdempotencyKey
+        now = datetime.utcnow()
+        lock = {"record": None, "locked_until": now + timedelta(seconds=IN_FLIGHT_TTL_SECONDS),
+                "expires_at": now + timedelta(seconds=self.ttl)}
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(K).values(key=key, **lock))
+            return True
+        except IntegrityError:
+            pass
+        # The row exists: take it over only if it expired or its attempt was abandoned
+        with self.engine.begin() as conn:
+            taken = conn.execute(
+                update(K)
+                .where(K.key == key, or_(K.expires_at <= now, K.record.is_(None) & (K.locked_until <= now)))
+                .values(**lock)
+            )
+        return taken.rowcount == 1
+
+    def put(self, key: str, record: bytes) -> None:
+        K = models.IdempotencyKey
+        now = datetime.utcnow()
+        values = {"record": record, "locked_until": None, "expires_at": now + timedelta(seconds=self.ttl)}
+        with self.engine.begin() as conn:
+            if conn.execute(update(K).where(K.key == key).values(**values)).rowcount == 0:
+                conn.execute(insert(K).values(key=key, **values))
+            if random.random() < CLEANUP_PROBABILITY:
+                conn.execute(delete(K).where(K.expires_at <= now))
+
+    def release(self, key: str) -> None:
+        K = models.IdempotencyKey
+        with self.engine.begin() as conn:
+            conn.execute(delete(K).where(K.key == key, K.record.is_(None)))
+
+
+class RedisResponseStore:
+    """Stored responses shared through Redis, expired by Redis itself."""
+
+    blocking = True
+
+    def __init__(self, url: str, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        import redis  # optional dependency, only needed for shared keys
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> bytes | None:
+        return self._client.get(f"idempotency:{key}")
+
+    def reserve(self, key: str) -> bool:
+        return bool(self._client.set(f"idempotency:{key}:lock", 1, nx=True, ex=IN_FLIGHT_TTL_SECONDS))
+
+    def put(self, key: str, record: bytes) -> None:
+        pipe = self._client.pipeline()
+        pipe.set(f"idempotency:{key}", record, ex=int(self.ttl))
+        # The lock lives as long as the response, so a late reserve() fails and replays it
+        pipe.set(f"idempotency:{key}:lock", 1, ex=int(self.ttl))
+        pipe.execute()
+
+    def release(self, key: str) -> None:
+        self._client.delete(f"idempotency:{key}:lock")
+
+
+def _make_store():
+    if IDEMPOTENCY_BACKEND_URL.startswith(("redis://", "rediss://")):
+        return RedisResponseStore(IDEMPOTENCY_BACKEND_URL)
+    if IDEMPOTENCY_BACKEND_URL == "memory":
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            print("[idempotency] IDEMPOTENCY_BACKEND_URL=memory keeps keys per worker; retries reaching "
+                  "another worker will run again")
+        return InMemoryResponseStore()
+    return DatabaseResponseStore()
+
+
+store = _make_store()
+
+
+def _principal(scope, headers: dict) -> str:
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    if auth.lower().startswith("bearer "):
+        claims = security.decode_token_claims(auth[7:])
+        if claims and claims.get("sub"):
+            return f"user:{claims['sub']}"
+    client = scope.get("client") or ("unknown", 0)
+    return f"ip:{client[0]}"
+
+
+async def _respond(send, status: int, headers: list, body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _reject(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await _respond(send, status, [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ], body)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for repeated Idempotency-Keys."""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or store
+
+    async def _call(self, method, *args):
+        if getattr(self.store, "blocking", False):
+            return await run_in_threadpool(getattr(self.store, method), *args)
+        return getattr(self.store, method)(*args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        client_key = headers.get(HEADER)
+        if client_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            await _reject(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+            return
+
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b"")])
+        ).hexdigest()
+        key = hashlib.sha256(_principal(scope, headers).encode() + b"\0" + client_key).hexdigest()
+
+        stored = await self._call("get", key)
+        if stored is None and not await self._call("reserve", key):
+            # The first attempt may have finished between the lookup and the reservation
+            stored = await self._call("get", key)
+            if stored is None:
+                await _reject(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+        if stored is not None:
+            stored_fingerprint, status, stored_headers, stored_body = _decode(stored)
+            if stored_fingerprint != fingerprint:
+                await _reject(send, 422, "Idempotency-Key was already used for a different endpoint")
+                return
+            await _respond(send, status, stored_headers + [(b"idempotent-replayed", b"true")], stored_body)
+            return
+
+        response = {"status": None, "headers": [], "body": [], "finished": False}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers") or [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if not message.get("more_body"):
+                    response["finished"] = True
+                    status = response["status"]
+                    if 200 <= status < 300 or status in STORED_ERROR_STATUSES:
+                        record = _encode(fingerprint, status, response["headers"], b"".join(response["body"]))
+                        await self._call("put", key, record)
+                    else:
+                        await self._call("release", key)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            # Nothing to store if the route raised or the response never completed
+            if not response["finished"]:
+                await self._call("release", key)
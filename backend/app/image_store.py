@@ -1,11 +1,24 @@
 from pathlib import Path
 from typing import BinaryIO
-from PIL import Image
+import os
 import re
 import unicodedata
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 MEDIA_DIR = Path("media")
-MEDIA_DIR.mkdir(exist_ok=True)
+# Uploads wait here (same filesystem, so publishing is an atomic rename) until their row commits
+STAGING_DIRNAME = ".staging"
+# Ingest budget for uploads: longest side in pixels and JPEG re-encode quality
+MAX_IMAGE_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+def ensure_media_dir() -> None:
+    """Create the media directory; called from the startup hook, not at import."""
+    MEDIA_DIR.mkdir(exist_ok=True)
 
 
 def sanitize_filename(name: str, max_length: int = 40) -> str:
@@ -50,21 +63,115 @@ def sanitize_filename(name: str, max_length: int = 40) -> str:
     return name or "item"
 
 
-def save_image(file: BinaryIO, dest_name: str) -> str:
-    """Save image file"""
-    path = MEDIA_DIR / dest_name
-    with open(path, "wb") as f:
-        f.write(file.read())
-    # sanity‑check the image
+def _open_image(source):
+    """Image.open, reporting decompression bombs as OSError like any other unreadable upload."""
+    from PIL import Image
+
     try:
-        img = Image.open(path)
-        img.verify()
-    except Exception:
-        path.unlink(missing_ok=True)
-        raise
+        return Image.open(source)
+    except Image.DecompressionBombError as exc:
+        raise OSError(str(exc)) from exc
+
+
+def save_image(file: BinaryIO, dest_name: str, directory: Path | None = None) -> str:
+    """Normalise an uploaded image and store it; returns the stored path.
+
+    The upload is decoded, rotated upright per its EXIF orientation, scaled
+    down to fit MAX_IMAGE_DIMENSION and re-encoded without EXIF/XMP blocks or
+    embedded thumbnails (the ICC profile is kept so colours don't shift).
+    Images with transparency are stored as PNG, everything else as JPEG at
+    JPEG_QUALITY; dest_name's extension is replaced to match. The file goes
+    to `directory` (default MEDIA_DIR). Raises OSError if the upload isn't a
+    readable image or is too large to decode safely.
+    """
+    from PIL import Image, ImageOps  # deferred: Pillow is only needed once an upload arrives
+
+    with _open_image(file) as original:
+        # JPEGs can decode at a reduced scale when far larger than the budget
+        original.draft(original.mode, (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+        icc_profile = original.info.get("icc_profile")
+        img = ImageOps.exif_transpose(original)
+        img.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+
+    directory = MEDIA_DIR if directory is None else directory
+
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        path = (directory / dest_name).with_suffix(".png")
+        img.save(path, "PNG", optimize=True, icc_profile=icc_profile)
+    else:
+        path = (directory / dest_name).with_suffix(".jpg")
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True, icc_profile=icc_profile)
     return str(path)
 
 
+def image_size(image_path: str) -> tuple[int, int] | None:
+    """(width, height) of a stored image, read from its header; None if unreadable."""
+    from PIL import Image
+
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except OSError:
+        return None
+
+
+def perceptual_hash(source) -> int:
+    """64-bit difference hash (dHash) of an image path or file object.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so re-encoded,
+    resized or slightly retouched copies of a photo hash within a few bits.
+    """
+    from PIL import Image, ImageOps
+
+    with _open_image(source) as img:
+        img.draft("L", (64, 64))  # JPEGs decode straight to a small grayscale image
+        img = ImageOps.exif_transpose(img)
+        pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def scan_media(subdir: str | None = None):
+    """Yield (name, size, mtime) for every regular file in MEDIA_DIR (or a subdirectory of it).
+
+    Hidden entries and subdirectories are skipped. A missing directory
+    yields nothing.
+    """
+    try:
+        entries = os.scandir(MEDIA_DIR / subdir if subdir else MEDIA_DIR)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                continue
+            st = entry.stat(follow_symlinks=False)
+            yield entry.name, st.st_size, st.st_mtime
+
+
+def delete_media_file(name: str, older_than: float, subdir: str | None = None) -> bool:
+    """Remove MEDIA_DIR[/subdir]/name unless it was modified at or after `older_than`.
+
+    The modification time is checked again just before unlinking, so a file
+    that was re-uploaded under the same name since it was scanned is kept.
+    Returns True if the file was removed.
+    """
+    target = (MEDIA_DIR / subdir if subdir else MEDIA_DIR) / Path(name).name
+    try:
+        if target.stat().st_mtime >= older_than:
+            return False
+        target.unlink()
+    except OSError:
+        return False
+    return True
+
+
 def delete_image(image_path: str | None) -> None:
     """Delete an image file if it exists. Accepts absolute or stored path.
 
@@ -82,3 +189,69 @@ def delete_image(image_path: str | None) -> None:
     except Exception:
         # Best-effort cleanup: ignore errors to avoid breaking API flows
         pass
+
+
+# Two-phase media writes
+#
+# Routes stage uploads and crud discards replaced images against the session
+# instead of touching MEDIA_DIR directly. Once the transaction commits, staged
+# files are renamed into place and discarded ones deleted; if it rolls back
+# (or the session closes uncommitted) staged files are removed and discarded
+# ones kept, so rows and files never disagree.
+
+_STAGED_KEY = "staged_media"
+_DISCARDED_KEY = "discarded_media"
+
+
+def stage_image(db: Session, file: BinaryIO, dest_name: str) -> str:
+    """Normalise an upload into the staging area; returns the path to store on the row.
+
+    A short random suffix keeps the name unique, so a new upload never
+    overwrites a file another item (or this item's previous version) uses.
+    """
+    staging = MEDIA_DIR / STAGING_DIRNAME
+    staging.mkdir(parents=True, exist_ok=True)
+    dest = Path(dest_name)
+    staged = Path(save_image(file, f"{dest.stem}_{uuid.uuid4().hex[:8]}{dest.suffix}", directory=staging))
+    final = str(MEDIA_DIR / staged.name)
+    if not db.in_transaction():
+        db.begin()  # so closing the session without a commit still cleans up
+    db.info.setdefault(_STAGED_KEY, {})[final] = staged
+    return final
+
+
+def stored_image_size(db: Session, image_path: str) -> tuple[int, int] | None:
+    """image_size() for a stored path, reading the staged copy if it isn't published yet."""
+    staged = db.info.get(_STAGED_KEY, {}).get(image_path)
+    return image_size(str(staged) if staged else image_path)
+
+
+def discard_image(db: Session, image_path: str | None) -> None:
+    """Delete a stored image once the session's transaction commits."""
+    if not image_path:
+        return
+    staged = db.info.get(_STAGED_KEY, {}).pop(image_path, None)
+    if staged is not None:  # replaced before it was ever published
+        staged.unlink(missing_ok=True)
+        return
+    db.info.setdefault(_DISCARDED_KEY, []).append(image_path)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_staged_media(session: Session) -> None:
+    for final, staged in session.info.pop(_STAGED_KEY, {}).items():
+        try:
+            os.replace(staged, final)
+        except OSError:
+            pass  # left in staging; the media garbage collector reclaims it
+    for image_path in session.info.pop(_DISCARDED_KEY, ()):
+        delete_image(image_path)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_unpublished_media(session: Session, transaction) -> None:
+    if transaction.parent is not None:  # savepoint; the outer transaction decides
+        return
+    for staged in session.info.pop(_STAGED_KEY, {}).values():
+        staged.unlink(missing_ok=True)
+    session.info.pop(_DISCARDED_KEY, None)
@@ -1,19 +1,24 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, status
+from fastapi import FastAPI, BackgroundTasks, Depends, UploadFile, File, HTTPException, Form, Query, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-import os
+from datetime import datetime, timedelta
 from app import security
 
-from app.db import Base, engine, get_session
+from app.db import SessionLocal, get_session, read_session
+from app import startup
 import app.models as models
 import app.schemas as schemas
 import app.crud as crud
 import app.image_store as image_store
-
-Base.metadata.create_all(bind=engine)
+import app.purge as purge
+import app.events as events
+import app.ratelimit as ratelimit
+import app.idempotency as idempotency
+import app.profiling as profiling
 
 # Instantiate app early so decorators below work
 openapi_tags = [
@@ -22,9 +27,21 @@ openapi_tags = [
     {"name": "totes", "description": "CRUD operations for totes."},
     {"name": "items", "description": "CRUD operations for items, including image upload and deletion."},
     {"name": "locations", "description": "CRUD operations for locations."},
+    {"name": "sync", "description": "Incremental change feed and live change stream for clients."},
+    {"name": "admin", "description": "Operational insight for superusers."},
 ]
 
 app = FastAPI(title="Tote Inventory API", openapi_tags=openapi_tags)
+if profiling.PROFILING_ENABLED:
+    # Set before any route is declared so every endpoint can be CPU-profiled
+    app.router.route_class = profiling.ProfiledRoute
+    # Innermost: timings cover the route itself, not admission queueing or replays
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Inside admission: only admitted requests reach it, and rejections (429/503) are never stored
+app.add_middleware(idempotency.IdempotencyMiddleware)
+if ratelimit.RATE_LIMIT_ENABLED:
+    # Added before CORS so CORS stays outermost and 429/503 responses remain readable by browsers
+    app.add_middleware(ratelimit.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -33,37 +50,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve media files
-app.mount("/media", StaticFiles(directory="media"), name="media")
+# Serve media files; the directory is created by the startup hook
+app.mount("/media", StaticFiles(directory=image_store.MEDIA_DIR, check_dir=False), name="media")
 
 
 @app.on_event("startup")
-def init_superuser():
-    from app.db import SessionLocal  # local import to avoid cycles
-    email = os.getenv("INITIAL_SUPERUSER_EMAIL")
-    password = os.getenv("INITIAL_SUPERUSER_PASSWORD")
-    account_name = os.getenv("INITIAL_ACCOUNT_NAME", "Default Account")
-    if not email or not password:
-        return
-    with SessionLocal() as db:
-        print("[startup] Checking for initial superuser", email)
-        existing = crud.get_user_by_email(db, email.lower())
-        
-        print(f"[startup] found {email}" if existing else "not found")
-        if not existing:
-            try:
-                account, owner = crud.create_account(db, schemas.AccountCreate(
-                    name=account_name,
-                    owner_email=email,
-                    owner_full_name="Admin",
-                    owner_password=password,
-                ))
-                print("[startup] Created initial account", account.name, "with superuser", owner.email)
-            except ValueError as exc:
-                print(f"[startup] Failed to create initial account: {exc}")
-
-
-    # Purge mode: no automatic migrations. Ensure a clean DB by deleting the SQLite file before starting the app.
+def on_startup():
+    startup.run_startup_tasks()
+    purge.start_worker()
+
+
+def _deletion_out(deletion: models.Deletion) -> schemas.DeletionOut:
+    return schemas.DeletionOut(
+        id=deletion.id,
+        entity_type=deletion.entity_type,
+        entity_id=deletion.entity_id,
+        deleted_at=deletion.deleted_at,
+        restore_until=deletion.deleted_at + crud.DELETE_RETENTION,
+    )
+
+
+def get_read_session(
+    current_user: models.User = Depends(security.get_current_active_user),
+    primary: Session = Depends(get_session),
+):
+    """Session for read-only routes: a read replica when configured and the account hasn't just written.
+
+    Otherwise it is the request's get_session session, so overriding get_session covers reads too.
+    """
+    yield from read_session(current_user.account_id, primary=primary)
 
 
 # Auth & Users
@@ -96,7 +111,7 @@ def login_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Ses
     user = crud.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
-    token = security.create_access_token(user.id)
+    token = security.create_access_token(user.id, account_id=user.account_id, superuser=user.is_superuser)
     return {"access_token": token, "token_type": "bearer"}
 
 
@@ -205,21 +220,35 @@ def create_tote(
     db: Session = Depends(get_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
-    return crud.create_tote(db, tote, account_id=current_user.account_id)
+    try:
+        return crud.create_tote(db, tote, account_id=current_user.account_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/totes", response_model=List[schemas.ToteOut], tags=["totes"])
 def get_totes(
-    db: Session = Depends(get_session),
+    location_id: str | None = None,
+    attr: List[str] = Query(default=[], description="Attribute filters: key:value, key>=n, key<n, ... (all must match)"),
+    name: str | None = Query(None, description="Case-insensitive name prefix"),
+    sort: str | None = Query(None, description="name or -name"),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
-    return crud.list_totes(db, account_id=current_user.account_id)
+    try:
+        filters = [crud.parse_attribute_filter(expr) for expr in attr]
+        return crud.list_totes(
+            db, account_id=current_user.account_id,
+            attribute_filters=filters, location_id=location_id, name_prefix=name, sort=sort,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/totes/{tote_id}", response_model=schemas.ToteOut, tags=["totes"])
 def get_tote(
     tote_id: str,
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     m = crud.get_tote_by_id(db, tote_id, current_user.account_id)
@@ -228,21 +257,47 @@ def get_tote(
     return m
 
 
-@app.delete("/totes/{tote_id}", tags=["totes"])
+@app.delete("/totes/{tote_id}", response_model=schemas.DeletionOut, status_code=202, tags=["totes"])
 def delete_tote(
     tote_id: str,
     db: Session = Depends(get_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
+    """Delete a tote and its items; they are purged in the background and can be restored until then."""
     tote = crud.get_tote(db, tote_id, account_id=current_user.account_id)
     if not tote:
         raise HTTPException(status_code=404, detail="Tote not found")
-    # Cleanup item images before deleting via cascade
-    for it in tote.items:
-        if it.image_path:
-            image_store.delete_image(it.image_path)
-    crud.delete_tote(db, tote)
-    return {"ok": True}
+    return _deletion_out(crud.delete_tote(db, tote))
+
+
+@app.post("/totes/{tote_id}/restore", response_model=schemas.ToteOut, tags=["totes"])
+def restore_tote(
+    tote_id: str,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Undo a tote deletion, items included, within the retention window."""
+    deletion = crud.get_deletion(db, current_user.account_id, "tote", tote_id)
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Deleted tote not found")
+    return crud.restore_deletion(db, deletion)
+
+
+@app.post("/totes/move", response_model=schemas.BulkToteMoveOut, tags=["totes"])
+def move_totes(
+    payload: schemas.BulkToteMove,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Move a batch of totes (and everything inside them) to one location, with a status per tote."""
+    try:
+        results = crud.move_totes(db, current_user.account_id, payload.tote_ids, payload.location_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.BulkToteMoveOut(
+        moved=sum(1 for status_ in results.values() if status_ == crud.BULK_MOVED),
+        results=[schemas.BulkToteResult(tote_id=tid, status=status_) for tid, status_ in results.items()],
+    )
 
 
 @app.put("/totes/{tote_id}", response_model=schemas.ToteOut, tags=["totes"])
@@ -255,8 +310,39 @@ def update_tote(
     tote = crud.get_tote(db, tote_id, account_id=current_user.account_id)
     if not tote:
         raise HTTPException(status_code=404, detail="Tote not found")
-    updated = crud.update_tote(db, tote, tote_in)
-    return updated
+    try:
+        return crud.update_tote(db, tote, tote_in)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/totes/{tote_id}/contents", response_model=schemas.ToteContentsOut, tags=["totes"])
+def get_tote_contents(
+    tote_id: str,
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Every tote and item packed inside this tote, at any depth."""
+    tote = crud.get_tote(db, tote_id, account_id=current_user.account_id)
+    if not tote:
+        raise HTTPException(status_code=404, detail="Tote not found")
+    totes, items = crud.list_tote_contents(db, tote)
+    return {
+        "totes": totes,
+        "items": [
+            {
+                "id": r.id,
+                "name": r.name,
+                "description": r.description,
+                "quantity": r.quantity,
+                "image_url": f"/media/{r.image_path.split('/')[-1]}" if r.image_path else None,
+                "image_width": r.image_width,
+                "image_height": r.image_height,
+                "tote_id": r.tote_id,
+            }
+            for r in items
+        ],
+    }
 
 # Locations
 
@@ -267,12 +353,15 @@ def create_location(
     db: Session = Depends(get_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
-    return crud.create_location(db, location, account_id=current_user.account_id)
+    try:
+        return crud.create_location(db, location, account_id=current_user.account_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/locations", response_model=List[schemas.LocationOut], tags=["locations"])
 def get_locations(
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     return crud.list_locations(db, account_id=current_user.account_id)
@@ -281,7 +370,7 @@ def get_locations(
 @app.get("/locations/{location_id}", response_model=schemas.LocationOut, tags=["locations"])
 def get_location(
     location_id: str,
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     location = crud.get_location(db, location_id, account_id=current_user.account_id)
@@ -290,17 +379,35 @@ def get_location(
     return location
 
 
-@app.delete("/locations/{location_id}", tags=["locations"])
+@app.delete("/locations/{location_id}", response_model=schemas.DeletionOut, status_code=202, tags=["locations"])
 def delete_location(
     location_id: str,
+    reassign_to: str | None = None,
     db: Session = Depends(get_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
+    """Delete a location; its totes move to `reassign_to`, or to no location when omitted."""
     location = crud.get_location(db, location_id, account_id=current_user.account_id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
-    crud.delete_location(db, location)
-    return {"ok": True}
+    try:
+        deletion = crud.delete_location(db, location, reassign_to=reassign_to)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _deletion_out(deletion)
+
+
+@app.post("/locations/{location_id}/restore", response_model=schemas.LocationOut, tags=["locations"])
+def restore_location(
+    location_id: str,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Undo a location deletion within the retention window; moved totes stay where they went."""
+    deletion = crud.get_deletion(db, current_user.account_id, "location", location_id)
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Deleted location not found")
+    return crud.restore_deletion(db, deletion)
 
 
 @app.put("/locations/{location_id}", response_model=schemas.LocationOut, tags=["locations"])
@@ -313,25 +420,126 @@ def update_location(
     location = crud.get_location(db, location_id, account_id=current_user.account_id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
-    updated = crud.update_location(db, location, location_in)
-    return updated
+    try:
+        return crud.update_location(db, location, location_in)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/locations/{location_id}/totes", response_model=List[schemas.ToteOut], tags=["locations"])
 def get_location_totes(
     location_id: str,
-    db: Session = Depends(get_session),
+    recursive: bool = False,
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Totes at this location; with recursive=true, also totes in every nested location."""
+    location = crud.get_location(db, location_id, account_id=current_user.account_id)
+    if not location:
+        raise HTTPException(status_code=404, detail="Location not found")
+    return crud.list_totes_in_location(db, location, recursive=recursive)
+
+
+@app.get("/locations/{location_id}/stats", response_model=schemas.LocationSubtreeStats, tags=["locations"])
+def get_location_stats(
+    location_id: str,
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
+    """Location, tote and item counts for this location and everything nested beneath it."""
     location = crud.get_location(db, location_id, account_id=current_user.account_id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
-    return location.totes
+    return crud.get_location_subtree_stats(db, location)
 
 
 # Items
-@app.post("/items", response_model=schemas.ItemOut, tags=["items"])
+
+
+def _item_with_checkout_status(r: models.Item) -> dict:
+    checkout_info = {
+        "is_checked_out": r.checkout is not None,
+        "checked_out_by": None,
+        "checked_out_at": None,
+    }
+    if r.checkout:
+        checkout_info["checked_out_by"] = r.checkout.user
+        checkout_info["checked_out_at"] = r.checkout.checked_out_at
+    return {
+        "id": r.id,
+        "name": r.name,
+        "description": r.description,
+        "quantity": r.quantity,
+        "image_url": f"/media/{r.image_path.split('/')[-1]}" if r.image_path else None,
+        "image_width": r.image_width,
+        "image_height": r.image_height,
+        "tote_id": r.tote_id,
+        **checkout_info,
+    }
+
+
+def _suggestions(matches: list[tuple[models.Item, float]]) -> list[dict]:
+    return [
+        {"id": item.id, "name": item.name, "tote_id": item.tote_id, "similarity": round(sim, 3)}
+        for item, sim in matches
+    ]
+
+
+def _index_image(account_id: str, item_id: str, image_path: str) -> None:
+    """Background task: perceptual-hash a freshly committed upload."""
+    with SessionLocal() as db:
+        crud.index_item_image(db, account_id, item_id, image_path)
+
+
+def _image_matches(matches: list[tuple[models.Item, int]]) -> list[dict]:
+    return [
+        {
+            "id": item.id,
+            "name": item.name,
+            "tote_id": item.tote_id,
+            "image_url": f"/media/{item.image_path.split('/')[-1]}" if item.image_path else None,
+            "distance": distance,
+        }
+        for item, distance in matches
+    ]
+
+
+@app.post("/items/similar", response_model=List[schemas.ImageMatch], tags=["items"])
+def find_items_by_photo(
+    image: UploadFile = File(...),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Existing items whose photo looks like the uploaded one; nothing is stored."""
+    try:
+        phash = image_store.perceptual_hash(image.file)
+    except OSError:
+        raise HTTPException(status_code=400, detail="Not a readable image")
+    return _image_matches(crud.find_similar_images(db, current_user.account_id, phash, limit=limit))
+
+
+@app.get("/items/suggest", response_model=List[schemas.ItemSuggestion], tags=["items"])
+def suggest_items(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Typo-tolerant name autocomplete ("screwdirver" finds "Screwdriver")."""
+    return _suggestions(crud.suggest_items(db, current_user.account_id, q, limit=limit))
+
+
+def _stage_upload(db: Session, image: UploadFile, dest: str) -> str:
+    try:
+        return image_store.stage_image(db, image.file, dest)
+    except OSError:
+        raise HTTPException(status_code=400, detail="Not a readable image")
+
+
+@app.post("/items", response_model=schemas.ItemCreatedOut, tags=["items"])
 async def create_item_without_tote(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     quantity: int = Form(1),
     description: str | None = Form(None),
@@ -345,25 +553,32 @@ async def create_item_without_tote(
         ext = (image.filename or "bin").split(".")[-1].lower()
         safe_name = image_store.sanitize_filename(name)
         dest = f"orphan_item_{safe_name}.{ext}"
-        image_path = image_store.save_image(image.file, dest)
+        image_path = _stage_upload(db, image, dest)
 
+    duplicates = crud.find_duplicate_items(db, current_user.account_id, name)
     created = crud.add_item(db, current_user.account_id, schemas.ItemCreate(
         name=name, description=description, quantity=quantity
     ), tote_id=None, image_path=image_path)
+    if image_path:
+        background_tasks.add_task(_index_image, created.account_id, created.id, image_path)
 
-    return schemas.ItemOut.model_validate({
+    return schemas.ItemCreatedOut.model_validate({
         "id": created.id,
         "name": created.name,
         "description": created.description,
         "quantity": created.quantity,
         "image_url": f"/media/{image_path.split('/')[-1]}" if image_path else None,
+        "image_width": created.image_width,
+        "image_height": created.image_height,
         "tote_id": None,
+        "possible_duplicates": _suggestions(duplicates),
     })
 
 
-@app.post("/totes/{tote_id}/items", response_model=schemas.ItemOut, tags=["items"])
+@app.post("/totes/{tote_id}/items", response_model=schemas.ItemCreatedOut, tags=["items"])
 async def create_item_in_tote(
     tote_id: str,
+    background_tasks: BackgroundTasks,
     # Explicitly declare form fields so FastAPI reads them from multipart/form-data
     name: str = Form(...),
     quantity: int = Form(1),
@@ -382,53 +597,53 @@ async def create_item_in_tote(
         ext = (image.filename or "bin").split(".")[-1].lower()
         safe_name = image_store.sanitize_filename(name)
         dest = f"tote_{tote_id}_item_{safe_name}.{ext}"
-        image_path = image_store.save_image(image.file, dest)
+        image_path = _stage_upload(db, image, dest)
 
+    duplicates = crud.find_duplicate_items(db, current_user.account_id, name)
     created = crud.add_item(db, current_user.account_id, schemas.ItemCreate(
         name=name, description=description, quantity=quantity), tote_id=tote_id, image_path=image_path)
-    return schemas.ItemOut.model_validate({
+    if image_path:
+        background_tasks.add_task(_index_image, created.account_id, created.id, image_path)
+    return schemas.ItemCreatedOut.model_validate({
         "id": created.id,
         "name": created.name,
         "description": created.description,
         "quantity": created.quantity,
         "image_url": f"/media/{image_path.split('/')[-1]}" if image_path else None,
+        "image_width": created.image_width,
+        "image_height": created.image_height,
         "tote_id": tote_id,
+        "possible_duplicates": _suggestions(duplicates),
     })
 
 
 @app.get("/items", response_model=List[schemas.ItemWithCheckoutStatus], tags=["items"])
 async def all_items(
-    db: Session = Depends(get_session),
+    tote_id: str | None = None,
+    location_id: str | None = None,
+    checked_out: bool | None = None,
+    min_quantity: int | None = None,
+    max_quantity: int | None = None,
+    name: str | None = Query(None, description="Case-insensitive name prefix"),
+    sort: str | None = Query(None, description="name, quantity; prefix with - for descending"),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
-    rows = crud.list_items(db, current_user.account_id)
-    out = []
-    for r in rows:
-        checkout_info = {
-            "is_checked_out": r.checkout is not None,
-            "checked_out_by": None,
-            "checked_out_at": None,
-        }
-        if r.checkout:
-            checkout_info["checked_out_by"] = r.checkout.user
-            checkout_info["checked_out_at"] = r.checkout.checked_out_at
-        
-        out.append({
-            "id": r.id,
-            "name": r.name,
-            "description": r.description,
-            "quantity": r.quantity,
-            "image_url": f"/media/{r.image_path.split('/')[-1]}" if r.image_path else None,
-            "tote_id": r.tote_id,
-            **checkout_info,
-        })
-    return out
+    try:
+        rows = crud.list_items(
+            db, current_user.account_id,
+            tote_id=tote_id, location_id=location_id, checked_out=checked_out,
+            min_quantity=min_quantity, max_quantity=max_quantity, name_prefix=name, sort=sort,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return [_item_with_checkout_status(r) for r in rows]
 
 
 @app.get("/totes/{tote_id}/items", response_model=List[schemas.ItemOut], tags=["items"])
 async def items_in_tote(
     tote_id: str,
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     rows = crud.list_items_in_tote(db, tote_id, current_user.account_id)
@@ -440,6 +655,8 @@ async def items_in_tote(
             "description": r.description,
             "quantity": r.quantity,
             "image_url": f"/media/{r.image_path.split('/')[-1]}" if r.image_path else None,
+            "image_width": r.image_width,
+            "image_height": r.image_height,
             "tote_id": r.tote_id,
         })
     return out
@@ -448,6 +665,7 @@ async def items_in_tote(
 @app.put("/items/{item_id}", response_model=schemas.ItemOut, tags=["items"])
 async def update_item(
     item_id: str,
+    background_tasks: BackgroundTasks,
     name: str | None = Form(None),
     quantity: int | None = Form(None),
     description: str | None = Form(None),
@@ -479,13 +697,15 @@ async def update_item(
         safe_name = image_store.sanitize_filename(name or item.name)
         dest_prefix = f"tote_{item.tote_id}_" if item.tote_id else "orphan_"
         dest = f"{dest_prefix}item_{safe_name}_{item.id}.{ext}"
-        image_path = image_store.save_image(image.file, dest)
+        image_path = _stage_upload(db, image, dest)
 
     updated = crud.update_item(db, item, schemas.ItemUpdate(
         name=name,
         description=description,
         quantity=quantity
     ), image_path=image_path)
+    if image_path:
+        background_tasks.add_task(_index_image, updated.account_id, updated.id, image_path)
 
     return schemas.ItemOut.model_validate({
         "id": updated.id,
@@ -493,11 +713,13 @@ async def update_item(
         "description": updated.description,
         "quantity": updated.quantity,
         "image_url": f"/media/{updated.image_path.split('/')[-1]}" if updated.image_path else None,
+        "image_width": updated.image_width,
+        "image_height": updated.image_height,
         "tote_id": updated.tote_id,
     })
 
 
-@app.delete("/items/{item_id}", tags=["items"])
+@app.delete("/items/{item_id}", response_model=schemas.DeletionOut, status_code=202, tags=["items"])
 async def delete_item(
     item_id: str,
     db: Session = Depends(get_session),
@@ -506,8 +728,62 @@ async def delete_item(
     item = crud.get_item(db, item_id, current_user.account_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    crud.delete_item(db, item)
-    return {"ok": True}
+    return _deletion_out(crud.delete_item(db, item))
+
+
+@app.post("/items/{item_id}/restore", response_model=schemas.ItemOut, tags=["items"])
+async def restore_item(
+    item_id: str,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Undo an item deletion within the retention window (items deleted with their tote come back with it)."""
+    deletion = crud.get_deletion(db, current_user.account_id, "item", item_id)
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Deleted item not found")
+    item = crud.restore_deletion(db, deletion)
+    return schemas.ItemOut.model_validate({
+        "id": item.id,
+        "name": item.name,
+        "description": item.description,
+        "quantity": item.quantity,
+        "image_url": f"/media/{item.image_path.split('/')[-1]}" if item.image_path else None,
+        "image_width": item.image_width,
+        "image_height": item.image_height,
+        "tote_id": item.tote_id,
+    })
+
+
+@app.get("/items/{item_id}/path", response_model=List[schemas.ToteSyncOut], tags=["items"])
+def get_item_path(
+    item_id: str,
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Totes enclosing the item, outermost (e.g. the pallet) first."""
+    item = crud.get_item(db, item_id, current_user.account_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return crud.get_item_tote_path(db, item)
+
+
+@app.get("/items/{item_id}/similar", response_model=List[schemas.ImageMatch], tags=["items"])
+def get_similar_items(
+    item_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Items with photos like this item's; empty until its image has been hashed."""
+    item = crud.get_item(db, item_id, current_user.account_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if item.image_phash is None:
+        return []
+    matches = crud.find_similar_images(
+        db, current_user.account_id, item.image_phash & (1 << 64) - 1, limit=limit, exclude_item_id=item.id,
+    )
+    return _image_matches(matches)
 
 
 @app.delete("/items/{item_id}/image", response_model=schemas.ItemOut, tags=["items"])
@@ -522,12 +798,7 @@ async def delete_item_image(
     item = crud.get_item(db, item_id, current_user.account_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    if item.image_path:
-        image_store.delete_image(item.image_path)
-        item.image_path = None
-        db.add(item)
-        db.commit()
-        db.refresh(item)
+    crud.clear_item_image(db, item)
     return schemas.ItemOut.model_validate({
         "id": item.id,
         "name": item.name,
@@ -572,20 +843,203 @@ async def checkin_item(
     return {"message": "Item checked in successfully"}
 
 
+def _bulk_result(results: dict[str, str], success: str) -> schemas.BulkCheckoutOut:
+    return schemas.BulkCheckoutOut(
+        succeeded=sum(1 for status_ in results.values() if status_ == success),
+        results=[schemas.BulkItemResult(item_id=iid, status=status_) for iid, status_ in results.items()],
+    )
+
+
+@app.post("/items/checkout", response_model=schemas.BulkCheckoutOut, tags=["items"])
+def checkout_items(
+    payload: schemas.BulkItemIds,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Check out a batch of scanned items in one transaction, with a status per item."""
+    results = crud.checkout_items(db, payload.item_ids, current_user)
+    return _bulk_result(results, crud.BULK_CHECKED_OUT)
+
+
+@app.post("/items/checkin", response_model=schemas.BulkCheckoutOut, tags=["items"])
+def checkin_items(
+    payload: schemas.BulkItemIds,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Check in a batch of scanned items in one transaction, with a status per item."""
+    results = crud.checkin_items(db, payload.item_ids, current_user)
+    return _bulk_result(results, crud.BULK_CHECKED_IN)
+
+
 @app.get("/checked-out-items", response_model=List[schemas.CheckedOutItemOut], tags=["items"])
 async def get_checked_out_items(
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     """Get all items checked out from totes owned by the current user."""
     return crud.get_checked_out_items(db, current_user.account_id)
 
 
+@app.get("/checkout-events", response_model=schemas.CheckoutEventPage, tags=["items"])
+def list_checkout_events(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    item_id: str | None = None,
+    user_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Checkout/checkin history for the account, newest first, in [start, end)."""
+    before = None
+    if cursor:
+        try:
+            before = crud.decode_event_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = crud.list_checkout_events(
+        db, current_user.account_id,
+        start=start, end=end, item_id=item_id, user_id=user_id, before=before, limit=limit,
+    )
+    next_cursor = crud.encode_event_cursor(rows[-1]) if len(rows) == limit else None
+    return schemas.CheckoutEventPage(events=rows, next_cursor=next_cursor)
+
+
+@app.post("/checkout-events/compact", response_model=schemas.CompactionOut, tags=["items"])
+def compact_checkout_events(
+    older_than_days: int = Query(..., ge=1),
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_superuser),
+):
+    """Drop the account's checkout history older than the retention window."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    removed = crud.compact_checkout_events(db, cutoff, account_id=current_user.account_id)
+    return schemas.CompactionOut(removed=removed)
+
+
 @app.get("/statistics", response_model=schemas.StatisticsOut, tags=["statistics"])
 async def get_statistics(
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     current_user: models.User = Depends(security.get_current_active_user),
 ):
     """Get summary statistics for the current user's inventory."""
     stats = crud.get_statistics(db, current_user.account_id)
     return schemas.StatisticsOut(**stats)
+
+
+
+# Delta sync
+
+_SYNC_MODELS = {
+    "item": models.Item,
+    "tote": models.Tote,
+    "location": models.Location,
+}
+
+
+@app.get("/sync", response_model=schemas.SyncOut, tags=["sync"])
+def sync_changes(
+    since: int = 0,
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_user),
+):
+    """Return entities changed or deleted after version `since`.
+
+    Clients store the returned `version` and pass it back on the next call.
+    """
+    result = crud.get_changes_since(db, current_user.account_id, since)
+    if result is None:
+        account = crud.get_account(db, current_user.account_id)
+        return schemas.SyncOut(version=account.change_seq if account else 0, full_resync=True)
+    version, changes = result
+
+    out = {"items": [], "totes": [], "locations": [], "deleted": []}
+    for entity_type, model in _SYNC_MODELS.items():
+        ops = changes.get(entity_type, {})
+        upserted = [eid for eid, op in ops.items() if op == crud.CHANGE_UPSERT]
+        found = crud.get_entities_by_ids(db, model, upserted, current_user.account_id)
+        found_ids = {m.id for m in found}
+        # Entities upserted and then removed without a logged delete are reported as deleted
+        gone = [eid for eid, op in ops.items() if op == crud.CHANGE_DELETE or eid not in found_ids]
+        out["deleted"].extend({"entity_type": entity_type, "id": eid} for eid in gone)
+        if entity_type == "item":
+            out["items"] = [_item_with_checkout_status(m) for m in found]
+        else:
+            out[entity_type + "s"] = found
+    return schemas.SyncOut(version=version, **out)
+
+
+@app.post("/events/token", response_model=schemas.StreamTokenOut, tags=["sync"])
+def create_stream_token(current_user: models.User = Depends(security.get_current_active_user)):
+    """Short-lived token for `GET /events?token=`, for clients (EventSource) that cannot send headers.
+
+    It only opens the stream, so it is safe in a URL; fetch a fresh one before each (re)connect.
+    """
+    return {"token": security.create_stream_token(current_user.id), "expires_in": security.STREAM_TOKEN_EXPIRE_SECONDS}
+
+
+@app.get("/events", tags=["sync"])
+async def stream_events(
+    request: Request,
+    current_user: models.User = Depends(security.get_stream_user),
+):
+    """Server-Sent Events stream of committed changes in the caller's account.
+
+    Each `changes` event carries the new change-log `version` plus the changed
+    entities; a `resync` event means events were dropped and the client should
+    call /sync with its last known version.
+    """
+    sub = events.broker.subscribe(current_user.account_id)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                payload = await sub.get(timeout=events.KEEPALIVE_SECONDS)
+                if payload is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield events.format_sse(payload)
+        finally:
+            sub.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Admin
+
+
+@app.get("/admin/metrics", tags=["admin"])
+def admission_metrics(_: models.User = Depends(security.get_current_active_superuser)):
+    """Admission counters for this worker process: admitted, rate_limited, shed, in_flight."""
+    return ratelimit.metrics.snapshot()
+
+
+@app.post("/admin/purge", response_model=schemas.PurgeOut, tags=["admin"])
+def purge_deleted(
+    db: Session = Depends(get_session),
+    current_user: models.User = Depends(security.get_current_active_superuser),
+):
+    """Purge this account's soft deletes past the retention window now instead of waiting for the worker."""
+    return purge.purge_expired(db, account_id=current_user.account_id)
+
+
+@app.get("/admin/profiles", response_model=List[schemas.ProfileSummaryOut], tags=["admin"])
+def list_profiles(current_user: models.User = Depends(security.get_current_active_superuser)):
+    """Stored request profiles for this account, newest first (PROFILING_ENABLED=1 records them)."""
+    return [p for p in profiling.store.recent() if p.get("account_id") == current_user.account_id]
+
+
+@app.get("/admin/profiles/{profile_id}", response_model=schemas.ProfileOut, tags=["admin"])
+def read_profile(profile_id: str, current_user: models.User = Depends(security.get_current_active_superuser)):
+    """One request profile: wall time, SQL statements by total time and the hottest functions."""
+    profile = profiling.store.get(profile_id)
+    if profile is None or profile.get("account_id") != current_user.account_id:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
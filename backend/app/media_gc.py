@@ -0,0 +1,98 @@
+"""Reclaim media files that no item references any more.
+
+Uploads are staged and only published once their row commits, and replaced
+images are deleted after the commit (see image_store), but a process that
+dies in between, or a delete or rename that fails, still leaves files
+nothing points at. The collector snapshots the directory once, streams
+items.image_path once, and diffs the two in memory: two sequential scans,
+no per-file queries.
+
+Files younger than the grace period are never touched, since they may
+belong to a transaction still in progress. Older files in the staging area
+belong to transactions that never finished and are always orphans. The
+sweep spans every account's media, so it is run by the deployment's
+operator from a shell or cron job rather than through the API:
+
+    python -m app.media_gc            # dry run: report recoverable bytes
+    python -m app.media_gc --delete   # actually remove the orphans
+"""
+import argparse
+import json
+import os
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import app.image_store as image_store
+import app.models as models
+
+# Files modified more recently than this may belong to an uncommitted upload
+GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+STREAM_BATCH_SIZE = 1000
+
+
+def _referenced_names(db: Session):
+    """Yield the basename of every stored image path, streamed in batches."""
+    # Soft-deleted items keep their images until they are purged
+    stmt = select(models.Item.image_path).where(models.Item.image_path.isnot(None))
+    for image_path in db.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE, include_deleted=True)).scalars():
+        yield os.path.basename(image_path)
+
+
+def collect_garbage(db: Session, *, dry_run: bool = True, grace_seconds: int | None = None) -> dict:
+    """Find (and unless dry_run, delete) media files no item references.
+
+    Returns a report: files scanned, orphans found and their total size,
+    bytes actually reclaimed, and how many stored paths point at a file
+    that no longer exists.
+    """
+    grace = GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace
+    # name -> (size, mtime); the directory snapshot is taken before the
+    # database scan so a file uploaded in between is simply not considered
+    files = {name: (size, mtime) for name, size, mtime in image_store.scan_media()}
+
+    referenced: set[str] = set()
+    missing = 0
+    for name in _referenced_names(db):
+        if name in files:
+            referenced.add(name)
+        else:
+            missing += 1
+    orphans = [
+        (None, name, size) for name, (size, mtime) in files.items() if name not in referenced and mtime < cutoff
+    ]
+    staged = list(image_store.scan_media(image_store.STAGING_DIRNAME))
+    orphans += [(image_store.STAGING_DIRNAME, name, size) for name, size, mtime in staged if mtime < cutoff]
+
+    reclaimed = 0
+    if not dry_run:
+        for subdir, name, size in orphans:
+            if image_store.delete_media_file(name, older_than=cutoff, subdir=subdir):
+                reclaimed += size
+    return {
+        "dry_run": dry_run,
+        "scanned_files": len(files) + len(staged),
+        "orphaned_files": len(orphans),
+        "orphaned_bytes": sum(size for _, _, size in orphans),
+        "reclaimed_bytes": reclaimed,
+        "missing_files": missing,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delete", action="store_true", help="remove orphans instead of only reporting them")
+    parser.add_argument("--grace-seconds", type=int, default=None, help=f"skip newer files (default {GRACE_SECONDS})")
+    args = parser.parse_args(argv)
+
+    from app.db import SessionLocal  # deferred: importing app.db builds the engine from DATABASE_URL
+
+    with SessionLocal() as db:
+        report = collect_garbage(db, dry_run=not args.delete, grace_seconds=args.grace_seconds)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Text, Boolean, DateTime, UniqueConstraint
+from sqlalchemy import DDL, event, func, Column, String, Integer, BigInteger, Float, ForeignKey, Text, Boolean, DateTime, LargeBinary, UniqueConstraint, Index
 from datetime import datetime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
 from app.db import Base
 
+# Materialized tree paths ("/<root id>/.../<own id>/") compare bytewise so a
+# subtree is one contiguous index range; PostgreSQL needs the "C" collation for that.
+TreePath = String().with_variant(String(collation="C"), "postgresql")
+
 
 class Account(Base):
     __tablename__ = "accounts"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False, unique=True, index=True)
+    # Monotonically increasing per-account version, bumped by every recorded change
+    change_seq = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -24,10 +30,19 @@ class Location(Base):
     account_id = Column(String, ForeignKey("accounts.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
+    # building -> room -> shelf -> bin
+    parent_id = Column(String, ForeignKey("locations.id"), nullable=True, index=True)
+    path = Column(TreePath, nullable=False)
+    # Set while soft-deleted (see Deletion)
+    deleted_by = Column(String, ForeignKey("deletions.id"), nullable=True, index=True)
 
     account = relationship("Account", back_populates="locations")
     totes = relationship("Tote", back_populates="location_obj")
 
+    __table_args__ = (
+        Index("ix_locations_account_path", "account_id", "path"),
+    )
+
 
 class Tote(Base):
     __tablename__ = "totes"
@@ -39,13 +54,54 @@ class Tote(Base):
     metadata_json = Column(Text, nullable=True)  # JSON string or notes
     # physical description / size / brand
     description = Column(Text, nullable=True)
+    # pallet -> crate -> tote; nested totes share their outermost tote's location
+    parent_tote_id = Column(String, ForeignKey("totes.id"), nullable=True, index=True)
+    path = Column(TreePath, nullable=False)
+    # Set while soft-deleted (see Deletion)
+    deleted_by = Column(String, ForeignKey("deletions.id"), nullable=True, index=True)
 
+    # account_id is in the join so lazy loads also prune to the account's partition (app.partitioning)
     items = relationship(
-        "Item", back_populates="tote", cascade="all, delete-orphan"
+        "Item", back_populates="tote", cascade="all, delete-orphan",
+        primaryjoin="and_(Tote.id == Item.tote_id, Tote.account_id == Item.account_id)",
     )
 
     account = relationship("Account", back_populates="totes")
     location_obj = relationship("Location", back_populates="totes")
+    # selectin: a page of totes loads all their attributes in one extra query
+    attribute_rows = relationship(
+        "ToteAttribute", back_populates="tote", cascade="all, delete-orphan", lazy="selectin"
+    )
+
+    __table_args__ = (
+        Index("ix_totes_account_path", "account_id", "path"),
+        Index("ix_totes_account_lower_name", "account_id", func.lower(name)),
+        Index("ix_totes_account_location", "account_id", "location_id"),
+    )
+
+    @property
+    def attributes(self) -> dict[str, str]:
+        return {a.key: a.value for a in self.attribute_rows}
+
+
+class ToteAttribute(Base):
+    """Typed key/value tote attribute (size, color, owner, ...), indexed for filtering."""
+    __tablename__ = "tote_attributes"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tote_id = Column(String, ForeignKey("totes.id"), nullable=False)
+    account_id = Column(String, ForeignKey("accounts.id"), nullable=False)
+    key = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+    # Set when the value is numeric, for range filters
+    num_value = Column(Float, nullable=True)
+
+    tote = relationship("Tote", back_populates="attribute_rows")
+
+    __table_args__ = (
+        UniqueConstraint("tote_id", "key", name="uq_tote_attributes_tote_key"),
+        Index("ix_tote_attributes_value", "account_id", "key", "value"),
+        Index("ix_tote_attributes_num", "account_id", "key", "num_value"),
+    )
 
 
 class Item(Base):
@@ -58,27 +114,111 @@ class Item(Base):
     description = Column(Text, nullable=True)
     quantity = Column(Integer, nullable=False, default=1)
     image_path = Column(String, nullable=True)  # stored relative to /media
+    # Pixel size of the stored (normalised) image, so clients can lay out before loading it
+    image_width = Column(Integer, nullable=True)
+    image_height = Column(Integer, nullable=True)
+    # 64-bit perceptual hash of the image (as signed), filled in after upload
+    image_phash = Column(BigInteger, nullable=True)
+    # Set while soft-deleted (see Deletion)
+    deleted_by = Column(String, ForeignKey("deletions.id"), nullable=True, index=True)
 
-    tote = relationship("Tote", back_populates="items")
+    tote = relationship(
+        "Tote", back_populates="items", primaryjoin="and_(Tote.id == Item.tote_id, Tote.account_id == Item.account_id)",
+    )
     # Optional: backref to account not strictly needed elsewhere
     # account = relationship("Account")
-    checkout = relationship("CheckedOutItem", back_populates="item", uselist=False, cascade="all, delete-orphan")
+    checkout = relationship(
+        "CheckedOutItem", back_populates="item", uselist=False, cascade="all, delete-orphan",
+        primaryjoin="and_(Item.id == CheckedOutItem.item_id, Item.account_id == CheckedOutItem.account_id)",
+    )
+
+    # Back the whitelisted /items filters and sorts (crud.ITEM_SORT_FIELDS)
+    __table_args__ = (
+        Index("ix_items_account_lower_name", "account_id", func.lower(name)),
+        Index("ix_items_account_quantity", "account_id", "quantity"),
+        Index("ix_items_account_tote", "account_id", "tote_id"),
+        # Fuzzy name search on PostgreSQL; other backends use item_trigrams
+        Index(
+            "ix_items_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+event.listen(
+    Item.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+class ItemTrigram(Base):
+    """Trigram index over item names for backends without pg_trgm (see crud.suggest_items)."""
+    __tablename__ = "item_trigrams"
+    account_id = Column(String, primary_key=True)
+    trigram = Column(String, primary_key=True)
+    # Trigrams in the item's whole name: similarity needs no second lookup, and
+    # names too short or long to reach the threshold are skipped inside the range
+    trigram_count = Column(Integer, primary_key=True)
+    item_id = Column(String, primary_key=True)
+
+    # Clustered on (account_id, trigram, trigram_count, item_id): a lookup reads one contiguous range
+    __table_args__ = (
+        Index("ix_item_trigrams_item", "item_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class ItemImageBand(Base):
+    """Banded LSH index over Item.image_phash (see crud.find_similar_images)."""
+    __tablename__ = "item_image_bands"
+    account_id = Column(String, primary_key=True)
+    # band number and that band's bits of the hash, packed as band << HASH_BAND_BITS | bits
+    bucket = Column(Integer, primary_key=True)
+    item_id = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_item_image_bands_item", "item_id"),
+        {"sqlite_with_rowid": False},
+    )
 
 
 class CheckedOutItem(Base):
     __tablename__ = "checked_out_items"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # The item's account: scopes checkouts without a join and is the partition key (app.partitioning)
+    account_id = Column(String, ForeignKey("accounts.id"), nullable=False)
     item_id = Column(String, ForeignKey("items.id"), nullable=False, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     checked_out_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     # Relationships
-    item = relationship("Item", back_populates="checkout")
+    item = relationship(
+        "Item", back_populates="checkout",
+        primaryjoin="and_(Item.id == CheckedOutItem.item_id, Item.account_id == CheckedOutItem.account_id)",
+    )
     user = relationship("User", back_populates="checked_out_items")
 
-    # Unique constraint to prevent double checkout
+    # Unique constraint to prevent double checkout. Item ids are unique on their
+    # own; account_id leads so the constraint is also valid on a partitioned table
+    __table_args__ = (
+        UniqueConstraint('account_id', 'item_id', name='uq_checked_out_items_account_item'),
+    )
+
+
+class CheckoutEvent(Base):
+    """Append-only checkout/checkin history; survives deletion of the item or user."""
+    __tablename__ = "checkout_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(String, ForeignKey("accounts.id"), nullable=False)
+    item_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=True)
+    action = Column(String, nullable=False)  # "checkout" | "checkin"
+    occurred_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # id is the tie-breaker for keyset pagination within the same timestamp
     __table_args__ = (
-        UniqueConstraint('item_id', name='uq_checked_out_items_item_id'),
+        Index("ix_checkout_events_account_time", "account_id", "occurred_at", "id"),
+        Index("ix_checkout_events_item_time", "item_id", "occurred_at", "id"),
     )
 
 
@@ -102,3 +242,66 @@ class User(Base):
 
     account = relationship("Account", back_populates="users")
     checked_out_items = relationship("CheckedOutItem", back_populates="user", cascade="all, delete-orphan")
+
+
+class ChangeLog(Base):
+    """Append-only record of entity mutations, consumed by delta sync clients."""
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(String, ForeignKey("accounts.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    entity_type = Column(String, nullable=False)  # "tote" | "item" | "location"
+    entity_id = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # "upsert" | "delete"
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_change_log_account_seq", "account_id", "seq"),
+    )
+
+
+class Deletion(Base):
+    """A soft delete that can still be undone, until app.purge removes its rows.
+
+    Every row it hides points here through deleted_by: a tote and the items
+    in it share one deletion, so they are restored or purged together.
+    """
+    __tablename__ = "deletions"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    account_id = Column(String, ForeignKey("accounts.id"), nullable=False)
+    entity_type = Column(String, nullable=False)  # "tote" | "item" | "location"
+    entity_id = Column(String, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_deletions_account_entity", "account_id", "entity_type", "entity_id"),
+        Index("ix_deletions_deleted_at", "deleted_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """A response stored for an Idempotency-Key (app.idempotency), shared by every worker."""
+    __tablename__ = "idempotency_keys"
+    key = Column(String(64), primary_key=True)  # sha256 of caller + client key
+    record = Column(LargeBinary, nullable=True)  # None while the first attempt is running
+    locked_until = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+SOFT_DELETE_MODELS = {"location": Location, "tote": Tote, "item": Item}
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_soft_deleted(state) -> None:
+    """Leave soft-deleted rows out of every ORM SELECT, UPDATE and DELETE.
+
+    Statements that must see them (undelete, purge, media GC) opt out with
+    execution_options(include_deleted=True).
+    """
+    if state.is_column_load or state.execution_options.get("include_deleted"):
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(*(
+            with_loader_criteria(model, model.deleted_by.is_(None), include_aliases=True)
+            for model in SOFT_DELETE_MODELS.values()
+        ))
@@ -0,0 +1,149 @@
+"""Opt-in hash partitioning of the per-account hot tables on PostgreSQL.
+
+With TENANT_PARTITIONS=N, items and checked_out_items are stored as
+PARTITION BY HASH (account_id) with N partitions. crud's queries against
+them, and the Tote.items / Item.checkout relationship loads, filter on
+account_id, so PostgreSQL prunes each one to the single partition holding
+that account; a lookup by item id alone (db.get) would scan them all, so
+new queries need the account too. Index depth and scan sizes then
+follow the partition, not the size of the whole deployment, and one huge
+account no longer bloats the indexes every small account searches.
+
+create_all always builds the tables unpartitioned; convert_tables() rebuilds
+them partitioned in one transaction, carrying existing rows over. Startup
+does this by itself while the tables are still empty. A database that
+already holds data is converted offline, since the copy locks both tables:
+
+    TENANT_PARTITIONS=16 python -m app.partitioning
+"""
+import argparse
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import AddConstraint, CreateIndex, UniqueConstraint
+
+import app.models as models
+from app.db import TENANT_PARTITIONS, engine
+
+# Parents before children: checked_out_items references items
+PARTITIONED_TABLES = (models.Item.__table__, models.CheckedOutItem.__table__)
+PARTITION_KEY = "account_id"
+
+
+def partition_count(conn, table_name: str) -> int | None:
+    """How many partitions table_name has, or None if it isn't partitioned."""
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table_name}).scalar()
+    if kind != "p":
+        return None
+    return conn.execute(
+        text("SELECT count(*) FROM pg_inherits WHERE inhparent = to_regclass(:t)"), {"t": table_name},
+    ).scalar()
+
+
+def conversion_statements(dialect, partitions: int) -> list[str]:
+    """DDL that rebuilds PARTITIONED_TABLES as hash partitions of PARTITION_KEY.
+
+    The old tables are renamed, copied into the new ones and dropped before
+    any keys are added, so constraint and index names from the model are
+    free to reuse. Keys, unique constraints and foreign keys between
+    partitioned tables gain account_id, which PostgreSQL requires.
+    """
+    # AddConstraint marks its constraint as no longer part of CREATE TABLE,
+    # so compile from a scratch copy and leave the model's metadata alone
+    scratch = MetaData()
+    tables = [t.to_metadata(scratch) for t in PARTITIONED_TABLES]
+    for t in PARTITIONED_TABLES:
+        for fk in t.foreign_key_constraints:
+            if fk.referred_table.name not in scratch.tables:
+                fk.referred_table.to_metadata(scratch)
+    partitioned = {t.name for t in tables}
+    stmts = [f"ALTER TABLE {t.name} RENAME TO {t.name}_unpartitioned" for t in PARTITIONED_TABLES]
+    for t in PARTITIONED_TABLES:
+        stmts.append(
+            f"CREATE TABLE {t.name} (LIKE {t.name}_unpartitioned INCLUDING DEFAULTS) PARTITION BY HASH ({PARTITION_KEY})"
+        )
+        stmts += [
+            f"CREATE TABLE {t.name}_p{r} PARTITION OF {t.name} FOR VALUES WITH (MODULUS {partitions}, REMAINDER {r})"
+            for r in range(partitions)
+        ]
+        stmts.append(f"INSERT INTO {t.name} SELECT * FROM {t.name}_unpartitioned")
+    stmts.append("DROP TABLE " + ", ".join(f"{t.name}_unpartitioned" for t in reversed(PARTITIONED_TABLES)))
+
+    for t in tables:
+        stmts.append(f"ALTER TABLE {t.name} ADD PRIMARY KEY ({PARTITION_KEY}, id)")
+        for constraint in t.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                if PARTITION_KEY not in constraint.columns:
+                    raise ValueError(f"{constraint.name} must include {PARTITION_KEY} to be partitioned")
+                stmts.append(str(AddConstraint(constraint).compile(dialect=dialect)))
+        for fk in t.foreign_key_constraints:
+            if fk.referred_table.name in partitioned:
+                local = ", ".join(c.name for c in fk.columns)
+                remote = ", ".join(e.column.name for e in fk.elements)
+                stmts.append(
+                    f"ALTER TABLE {t.name} ADD FOREIGN KEY ({PARTITION_KEY}, {local}) "
+                    f"REFERENCES {fk.referred_table.name} ({PARTITION_KEY}, {remote})"
+                )
+            else:
+                stmts.append(str(AddConstraint(fk).compile(dialect=dialect)))
+        stmts += [str(CreateIndex(index).compile(dialect=dialect)) for index in t.indexes]
+    return stmts
+
+
+def convert_tables(bind: Engine, partitions: int) -> bool:
+    """Partition PARTITIONED_TABLES in one transaction; returns False if already done.
+
+    Raises ValueError on other databases, or if the tables are already
+    partitioned with a different count (that takes a dump and reload).
+    """
+    if bind.dialect.name != "postgresql":
+        raise ValueError("Table partitioning needs PostgreSQL")
+    with bind.begin() as conn:
+        counts = {t.name: partition_count(conn, t.name) for t in PARTITIONED_TABLES}
+        if all(count == partitions for count in counts.values()):
+            return False
+        if any(count is not None for count in counts.values()):
+            raise ValueError(f"Tables are already partitioned ({counts}); changing the count needs a dump and reload")
+        for stmt in conversion_statements(conn.dialect, partitions):
+            conn.exec_driver_sql(stmt)
+    return True
+
+
+def partition_on_startup(bind: Engine, partitions: int = TENANT_PARTITIONS) -> None:
+    """Partition the tables while they are empty; leave populated ones to the CLI."""
+    with bind.connect() as conn:
+        counts = {t.name: partition_count(conn, t.name) for t in PARTITIONED_TABLES}
+        if all(count == partitions for count in counts.values()):
+            return
+        populated = any(
+            count is None and conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar()
+            for name, count in counts.items()
+        )
+    if populated:
+        print("[startup] items hold data; run `python -m app.partitioning` to partition them")
+        return
+    try:
+        convert_tables(bind, partitions)
+        print(f"[startup] Partitioned {', '.join(counts)} into {partitions} partitions")
+    except ValueError as exc:
+        print(f"[startup] Skipping table partitioning: {exc}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--partitions", type=int, default=TENANT_PARTITIONS, help="partition count (default: TENANT_PARTITIONS)",
+    )
+    args = parser.parse_args(argv)
+    if args.partitions < 1:
+        parser.error("set --partitions or TENANT_PARTITIONS to a positive count")
+
+    try:
+        changed = convert_tables(engine, args.partitions)
+    except ValueError as exc:
+        parser.exit(1, f"{exc}\n")
+    print(f"Partitioned into {args.partitions} partitions" if changed else "Already partitioned")
+
+
+if __name__ == "__main__":
+    main()
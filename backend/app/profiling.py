@@ -0,0 +1,301 @@
+"""On-demand per-request profiles: where a slow request spent its time.
+
+Off unless PROFILING_ENABLED=1. Then a request is profiled when either
+
+- a superuser sends `X-Profile: 1` (the response carries `X-Profile-Id`), or
+- it takes longer than PROFILE_SLOW_MS. SQL timings are collected for
+  every request so the slow ones can be kept; a PROFILE_SAMPLE_RATE
+  fraction of them also run under cProfile.
+
+Streams under /events (and static /media) are never profiled.
+
+A profile records the wall time, every SQL statement grouped by text
+(count and total time, parameters left out) and, when CPU profiling ran,
+the PROFILE_TOP_FUNCTIONS functions with the highest cumulative time in the
+endpoint. Only one request per process is CPU-profiled at a time; for async
+endpoints the figures also include whatever else the event loop ran
+meanwhile.
+
+Profiles are JSON files in PROFILE_DIR. Only the newest PROFILE_KEEP are
+kept, using at most PROFILE_MAX_BYTES between them. Superusers read their
+account's profiles at /admin/profiles.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from app import security
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(20 * 1024 * 1024)))
+PROFILE_TOP_FUNCTIONS = 50
+PROFILE_TOP_STATEMENTS = 50
+MAX_STATEMENT_LENGTH = 500
+
+HEADER = b"x-profile"
+# Long-lived streams are slow by design and would crowd real slow requests out of the store
+EXEMPT_PREFIXES = ("/events", "/media")
+_ID_PATTERN = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+
+# The profile of the request being handled; run_in_threadpool copies it into sync endpoints
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+# cProfile hooks one thread and would see interleaved requests, so one CPU profile at a time
+_cpu_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Timings collected for one request while it is handled."""
+
+    def __init__(self, trigger: str, cpu: bool):
+        # Millisecond prefix keeps file names in chronological order
+        self.id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.want_cpu = cpu
+        self.cpu: cProfile.Profile | None = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms: float | None = None
+        # statement -> [count, seconds]
+        self.statements: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add_statement(self, statement: str, seconds: float) -> None:
+        statement = " ".join(statement.split())[:MAX_STATEMENT_LENGTH]
+        with self._lock:
+            entry = self.statements.setdefault(statement, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def to_record(self, scope, status_code: int, claims: dict | None) -> dict:
+        statements = sorted(self.statements.items(), key=lambda kv: kv[1][1], reverse=True)
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status_code": status_code,
+            "user_id": (claims or {}).get("sub"),
+            "account_id": (claims or {}).get("acct"),
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "sql_count": sum(count for count, _ in self.statements.values()),
+            "sql_ms": round(sum(seconds for _, seconds in self.statements.values()) * 1000, 3),
+            "sql": [
+                {"statement": text, "count": count, "total_ms": round(seconds * 1000, 3)}
+                for text, (count, seconds) in statements[:PROFILE_TOP_STATEMENTS]
+            ],
+            "cpu": _cpu_summary(self.cpu) if self.cpu else None,
+        }
+
+
+def _cpu_summary(profiler: cProfile.Profile) -> list[dict]:
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+    return [
+        {"function": func, "file": file, "line": line, "calls": calls,
+         "own_ms": round(own * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)}
+        for (file, line, func), (_, calls, own, cumulative, _) in top
+    ]
+
+
+def _start_cpu(profile: RequestProfile | None) -> bool:
+    if profile is None or not profile.want_cpu or profile.cpu is not None:
+        return False
+    if not _cpu_lock.acquire(blocking=False):
+        return False
+    profile.cpu = cProfile.Profile()
+    profile.cpu.enable()
+    return True
+
+
+def _stop_cpu(profile: RequestProfile) -> None:
+    profile.cpu.disable()
+    _cpu_lock.release()
+
+
+def _profiled(endpoint):
+    """Wrap an endpoint so it runs under cProfile when its request asked for it."""
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def run_async(*args, **kwargs):
+            profile = _current.get()
+            if not _start_cpu(profile):
+                return await endpoint(*args, **kwargs)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _stop_cpu(profile)
+
+        return run_async
+
+    @wraps(endpoint)
+    def run_sync(*args, **kwargs):
+        profile = _current.get()
+        if not _start_cpu(profile):
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _stop_cpu(profile)
+
+    return run_sync
+
+
+class ProfiledRoute(APIRoute):
+    """Route class whose endpoint can be CPU-profiled (set as app.router.route_class)."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_profile_started", None)
+    # Queries from background tasks after the response do not belong to it
+    if profile is not None and started is not None and profile.duration_ms is None:
+        profile.add_statement(statement, time.perf_counter() - started)
+
+
+def install_sql_hooks() -> None:
+    """Time statements on every engine (idempotent)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfileStore:
+    """The newest profiles as JSON files, pruned to `keep` files and `max_bytes`."""
+
+    def __init__(self, directory: Path = PROFILE_DIR, keep: int = PROFILE_KEEP, max_bytes: int = PROFILE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.max_bytes = max_bytes
+
+    def save(self, record: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".{record['id']}.tmp"
+        tmp.write_text(json.dumps(record))
+        tmp.replace(self.directory / f"{record['id']}.json")
+        self._prune()
+
+    def get(self, profile_id: str) -> dict | None:
+        if not _ID_PATTERN.match(profile_id):
+            return None
+        try:
+            return json.loads((self.directory / f"{profile_id}.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def recent(self) -> list[dict]:
+        """Stored profiles, newest first."""
+        records = []
+        for path in self._files():
+            record = self.get(path.stem)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _files(self) -> list[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob("*.json"), key=lambda p: p.name, reverse=True)
+
+    def _prune(self) -> None:
+        total = 0
+        for index, path in enumerate(self._files()):
+            try:
+                total += path.stat().st_size
+                if index >= self.keep or total > self.max_bytes:
+                    # Another worker sharing the directory may have pruned it already
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+
+store = ProfileStore()
+
+
+def _claims(headers: dict) -> dict | None:
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    if auth.lower().startswith("bearer "):
+        return security.decode_token_claims(auth[7:])
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it or turn out slow."""
+
+    def __init__(self, app, store: ProfileStore | None = None, slow_ms: float = PROFILE_SLOW_MS,
+                 sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.store = store
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        install_sql_hooks()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        claims = _claims(headers)
+        # Only superusers may ask; the claim is signed into their token at login
+        asked = headers.get(HEADER, b"").strip().lower() in (b"1", b"true", b"yes")
+        requested = asked and bool(claims and claims.get("su"))
+        if not requested and self.slow_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            trigger="header" if requested else "slow",
+            cpu=requested or random.random() < self.sample_rate,
+        )
+        response = {"status": 500}
+        started = time.perf_counter()
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                if requested:
+                    message = {**message, "headers": list(message.get("headers") or []) + [
+                        (b"x-profile-id", profile.id.encode()),
+                    ]}
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                profile.duration_ms = (time.perf_counter() - started) * 1000
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            _current.reset(token)
+            if profile.duration_ms is None:
+                profile.duration_ms = (time.perf_counter() - started) * 1000
+            if requested or profile.duration_ms >= self.slow_ms:
+                record = profile.to_record(scope, response["status"], claims)
+                await run_in_threadpool((self.store or store).save, record)
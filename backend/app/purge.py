@@ -0,0 +1,98 @@
+"""Hard-delete soft-deleted totes, items and locations once they can no longer be restored.
+
+DELETE routes only hide rows (crud.delete_tote and friends) and answer 202
+straight away; the cascade happens here, DELETE_RETENTION_SECONDS later
+(default 7 days), in batches of PURGE_BATCH_SIZE items per commit so no
+lock is held for long. Until then a deletion can be undone through the
+/restore routes.
+
+Each API process runs the purge in a background thread every
+PURGE_INTERVAL_SECONDS (0 disables it); on PostgreSQL an advisory lock lets
+only one of them work at a time. It can also be run from a shell or cron job:
+
+    python -m app.purge
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import app.crud as crud
+
+PURGE_INTERVAL_SECONDS = int(os.getenv("PURGE_INTERVAL_SECONDS", "300"))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+# Arbitrary application-wide key for pg_try_advisory_lock (see startup.STARTUP_LOCK_KEY)
+PURGE_LOCK_KEY = 0x70757267
+
+
+@contextmanager
+def purge_lock(db: Session):
+    """Yield whether this process may purge now; on PostgreSQL only one process at a time may.
+
+    Elsewhere concurrent purges are merely redundant: every step is idempotent.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        yield True
+        return
+    with bind.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": PURGE_LOCK_KEY}).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PURGE_LOCK_KEY})
+
+
+def purge_expired(
+    db: Session, *, batch_size: int = PURGE_BATCH_SIZE, now: datetime | None = None, account_id: str | None = None
+) -> dict:
+    """Purge deletions older than crud.DELETE_RETENTION (only account_id's if given); returns what was removed."""
+    older_than = (now or datetime.utcnow()) - crud.DELETE_RETENTION
+    with purge_lock(db) as acquired:
+        if not acquired:
+            return {"purged_deletions": 0, "purged_rows": 0}
+        return crud.purge_deletions(db, older_than, batch_size, account_id=account_id)
+
+
+def _run_forever(interval: int) -> None:
+    from app.db import SessionLocal  # deferred: importing app.db builds the engine from DATABASE_URL
+
+    while True:
+        time.sleep(interval)
+        try:
+            with SessionLocal() as db:
+                report = purge_expired(db)
+            if report["purged_deletions"]:
+                print(f"[purge] {report}")
+        except Exception as exc:
+            # Database unavailable or a batch failed; the next round retries
+            print(f"[purge] failed: {exc!r}")
+
+
+def start_worker(interval: int = PURGE_INTERVAL_SECONDS) -> None:
+    """Purge in a daemon thread every `interval` seconds (no thread when it is 0)."""
+    if interval > 0:
+        threading.Thread(target=_run_forever, args=(interval,), name="purge-worker", daemon=True).start()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="items removed per commit")
+    args = parser.parse_args(argv)
+
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        report = purge_expired(db, batch_size=args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
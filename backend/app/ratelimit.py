@@ -0,0 +1,188 @@
+"""Per-user/per-account rate limiting and DB-aware admission control.
+
+Each request takes a token from its user's bucket and from its account's
+bucket (anonymous requests use the client address), so one noisy kiosk
+script can exhaust its own budget without starving other tenants. Requests
+that pass are then admitted through a concurrency gate sized to the DB pool;
+when every slot stays busy past a short queueing delay the request is shed
+with 503 rather than piling up behind the pool.
+
+Off unless RATE_LIMIT_ENABLED=1. Behind a reverse proxy, anonymous callers
+are only told apart if the server trusts its X-Forwarded-For header
+(FORWARDED_ALLOW_IPS in gunicorn.conf.py); otherwise they all share the
+proxy's bucket.
+
+Buckets live in process memory by default. RATE_LIMIT_BACKEND_URL=redis://...
+shares them between workers and replicas (redis is an optional dependency).
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+from app import security
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND_URL = os.getenv("RATE_LIMIT_BACKEND_URL", "")
+# Sustained requests/second and burst size per user and per account
+USER_RATE = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "10"))
+USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "40"))
+ACCOUNT_RATE = float(os.getenv("RATE_LIMIT_ACCOUNT_PER_SECOND", "50"))
+ACCOUNT_BURST = float(os.getenv("RATE_LIMIT_ACCOUNT_BURST", "200"))
+# Requests in flight per process; defaults to the DB pool's capacity
+MAX_CONCURRENT = int(os.getenv(
+    "ADMISSION_MAX_CONCURRENT",
+    int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "5")),
+))
+# How long a request may wait for a slot before being shed
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.5"))
+
+# Long-lived or static paths that never touch the DB pool
+EXEMPT_PREFIXES = ("/events", "/media", "/docs", "/redoc", "/openapi.json")
+
+
+class InMemoryBucketStore:
+    """Token buckets in process memory."""
+
+    max_keys = 50_000
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._evict_idle(now)
+            return (1 - tokens) / rate
+
+    def _evict_idle(self, now: float) -> None:
+        # Buckets idle long enough to have refilled carry no state worth keeping
+        horizon = max(USER_BURST / USER_RATE, ACCOUNT_BURST / ACCOUNT_RATE)
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated > horizon]:
+            del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis; refill and take happen atomically in Lua."""
+
+    script = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+    tokens = math.min(tonumber(ARGV[2]), tokens + (tonumber(ARGV[3]) - updated) * tonumber(ARGV[1]))
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / tonumber(ARGV[1]) end
+    redis.call('HSET', KEYS[1], 't', tokens, 'u', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) / tonumber(ARGV[1])) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for shared limits
+
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self.script)
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()]))
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "rate_limited": 0, "shed": 0}
+        self.in_flight = 0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.counters, "in_flight": self.in_flight, "max_concurrent": MAX_CONCURRENT}
+
+
+def _make_store():
+    if RATE_LIMIT_BACKEND_URL.startswith(("redis://", "rediss://")):
+        return RedisBucketStore(RATE_LIMIT_BACKEND_URL)
+    return InMemoryBucketStore()
+
+
+metrics = Metrics()
+
+
+def _rate_keys(scope) -> list[tuple[str, float, float]]:
+    headers = dict(scope.get("headers") or [])
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    claims = None
+    if auth.lower().startswith("bearer "):
+        claims = security.decode_token_claims(auth[7:])
+    if claims and claims.get("sub"):
+        keys = [(f"user:{claims['sub']}", USER_RATE, USER_BURST)]
+        if claims.get("acct"):
+            keys.append((f"account:{claims['acct']}", ACCOUNT_RATE, ACCOUNT_BURST))
+        return keys
+    client = scope.get("client") or ("unknown", 0)
+    return [(f"ip:{client[0]}", USER_RATE, USER_BURST)]
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying rate limits (429) and load shedding (503)."""
+
+    def __init__(self, app, store=None, max_concurrent: int = MAX_CONCURRENT, queue_timeout: float = QUEUE_TIMEOUT_SECONDS):
+        self.app = app
+        self.store = store or _make_store()
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots: asyncio.Semaphore | None = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        for key, rate, burst in _rate_keys(scope):
+            wait = self.store.take(key, rate, burst)
+            if wait:
+                metrics.incr("rate_limited")
+                await _reject(send, 429, "Rate limit exceeded", wait)
+                return
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.incr("shed")
+            await _reject(send, 503, "Server busy, retry shortly", 1)
+            return
+        metrics.incr("admitted")
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            metrics.in_flight -= 1
+            self._slots.release()
@@ -0,0 +1,37 @@
+"""Backfill the search indexes for items that predate them.
+
+Fuzzy name search reads item_trigrams on SQLite (PostgreSQL indexes names
+itself with pg_trgm) and image lookup reads the perceptual hashes in
+item_image_bands. Both are kept up to date as items are written, but items
+created before an upgrade have no entries, so they never show up in
+suggestions, duplicate checks or image matches. This indexes exactly the
+items that are missing, in batches committed one at a time, so it is safe
+to interrupt and rerun, and cheap once everything is indexed:
+
+    python -m app.reindex
+"""
+import argparse
+import json
+
+import app.crud as crud
+
+BATCH_SIZE = 1000
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="items per commit")
+    args = parser.parse_args(argv)
+
+    from app.db import SessionLocal  # deferred: importing app.db builds the engine from DATABASE_URL
+
+    with SessionLocal() as db:
+        report = {
+            "trigram_items": crud.backfill_item_trigrams(db, args.batch_size),
+            "image_hashes": crud.backfill_image_hashes(db, args.batch_size),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
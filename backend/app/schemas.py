@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 
 
@@ -22,15 +22,40 @@ class ItemUpdate(BaseModel):
 class ItemOut(ItemBase):
     id: str
     image_url: Optional[str] = None
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
     tote_id: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class ItemSuggestion(BaseModel):
+    id: str
+    name: str
+    tote_id: Optional[str] = None
+    # Trigram similarity in [0, 1]
+    similarity: float
+
+
+class ImageMatch(BaseModel):
+    id: str
+    name: str
+    tote_id: Optional[str] = None
+    image_url: Optional[str] = None
+    # Differing bits between the two 64-bit perceptual hashes; 0 is identical
+    distance: int
+
+
+class ItemCreatedOut(ItemOut):
+    # Existing items with very similar names; the item is created regardless
+    possible_duplicates: List[ItemSuggestion] = []
+
+
 class LocationBase(BaseModel):
     name: str
     description: Optional[str] = None
+    parent_id: Optional[str] = None
 
 
 class LocationCreate(LocationBase):
@@ -40,22 +65,37 @@ class LocationCreate(LocationBase):
 class LocationUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    # Empty string moves the location to the top level
+    parent_id: Optional[str] = None
 
 
 class LocationOut(LocationBase):
     id: str
     account_id: str
+    path: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class LocationSubtreeStats(BaseModel):
+    """Counts for a location and everything beneath it."""
+    location_id: str
+    locations_count: int
+    totes_count: int
+    items_count: int
+
+
 class ToteBase(BaseModel):
     name: Optional[str] = None
     location: Optional[str] = None  # Keep for backward compatibility
     location_id: Optional[str] = None
     metadata_json: Optional[str] = None
     description: Optional[str] = None
+    # Tote this one is packed inside; on update, empty string un-nests it
+    parent_tote_id: Optional[str] = None
+    # Filterable attributes, e.g. {"capacity_gal": 27, "color": "red"}; on update, replaces the whole set
+    attributes: Optional[Dict[str, Union[str, float, int]]] = None
 
 
 class ToteCreate(ToteBase):
@@ -67,6 +107,7 @@ class ToteUpdate(ToteBase):
 
 class ToteOut(ToteBase):
     id: str = Field(description="UUID string")
+    path: Optional[str] = None
     items: List[ItemOut] = []
     account_id: str | None = None
     location_obj: Optional[LocationOut] = None
@@ -113,6 +154,11 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class StreamTokenOut(BaseModel):
+    token: str
+    expires_in: int
+
+
 class TokenPayload(BaseModel):
     sub: Optional[str] = None  # user id
     exp: Optional[int] = None
@@ -142,6 +188,41 @@ class CheckedOutItemOut(BaseModel):
         from_attributes = True
 
 
+BULK_ITEMS_MAX = 500
+
+
+class BulkItemIds(BaseModel):
+    item_ids: List[str] = Field(min_length=1, max_length=BULK_ITEMS_MAX)
+
+
+class BulkItemResult(BaseModel):
+    item_id: str
+    # checked_out | checked_in | already_checked_out | not_checked_out | not_found
+    status: str
+
+
+class BulkCheckoutOut(BaseModel):
+    succeeded: int
+    results: List[BulkItemResult]
+
+
+class BulkToteMove(BaseModel):
+    tote_ids: List[str] = Field(min_length=1, max_length=BULK_ITEMS_MAX)
+    # None clears the totes' location
+    location_id: Optional[str] = None
+
+
+class BulkToteResult(BaseModel):
+    tote_id: str
+    # moved | already_there | nested | not_found
+    status: str
+
+
+class BulkToteMoveOut(BaseModel):
+    moved: int
+    results: List[BulkToteResult]
+
+
 class ItemWithCheckoutStatus(ItemOut):
     is_checked_out: bool = False
     checked_out_by: Optional[UserOut] = None
@@ -151,6 +232,76 @@ class ItemWithCheckoutStatus(ItemOut):
         from_attributes = True
 
 
+class CheckoutEventOut(BaseModel):
+    id: int
+    item_id: str
+    user_id: Optional[str] = None
+    action: str
+    occurred_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CheckoutEventPage(BaseModel):
+    events: List[CheckoutEventOut]
+    # Pass as ?cursor= to fetch the next (older) page; None when exhausted
+    next_cursor: Optional[str] = None
+
+
+class CompactionOut(BaseModel):
+    removed: int
+
+
+class DeletionOut(BaseModel):
+    """A soft delete; POST .../restore undoes it until restore_until."""
+    id: str
+    entity_type: str
+    entity_id: str
+    deleted_at: datetime
+    restore_until: datetime
+
+
+class PurgeOut(BaseModel):
+    purged_deletions: int
+    purged_rows: int
+
+
+class ProfileSummaryOut(BaseModel):
+    id: str
+    trigger: str
+    method: str
+    path: str
+    status_code: int
+    started_at: datetime
+    duration_ms: float
+    sql_count: int
+    sql_ms: float
+
+
+class ProfileStatementOut(BaseModel):
+    statement: str
+    count: int
+    total_ms: float
+
+
+class ProfileFunctionOut(BaseModel):
+    function: str
+    file: str
+    line: int
+    calls: int
+    own_ms: float
+    cumulative_ms: float
+
+
+class ProfileOut(ProfileSummaryOut):
+    query: str
+    user_id: Optional[str] = None
+    account_id: Optional[str] = None
+    sql: List[ProfileStatementOut]
+    cpu: Optional[List[ProfileFunctionOut]] = None
+
+
 class StatisticsOut(BaseModel):
     locations_count: int
     totes_count: int
@@ -183,3 +334,37 @@ class AccountOut(AccountBase):
 class AccountBootstrapResponse(BaseModel):
     account: AccountOut
     superuser: UserOut
+
+
+# Delta sync
+
+
+class ToteSyncOut(ToteBase):
+    """Tote without its nested items; items are synced separately."""
+    id: str
+    account_id: str
+    path: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ToteContentsOut(BaseModel):
+    """Everything transitively packed inside a tote."""
+    totes: List[ToteSyncOut]
+    items: List[ItemOut]
+
+
+class SyncDeletedOut(BaseModel):
+    entity_type: str
+    id: str
+
+
+class SyncOut(BaseModel):
+    version: int
+    # True when the client's version is unknown to the server; discard local state and refetch
+    full_resync: bool = False
+    items: List[ItemWithCheckoutStatus] = []
+    totes: List[ToteSyncOut] = []
+    locations: List[LocationOut] = []
+    deleted: List[SyncDeletedOut] = []
@@ -1,48 +1,89 @@
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 import os
-from jose import jwt, JWTError
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
-from app.db import get_session
+from app.db import SessionLocal, get_session
 from app import models
 
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_DEV_SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 PASSWORD_RESET_TOKEN_EXPIRE_MINUTES = int(os.getenv("PASSWORD_RESET_TOKEN_EXPIRE_MINUTES", "30"))
+# Stream tokens only have to outlive the gap between issuing one and opening the stream
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+STREAM_SCOPE = "events"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
+
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    # passlib/bcrypt load on first use rather than at import, keeping cold starts fast
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: str,
+    expires_delta: Optional[timedelta] = None,
+    account_id: Optional[str] = None,
+    superuser: bool = False,
+    scope: Optional[str] = None,
+) -> str:
     if expires_delta is None:
         expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": subject}
+    if account_id:
+        # Lets middleware attribute requests to an account without a DB lookup
+        to_encode["acct"] = account_id
+    if superuser:
+        # Only gates X-Profile requests; admin routes still check the user row
+        to_encode["su"] = True
+    if scope:
+        # Single-purpose token, refused everywhere but its own route
+        to_encode["scope"] = scope
+    from jose import jwt
+
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def decode_token(token: str) -> Optional[str]:
+def decode_token_claims(token: str) -> Optional[dict]:
+    from jose import jwt, JWTError
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
 
+def create_stream_token(user_id: str) -> str:
+    """Short-lived token that only opens /events, safe to put in a URL."""
+    return create_access_token(user_id, timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS), scope=STREAM_SCOPE)
+
+
+def decode_token(token: str, scope: Optional[str] = None) -> Optional[str]:
+    """User id from a valid token issued for `scope` (None: a regular access token)."""
+    payload = decode_token_claims(token)
+    if not payload or payload.get("scope") != scope:
+        return None
+    return payload.get("sub")
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)) -> models.User:
     user_id = decode_token(token)
     if user_id is None:
@@ -64,3 +105,32 @@ def get_current_active_superuser(current_user: models.User = Depends(get_current
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough privileges")
     return current_user
+
+
+def get_stream_user(
+    token: Optional[str] = Query(None),
+    header_token: Optional[str] = Depends(oauth2_scheme_optional),
+) -> models.User:
+    """Authenticate a long-lived stream (e.g. Server-Sent Events).
+
+    Browsers' EventSource cannot set headers, so a stream token from
+    POST /events/token may be passed as ?token= instead. Query strings end
+    up in access logs, which is why a full access token is never accepted
+    there. The user is loaded in a short-lived session so no database
+    connection stays checked out for the lifetime of the stream.
+    """
+    if header_token:
+        user_id = decode_token(header_token)
+    else:
+        user_id = decode_token(token or "", scope=STREAM_SCOPE)
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    from app import crud  # local import to avoid circular dependency during module import
+    with SessionLocal() as db:
+        user = crud.get_user(db, user_id)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        if not user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        db.expunge(user)
+    return user
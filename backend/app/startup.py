@@ -0,0 +1,100 @@
+"""One-time startup work, safe to run from many worker processes at once.
+
+Every worker (and every replica container) runs these tasks on boot; a
+database-wide lock serialises them so only one process creates tables or
+the initial superuser at a time, and the others find the work already done.
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.db import Base, SessionLocal, TENANT_PARTITIONS, engine
+import app.crud as crud
+import app.image_store as image_store
+import app.partitioning as partitioning
+import app.schemas as schemas
+import app.upgrade as upgrade
+
+# Arbitrary application-wide key for pg_advisory_lock
+STARTUP_LOCK_KEY = 0x7074726B
+
+# Production deployments whose schema is managed out of band can skip create_all
+SKIP_SCHEMA_CHECK = os.getenv("SKIP_SCHEMA_CHECK", "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def startup_lock(bind: Engine):
+    """Hold an exclusive lock shared by every process using the same database.
+
+    PostgreSQL uses a session-level advisory lock; SQLite (single host) uses an
+    flock on a file next to the database. Other backends run unguarded.
+    """
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+        return
+    if bind.dialect.name == "sqlite":
+        try:
+            import fcntl
+        except ImportError:  # Windows dev machines run a single process anyway
+            yield
+            return
+        database = bind.url.database
+        lock_path = Path(f"{database}.startup.lock" if database and database != ":memory:" else ".startup.lock")
+        with open(lock_path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+        return
+    yield
+
+
+def init_superuser():
+    email = os.getenv("INITIAL_SUPERUSER_EMAIL")
+    password = os.getenv("INITIAL_SUPERUSER_PASSWORD")
+    account_name = os.getenv("INITIAL_ACCOUNT_NAME", "Default Account")
+    if not email or not password:
+        return
+    with SessionLocal() as db:
+        print("[startup] Checking for initial superuser", email)
+        existing = crud.get_user_by_email(db, email.lower())
+
+        print(f"[startup] found {email}" if existing else "not found")
+        if not existing:
+            try:
+                account, owner = crud.create_account(db, schemas.AccountCreate(
+                    name=account_name,
+                    owner_email=email,
+                    owner_full_name="Admin",
+                    owner_password=password,
+                ))
+                print("[startup] Created initial account", account.name, "with superuser", owner.email)
+            except ValueError as exc:
+                print(f"[startup] Failed to create initial account: {exc}")
+
+
+def run_startup_tasks():
+    image_store.ensure_media_dir()
+    needs_superuser = bool(os.getenv("INITIAL_SUPERUSER_EMAIL") and os.getenv("INITIAL_SUPERUSER_PASSWORD"))
+    if SKIP_SCHEMA_CHECK and not needs_superuser:
+        return
+    with startup_lock(engine):
+        if not SKIP_SCHEMA_CHECK:
+            # Purge mode: no automatic migrations. create_all only adds missing tables.
+            Base.metadata.create_all(bind=engine)
+            missing = upgrade.missing_columns(engine)
+            if missing:
+                print(f"[startup] The database predates this release (missing {', '.join(missing)}); "
+                      "stop the app and run `python -m app.upgrade`")
+            if TENANT_PARTITIONS and engine.dialect.name == "postgresql":
+                partitioning.partition_on_startup(engine, TENANT_PARTITIONS)
+        init_superuser()
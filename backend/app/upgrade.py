@@ -0,0 +1,142 @@
+"""Bring a database created by an earlier release up to the current schema.
+
+Startup's create_all only creates missing tables: it never adds columns,
+indexes or constraints to tables that already exist, so an older database
+fails on the first query that reads a new column (accounts.change_seq,
+the locations/totes path, checked_out_items.account_id, ...). This adds
+the missing columns and indexes, fills in the NOT NULL ones from existing
+rows, and replaces checked_out_items' unique constraint on item_id with
+uq_checked_out_items_account_item, in one transaction. Every step checks
+the live schema first, so running it again changes nothing.
+
+Stop the app (startup warns when this is needed), back up, then:
+
+    python -m app.upgrade
+    python -m app.reindex    # then index existing items for search
+
+SQLite cannot add NOT NULL to an existing column, so there the backfilled
+columns stay nullable; the app always writes them.
+"""
+import argparse
+import json
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.db import Base
+
+# How a new NOT NULL column is filled in for existing rows. Older releases
+# had no nesting, so every location and tote is a root of its own tree.
+BACKFILLS = {
+    ("locations", "path"): "UPDATE locations SET path = '/' || id || '/' WHERE path IS NULL",
+    ("totes", "path"): "UPDATE totes SET path = '/' || id || '/' WHERE path IS NULL",
+    ("checked_out_items", "account_id"): (
+        "UPDATE checked_out_items SET account_id = "
+        "(SELECT items.account_id FROM items WHERE items.id = checked_out_items.item_id) "
+        "WHERE account_id IS NULL"
+    ),
+}
+OLD_CHECKOUT_CONSTRAINT = "uq_checked_out_items_item_id"
+CHECKOUT_CONSTRAINT = "uq_checked_out_items_account_item"
+
+
+def missing_columns(bind) -> list[str]:
+    """Model columns absent from tables that already exist, as "table.column"."""
+    inspector = inspect(bind)
+    existing = set(inspector.get_table_names())
+    return [
+        f"{table.name}.{column.name}"
+        for table in Base.metadata.sorted_tables if table.name in existing
+        for column in table.columns
+        if column.name not in {c["name"] for c in inspector.get_columns(table.name)}
+    ]
+
+
+def _add_column_sql(table, column, dialect) -> str:
+    spec = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+    for fk in column.foreign_keys:
+        spec += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+    if not column.nullable and column.default is not None and column.default.is_scalar:
+        spec += f" DEFAULT {column.default.arg!r} NOT NULL"
+    return spec
+
+
+def _index_names(conn) -> set[str]:
+    # Reflection leaves expression indexes out on SQLite, so ask the catalog
+    if conn.dialect.name == "postgresql":
+        sql = "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+    else:
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index'"
+    return set(conn.exec_driver_sql(sql).scalars())
+
+
+def upgrade(engine: Engine) -> dict:
+    """Apply every missing schema change; returns what was done."""
+    report = {"created_tables": [], "added_columns": [], "backfilled": {}, "created_indexes": [], "constraints": []}
+    with engine.begin() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        inspector = inspect(conn)
+        existing = set(inspector.get_table_names())
+        old_tables = [t for t in Base.metadata.sorted_tables if t.name in existing]
+        indexes_before = _index_names(conn)
+
+        # New tables first: added columns may reference them (deleted_by -> deletions)
+        Base.metadata.create_all(bind=conn)
+        report["created_tables"] = [t.name for t in Base.metadata.sorted_tables if t.name not in existing]
+
+        for table in old_tables:
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                conn.exec_driver_sql(_add_column_sql(table, column, conn.dialect))
+                report["added_columns"].append(f"{table.name}.{column.name}")
+                if column.nullable or column.default is not None:
+                    continue
+                backfill = BACKFILLS.get((table.name, column.name))
+                if backfill is None:
+                    raise ValueError(f"No backfill for new NOT NULL column {table.name}.{column.name}")
+                report["backfilled"][f"{table.name}.{column.name}"] = conn.execute(text(backfill)).rowcount
+                if postgres:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL")
+
+        if "checked_out_items" in existing:
+            unique = {c["name"] for c in inspector.get_unique_constraints("checked_out_items")}
+            unique |= {i["name"] for i in inspector.get_indexes("checked_out_items") if i["unique"]}
+            if CHECKOUT_CONSTRAINT not in unique:
+                if postgres:
+                    conn.exec_driver_sql(f"ALTER TABLE checked_out_items DROP CONSTRAINT IF EXISTS {OLD_CHECKOUT_CONSTRAINT}")
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE checked_out_items ADD CONSTRAINT {CHECKOUT_CONSTRAINT} UNIQUE (account_id, item_id)"
+                    )
+                else:
+                    # SQLite can't drop a table constraint; the old UNIQUE (item_id) stays, which item ids meet anyway
+                    conn.exec_driver_sql(
+                        f"CREATE UNIQUE INDEX {CHECKOUT_CONSTRAINT} ON checked_out_items (account_id, item_id)"
+                    )
+                report["constraints"].append(CHECKOUT_CONSTRAINT)
+
+        if postgres and "items" in existing:
+            # ix_items_name_trgm needs it; create_all only adds it along with a new items table
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        present = _index_names(conn)
+        for table in old_tables:
+            for index in table.indexes:
+                if index.name not in present:
+                    index.create(conn)
+        report["created_indexes"] = sorted(_index_names(conn) - indexes_before - {CHECKOUT_CONSTRAINT})
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+
+    from app.db import engine
+
+    print(json.dumps(upgrade(engine), indent=2))
+
+
+if __name__ == "__main__":
+    main()
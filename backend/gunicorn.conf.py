@@ -0,0 +1,33 @@
+"""Gunicorn settings for production: one Uvicorn worker per core.
+
+Run with: gunicorn -c gunicorn.conf.py app.main:app
+Send SIGHUP to the master for a graceful reload (new workers start before old
+ones finish their in-flight requests).
+"""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Async workers: one per core saturates the CPU; WEB_CONCURRENCY overrides
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Each worker imports the app itself, so per-process state (DB pools, event
+# listeners) is never shared across a fork
+preload_app = False
+
+# Requests in flight get this long to finish on reload/shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth; jitter avoids all restarting together
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "200"))
+
+# Proxies whose X-Forwarded-For/-Proto are trusted, so scope["client"] is the real
+# caller (rate limits and idempotency keys for anonymous requests depend on it)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = "-"
+errorlog = "-"
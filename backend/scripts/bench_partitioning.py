@@ -0,0 +1,131 @@
+"""Benchmark per-tenant query latency against the number of tenants on PostgreSQL.
+
+For each tenant count the scratch database is rebuilt from the models,
+optionally partitioned (app.partitioning), and filled with the same number
+of items per tenant, so only the size of the deployment changes. It then
+times crud.list_items and crud.get_item for a sample of tenants. With
+TENANT_PARTITIONS working, the medians should stay flat as tenants grow.
+
+Every table in the target database is DROPPED; point it at a scratch one:
+
+    python scripts/bench_partitioning.py --url postgresql://localhost/bench \\
+        --tenants 10 100 1000 --items 200 --partitions 16
+    python scripts/bench_partitioning.py --url ... --partitions 0   # baseline, unpartitioned
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.models as models
+import app.partitioning as partitioning
+
+INSERT_CHUNK = 10_000
+
+
+def populate(engine, tenants: int, items: int, partitions: int) -> list[str]:
+    """Rebuild the schema with `tenants` accounts of `items` items each; returns the account ids."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    if partitions:
+        partitioning.convert_tables(engine, partitions)
+    now = datetime.utcnow()
+    account_ids = [str(uuid.uuid4()) for _ in range(tenants)]
+    with engine.begin() as conn:
+        conn.execute(insert(models.Account), [
+            {"id": aid, "name": f"bench-{n}", "change_seq": 0, "created_at": now, "updated_at": now}
+            for n, aid in enumerate(account_ids)
+        ])
+        rows = []
+        for aid in account_ids:
+            rows += [{"id": str(uuid.uuid4()), "account_id": aid, "name": f"Item {i}", "quantity": 1} for i in range(items)]
+            if len(rows) >= INSERT_CHUNK:
+                conn.execute(insert(models.Item), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(models.Item), rows)
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    return account_ids
+
+
+def _ms(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)] * 1000, 3),
+    }
+
+
+def measure(engine, account_ids: list[str], sample: int, repeat: int) -> dict:
+    """Time list and get queries for up to `sample` tenants, `repeat` times each."""
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+    step = max(1, len(account_ids) // sample)
+    sampled = account_ids[::step][:sample]
+    listed, fetched = [], []
+    with SessionLocal() as db:
+        item_ids = {aid: crud.list_items(db, aid)[0].id for aid in sampled}  # also warms the cache
+        for _ in range(repeat):
+            for aid in sampled:
+                started = time.perf_counter()
+                crud.list_items(db, aid)
+                listed.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                crud.get_item(db, item_ids[aid], aid)
+                fetched.append(time.perf_counter() - started)
+                db.expunge_all()
+    return {"list_items": _ms(listed), "get_item": _ms(fetched)}
+
+
+def run_benchmark(url: str, tenant_counts: list[int], items: int, partitions: int,
+                  sample: int = 20, repeat: int = 5) -> list[dict]:
+    engine = create_engine(url, future=True)
+    if engine.dialect.name != "postgresql":
+        raise ValueError("The partitioning benchmark needs PostgreSQL")
+    results = []
+    try:
+        for tenants in tenant_counts:
+            account_ids = populate(engine, tenants, items, partitions)
+            results.append({
+                "tenants": tenants, "items_per_tenant": items, "partitions": partitions,
+                **measure(engine, account_ids, sample, repeat),
+            })
+        Base.metadata.drop_all(bind=engine)
+    finally:
+        engine.dispose()
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="scratch PostgreSQL database; all its tables are dropped")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 100, 1000], help="tenant counts to compare")
+    parser.add_argument("--items", type=int, default=200, help="items per tenant")
+    parser.add_argument("--partitions", type=int, default=16, help="hash partitions (0: unpartitioned baseline)")
+    parser.add_argument("--sample", type=int, default=20, help="tenants timed per run")
+    parser.add_argument("--repeat", type=int, default=5, help="timings per sampled tenant")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_benchmark(args.url, args.tenants, args.items, args.partitions, args.sample, args.repeat)
+    except ValueError as exc:
+        parser.exit(1, f"{exc}\n")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+
+class BulkCheckoutTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        with self.SessionLocal() as db:
+            self.account, self.owner = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Cart Co", owner_email="cart@example.com", owner_password="secret123"),
+            )
+            self.other, _ = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Other Co", owner_email="other@example.com", owner_password="secret123"),
+            )
+            self.item_ids = [
+                crud.add_item(db, self.account.id, schemas.ItemCreate(name=f"Part {n}")).id for n in range(50)
+            ]
+            self.foreign_id = crud.add_item(db, self.other.id, schemas.ItemCreate(name="Not ours")).id
+
+    def tearDown(self) -> None:
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def test_bulk_checkout_statuses(self):
+        with self.SessionLocal() as db:
+            crud.checkout_item(db, self.item_ids[0], self.owner)
+            results = crud.checkout_items(db, self.item_ids + [self.foreign_id, "missing"], self.owner)
+            self.assertEqual(results[self.item_ids[0]], crud.BULK_ALREADY_CHECKED_OUT)
+            self.assertTrue(all(results[iid] == crud.BULK_CHECKED_OUT for iid in self.item_ids[1:]))
+            self.assertEqual(results[self.foreign_id], crud.BULK_NOT_FOUND)
+            self.assertEqual(results["missing"], crud.BULK_NOT_FOUND)
+            self.assertEqual(len(crud.get_checked_out_items(db, self.account.id)), 50)
+
+    def test_bulk_checkin_statuses(self):
+        with self.SessionLocal() as db:
+            crud.checkout_items(db, self.item_ids[:10], self.owner)
+            results = crud.checkin_items(db, self.item_ids[:20], self.owner)
+            self.assertEqual(sum(r == crud.BULK_CHECKED_IN for r in results.values()), 10)
+            self.assertEqual(sum(r == crud.BULK_NOT_CHECKED_OUT for r in results.values()), 10)
+            self.assertEqual(crud.get_checked_out_items(db, self.account.id), [])
+
+    def test_bulk_checkout_statement_count_is_independent_of_batch_size(self):
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        with self.SessionLocal() as db:
+            crud.checkout_items(db, self.item_ids, self.owner)
+        # ownership select, conflict-ignoring insert, change_seq bump, change_log and ledger inserts
+        self.assertLessEqual(len(statements), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
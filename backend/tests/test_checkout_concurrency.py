@@ -0,0 +1,110 @@
+import sys
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.models as models
+import app.schemas as schemas
+
+THREADS = 16
+ITEMS = 5
+
+
+class CheckoutConcurrencyTests(unittest.TestCase):
+    def setUp(self) -> None:
+        # A file database so every thread gets its own connection
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite:///{self.tmp.name}/stress.db",
+            connect_args={"check_same_thread": False, "timeout": 30},
+            future=True,
+        )
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        with self.SessionLocal() as db:
+            self.account, self.owner = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Stress Co", owner_email="stress@example.com", owner_password="secret123"),
+            )
+            self.item_ids = [
+                crud.add_item(db, self.account.id, schemas.ItemCreate(name=f"Item {n}")).id
+                for n in range(ITEMS)
+            ]
+
+    def tearDown(self) -> None:
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _hammer(self, action):
+        barrier = threading.Barrier(THREADS)
+        results: Counter = Counter()
+        errors: list[BaseException] = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                with self.SessionLocal() as db:
+                    user = db.get(models.User, self.owner.id)
+                    db.rollback()
+                    barrier.wait()
+                    for item_id in self.item_ids:
+                        outcome = action(db, item_id, user)
+                        with lock:
+                            results[(item_id, bool(outcome))] += 1
+            except BaseException as exc:  # surfaced below; threads swallow exceptions otherwise
+                with lock:
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_checkouts_claim_each_item_once(self):
+        results = self._hammer(crud.checkout_item)
+        for item_id in self.item_ids:
+            self.assertEqual(results[(item_id, True)], 1)
+            self.assertEqual(results[(item_id, False)], THREADS - 1)
+        with self.SessionLocal() as db:
+            self.assertEqual(len(crud.get_checked_out_items(db, self.account.id)), ITEMS)
+
+    def test_concurrent_checkins_release_each_item_once(self):
+        with self.SessionLocal() as db:
+            owner = db.get(models.User, self.owner.id)
+            for item_id in self.item_ids:
+                self.assertIsNotNone(crud.checkout_item(db, item_id, owner))
+        results = self._hammer(crud.checkin_item)
+        for item_id in self.item_ids:
+            self.assertEqual(results[(item_id, True)], 1)
+        with self.SessionLocal() as db:
+            self.assertEqual(crud.get_checked_out_items(db, self.account.id), [])
+
+    def test_checkout_is_scoped_to_account(self):
+        with self.SessionLocal() as db:
+            _, stranger = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Other Co", owner_email="other@example.com", owner_password="secret123"),
+            )
+            self.assertIsNone(crud.checkout_item(db, self.item_ids[0], stranger))
+            owner = db.get(models.User, self.owner.id)
+            self.assertIsNotNone(crud.checkout_item(db, self.item_ids[0], owner))
+            self.assertFalse(crud.checkin_item(db, self.item_ids[0], stranger))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.models as models
+import app.schemas as schemas
+
+
+class CheckoutEventTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        with self.SessionLocal() as db:
+            self.account, self.owner = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Ledger Co", owner_email="ledger@example.com", owner_password="secret123"),
+            )
+            self.item = crud.add_item(db, self.account.id, schemas.ItemCreate(name="Torque wrench"))
+
+    def tearDown(self) -> None:
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _seed(self, db, count: int, start: datetime) -> None:
+        db.add_all([
+            models.CheckoutEvent(
+                account_id=self.account.id,
+                item_id=self.item.id,
+                user_id=self.owner.id,
+                action="checkout" if n % 2 == 0 else "checkin",
+                # pairs share a timestamp to exercise the id tie-breaker
+                occurred_at=start + timedelta(hours=n // 2),
+            )
+            for n in range(count)
+        ])
+        db.commit()
+
+    def test_checkout_and_checkin_are_recorded(self):
+        with self.SessionLocal() as db:
+            crud.checkout_item(db, self.item.id, self.owner)
+            crud.checkin_item(db, self.item.id, self.owner)
+            events = crud.list_checkout_events(db, self.account.id, item_id=self.item.id)
+            self.assertEqual([e.action for e in events], ["checkin", "checkout"])
+            self.assertTrue(all(e.user_id == self.owner.id for e in events))
+
+    def test_deleting_a_tote_checks_its_items_in(self):
+        with self.SessionLocal() as db:
+            tote = crud.create_tote(db, schemas.ToteCreate(name="Bin"), self.account.id)
+            drill = crud.add_item(db, self.account.id, schemas.ItemCreate(name="Drill"), tote_id=tote.id)
+            crud.checkout_item(db, drill.id, self.owner)
+            crud.delete_tote(db, tote)
+            events = crud.list_checkout_events(db, self.account.id, item_id=drill.id)
+            self.assertEqual([(e.action, e.user_id) for e in events], [("checkin", self.owner.id), ("checkout", self.owner.id)])
+            self.assertEqual(crud.get_checked_out_items(db, self.account.id), [])
+
+    def test_deleting_a_user_checks_their_items_in(self):
+        with self.SessionLocal() as db:
+            clerk = crud.create_user(
+                db, self.account.id, schemas.UserCreate(email="clerk@example.com", password="secret123"),
+            )
+            crud.checkout_item(db, self.item.id, clerk)
+            crud.delete_user(db, clerk)
+            events = crud.list_checkout_events(db, self.account.id, item_id=self.item.id)
+            self.assertEqual([(e.action, e.user_id) for e in events], [("checkin", clerk.id), ("checkout", clerk.id)])
+
+    def test_keyset_pages_cover_range_without_overlap(self):
+        start = datetime(2026, 1, 1)
+        with self.SessionLocal() as db:
+            self._seed(db, 25, start)
+            seen, before = [], None
+            while True:
+                page = crud.list_checkout_events(
+                    db, self.account.id, start=start, end=start + timedelta(hours=10), before=before, limit=4,
+                )
+                seen.extend(e.id for e in page)
+                if len(page) < 4:
+                    break
+                before = crud.decode_event_cursor(crud.encode_event_cursor(page[-1]))
+            self.assertEqual(len(seen), 20)
+            self.assertEqual(len(set(seen)), 20)
+
+    def test_range_query_uses_account_time_index(self):
+        with self.SessionLocal() as db:
+            plan = db.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM checkout_events WHERE account_id = :a "
+                "AND occurred_at >= :s ORDER BY occurred_at DESC, id DESC LIMIT 10"
+            ), {"a": self.account.id, "s": datetime(2026, 1, 1)}).all()
+            detail = " ".join(str(row[-1]) for row in plan)
+            self.assertIn("ix_checkout_events_account_time", detail)
+            self.assertNotIn("TEMP B-TREE", detail)
+
+    def test_compaction_removes_only_expired_events(self):
+        with self.SessionLocal() as db:
+            self._seed(db, 10, datetime(2020, 1, 1))
+            crud.checkout_item(db, self.item.id, self.owner)
+            removed = crud.compact_checkout_events(db, datetime(2021, 1, 1), account_id=self.account.id, batch_size=3)
+            self.assertEqual(removed, 10)
+            self.assertEqual(len(crud.list_checkout_events(db, self.account.id)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.events as events
+import app.models as models
+import app.schemas as schemas
+from app import security
+
+
+class ChangeEventTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.broker = events.Broker(events.LocalBackend())
+        self._global_broker = events.broker
+        events.broker = self.broker
+        with self.SessionLocal() as db:
+            self.account, self.owner = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Push Co", owner_email="push@example.com", owner_password="secret123"),
+            )
+            self.other, _ = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Quiet Co", owner_email="quiet@example.com", owner_password="secret123"),
+            )
+
+    def tearDown(self) -> None:
+        events.broker = self._global_broker
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def test_committed_changes_reach_account_subscribers_only(self):
+        async def scenario():
+            mine = self.broker.subscribe(self.account.id)
+            theirs = self.broker.subscribe(self.other.id)
+            with self.SessionLocal() as db:
+                tote = crud.create_tote(db, schemas.ToteCreate(name="Live"), self.account.id)
+            payload = await mine.get(timeout=1)
+            self.assertEqual(payload["type"], "changes")
+            self.assertEqual(payload["version"], 1)
+            self.assertEqual(payload["changes"], [{"entity_type": "tote", "id": tote.id, "op": "upsert"}])
+            self.assertIsNone(await theirs.get(timeout=0.05))
+            mine.close()
+            theirs.close()
+
+        asyncio.run(scenario())
+
+    def test_rolled_back_changes_are_not_published(self):
+        async def scenario():
+            sub = self.broker.subscribe(self.account.id)
+            with self.SessionLocal() as db:
+                tote = models.Tote(account_id=self.account.id, name="Draft", path="/draft/")
+                db.add(tote)
+                db.flush()
+                crud._record_changes(db, self.account.id, "tote", [tote.id])
+                db.rollback()
+            self.assertIsNone(await sub.get(timeout=0.05))
+            sub.close()
+
+        asyncio.run(scenario())
+
+    def test_overflow_collapses_to_resync(self):
+        async def scenario():
+            sub = self.broker.subscribe(self.account.id)
+            for n in range(events.SUBSCRIBER_QUEUE_SIZE + 1):
+                self.broker.publish(self.account.id, {"type": "changes", "version": n, "changes": []})
+            await asyncio.sleep(0)
+            self.assertEqual(await sub.get(timeout=1), events.RESYNC)
+            sub.close()
+
+        asyncio.run(scenario())
+
+    def test_publish_failure_does_not_fail_the_commit(self):
+        class FlakyBackend(events.LocalBackend):
+            calls = 0
+
+            def publish(self, account_id, payload):
+                self.calls += 1
+                if self.calls == 1:
+                    raise ConnectionError("backend down")
+                super().publish(account_id, payload)
+
+        self.broker = events.broker = events.Broker(FlakyBackend())
+
+        async def scenario():
+            sub = self.broker.subscribe(self.account.id)
+            with self.SessionLocal() as db:
+                lost = crud.create_tote(db, schemas.ToteCreate(name="Lost"), self.account.id)
+                kept = crud.create_tote(db, schemas.ToteCreate(name="Kept"), self.account.id)
+                self.assertIsNotNone(crud.get_tote(db, lost.id, self.account.id))
+            payload = await sub.get(timeout=1)
+            self.assertEqual(payload["changes"], [{"entity_type": "tote", "id": kept.id, "op": "upsert"}])
+            sub.close()
+
+        asyncio.run(scenario())
+
+
+class StreamTokenTests(unittest.TestCase):
+    def test_stream_tokens_only_open_streams(self):
+        stream_token = security.create_stream_token("user-1")
+        self.assertEqual(security.decode_token(stream_token, scope=security.STREAM_SCOPE), "user-1")
+        # Useless as a bearer token for the rest of the API
+        self.assertIsNone(security.decode_token(stream_token))
+
+    def test_access_tokens_are_refused_in_the_query_string(self):
+        access_token = security.create_access_token("user-1")
+        with self.assertRaises(HTTPException) as raised:
+            security.get_stream_user(token=access_token, header_token=None)
+        self.assertEqual(raised.exception.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
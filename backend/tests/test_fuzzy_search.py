@@ -0,0 +1,89 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.models as models
+import app.schemas as schemas
+
+
+class FuzzySearchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Fuzzy Co", owner_email="fuzzy@example.com", owner_password="secret123"),
+        )
+        self.other, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Other Co", owner_email="other@example.com", owner_password="secret123"),
+        )
+        for name in ("Phillips screwdriver", "Flathead screwdriver set", "Claw hammer", "Screws M4"):
+            self._add(name)
+        crud.add_item(self.db, self.other.id, schemas.ItemCreate(name="Screwdriver"))
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _add(self, name):
+        return crud.add_item(self.db, self.account.id, schemas.ItemCreate(name=name))
+
+    def _suggest(self, text):
+        return [item.name for item, _ in crud.suggest_items(self.db, self.account.id, text)]
+
+    def test_trigrams_match_pg_trgm(self):
+        self.assertEqual(crud.name_trigrams("Cat"), {"  c", " ca", "cat", "at "})
+
+    def test_typo_finds_items_within_account(self):
+        self.assertEqual(set(self._suggest("screwdirver")), {"Phillips screwdriver", "Flathead screwdriver set"})
+        self.assertEqual(self._suggest("hamer"), ["Claw hammer"])
+        self.assertEqual(self._suggest("xylophone"), [])
+
+    def test_duplicates_compare_whole_names(self):
+        matches = crud.find_duplicate_items(self.db, self.account.id, "phillips screwdrivers")
+        self.assertEqual([item.name for item, _ in matches], ["Phillips screwdriver"])
+        self.assertGreater(matches[0][1], crud.DUPLICATE_THRESHOLD)
+
+    def test_backfill_indexes_items_created_before_the_index(self):
+        self.db.execute(delete(models.ItemTrigram))
+        self.db.commit()
+        self.assertEqual(self._suggest("hamer"), [])
+        self.assertEqual(crud.backfill_item_trigrams(self.db, batch_size=2), 5)
+        self.assertEqual(self._suggest("hamer"), ["Claw hammer"])
+        self.assertEqual(crud.backfill_item_trigrams(self.db), 0)
+
+    def test_index_follows_renames_and_deletes(self):
+        hammer = crud.suggest_items(self.db, self.account.id, "hammer")[0][0]
+        crud.update_item(self.db, hammer, schemas.ItemUpdate(name="Mallet"))
+        self.assertEqual(self._suggest("hammer"), [])
+        self.assertEqual(self._suggest("malet"), ["Mallet"])
+        deletion = crud.delete_item(self.db, hammer)
+        self.assertEqual(self._suggest("mallet"), [])
+        # Index rows outlive a soft delete and go with the purge
+        crud.purge_deletion(self.db, deletion)
+        self.assertEqual(self.db.query(models.ItemTrigram).filter_by(item_id=hammer.id).count(), 0)
+
+    def test_deleted_items_do_not_crowd_out_live_matches(self):
+        for _ in range(10):
+            crud.delete_item(self.db, self._add("screwdriver"))
+        live = self._add("screwdriver set")
+        self.assertIn("screwdriver set", self._suggest("screwdirver"))
+        duplicates = crud.find_duplicate_items(self.db, self.account.id, "screwdriver")
+        self.assertEqual([item.id for item, _ in duplicates][:1], [live.id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base, get_session
+import app.crud as crud
+import app.idempotency as idempotency
+import app.main as main
+import app.schemas as schemas
+from app import security
+
+
+def _scope(key: bytes | None, token: str | None = None, path: str = "/totes", method: str = "POST"):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    if key is not None:
+        headers.append((b"idempotency-key", key))
+    return {"type": "http", "method": method, "path": path, "query_string": b"", "headers": headers,
+            "client": ("10.0.0.1", 1234)}
+
+
+async def _call(middleware, scope) -> tuple[int, dict, bytes]:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+class CountingApp:
+    def __init__(self, status: int = 201):
+        self.calls = 0
+        self.status = status
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await receive()
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": f'{{"n": {self.calls}}}'.encode()})
+
+
+class IdempotencyMiddlewareTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = CountingApp()
+        self.middleware = idempotency.IdempotencyMiddleware(self.app, store=idempotency.InMemoryResponseStore())
+
+    def test_retry_replays_without_running_the_route(self):
+        token = security.create_access_token("user-1", account_id="acct")
+
+        async def scenario():
+            first = await _call(self.middleware, _scope(b"k1", token))
+            retry = await _call(self.middleware, _scope(b"k1", token))
+            return first, retry
+
+        (status, _, body), (retry_status, retry_headers, retry_body) = asyncio.run(scenario())
+        self.assertEqual(self.app.calls, 1)
+        self.assertEqual((retry_status, retry_body), (status, body))
+        self.assertEqual(retry_headers[b"idempotent-replayed"], b"true")
+
+    def test_keys_are_scoped_per_caller_and_endpoint(self):
+        alice = security.create_access_token("alice", account_id="acct")
+        bob = security.create_access_token("bob", account_id="acct")
+
+        async def scenario():
+            await _call(self.middleware, _scope(b"k1", alice))
+            await _call(self.middleware, _scope(b"k1", bob))
+            return await _call(self.middleware, _scope(b"k1", alice, path="/locations"))
+
+        status, _, _ = asyncio.run(scenario())
+        self.assertEqual(self.app.calls, 2)
+        self.assertEqual(status, 422)
+
+    def test_requests_without_a_key_or_not_mutating_always_run(self):
+        async def scenario():
+            for _ in range(2):
+                await _call(self.middleware, _scope(None))
+                await _call(self.middleware, _scope(b"k1", method="GET"))
+
+        asyncio.run(scenario())
+        self.assertEqual(self.app.calls, 4)
+
+    def test_transient_errors_are_not_stored(self):
+        for status in (500, 429, 401, 404, 400):
+            with self.subTest(status=status):
+                self.app.status = status
+                asyncio.run(_call(self.middleware, _scope(status.to_bytes(2, "big"))))
+                self.app.status = 201
+                replayed, _, _ = asyncio.run(_call(self.middleware, _scope(status.to_bytes(2, "big"))))
+                self.assertEqual(replayed, 201)
+
+    def test_deterministic_rejections_are_replayed(self):
+        self.app.status = 422
+        asyncio.run(_call(self.middleware, _scope(b"k1")))
+        self.app.status = 201
+        status, headers, _ = asyncio.run(_call(self.middleware, _scope(b"k1")))
+        self.assertEqual((status, self.app.calls, headers[b"idempotent-replayed"]), (422, 1, b"true"))
+
+    def test_retry_losing_the_reservation_replays_the_finished_response(self):
+        store = idempotency.InMemoryResponseStore()
+        middleware = idempotency.IdempotencyMiddleware(self.app, store=store)
+        fingerprint = hashlib.sha256(b"POST\0/totes\0").hexdigest()
+        get = store.get
+
+        def first_attempt_finishes_after_lookup(key):
+            store.get = get
+            store.put(key, idempotency._encode(fingerprint, 201, [], b'{"n": 1}'))
+            return None
+
+        store.get = first_attempt_finishes_after_lookup
+        status, headers, body = asyncio.run(_call(middleware, _scope(b"k1")))
+        self.assertEqual((status, body, headers[b"idempotent-replayed"]), (201, b'{"n": 1}', b"true"))
+        self.assertEqual(self.app.calls, 0)
+
+    def test_concurrent_retry_is_rejected_while_first_attempt_runs(self):
+        started, finish = asyncio.Event(), asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            started.set()
+            await finish.wait()
+            await self.app(scope, receive, send)
+
+        middleware = idempotency.IdempotencyMiddleware(slow_app, store=idempotency.InMemoryResponseStore())
+
+        async def scenario():
+            first = asyncio.create_task(_call(middleware, _scope(b"k1")))
+            await started.wait()
+            status, _, _ = await _call(middleware, _scope(b"k1"))
+            finish.set()
+            await first
+            return status
+
+        self.assertEqual(asyncio.run(scenario()), 409)
+        self.assertEqual(self.app.calls, 1)
+
+
+class ResponseStoreTests(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        store = idempotency.InMemoryResponseStore(ttl=0.01)
+        store.put("k", b"record")
+        self.assertEqual(store.get("k"), b"record")
+        time.sleep(0.02)
+        self.assertIsNone(store.get("k"))
+
+    def test_oldest_entries_are_evicted_over_capacity(self):
+        store = idempotency.InMemoryResponseStore()
+        store.max_keys = 2
+        for key in ("a", "b", "c"):
+            store.put(key, key.encode())
+        self.assertEqual([store.get(k) for k in ("a", "b", "c")], [None, b"b", b"c"])
+
+
+class DatabaseResponseStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.store = idempotency.DatabaseResponseStore(self.engine)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def test_reservation_is_exclusive_until_stored_or_released(self):
+        self.assertTrue(self.store.reserve("k"))
+        self.assertFalse(self.store.reserve("k"))
+        self.assertIsNone(self.store.get("k"))
+        self.store.release("k")
+        self.assertTrue(self.store.reserve("k"))
+        self.store.put("k", b"record")
+        self.assertEqual(self.store.get("k"), b"record")
+        self.assertFalse(self.store.reserve("k"))
+
+    def test_expired_responses_can_be_reused(self):
+        self.store.ttl = -1
+        self.store.put("k", b"record")
+        self.assertIsNone(self.store.get("k"))
+        self.assertTrue(self.store.reserve("k"))
+
+
+class IdempotentRouteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False, future=True)
+
+        def session_override():
+            db = self.SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[get_session] = session_override
+        # The default store, on this test's database
+        self._store, idempotency.store = idempotency.store, idempotency.DatabaseResponseStore(self.engine)
+        with self.SessionLocal() as db:
+            self.account, _ = crud.create_account(
+                db, schemas.AccountCreate(name="Retry Co", owner_email="retry@example.com", owner_password="secret123"),
+            )
+            self.tote = crud.create_tote(db, schemas.ToteCreate(name="Bin"), self.account.id)
+        self.client = TestClient(main.app)
+        token = self.client.post(
+            "/auth/token", data={"username": "retry@example.com", "password": "secret123"},
+        ).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "add-drill-1"}
+
+    def tearDown(self) -> None:
+        main.app.dependency_overrides.pop(get_session, None)
+        idempotency.store = self._store
+        self.engine.dispose()
+
+    def test_retried_item_upload_creates_one_item(self):
+        responses = [
+            self.client.post(f"/totes/{self.tote.id}/items", data={"name": "Drill"}, headers=self.headers)
+            for _ in range(2)
+        ]
+        self.assertEqual(responses[0].status_code, 200, responses[0].text)
+        self.assertEqual(responses[1].json(), responses[0].json())
+        self.assertEqual(responses[1].headers["idempotent-replayed"], "true")
+        with self.SessionLocal() as db:
+            self.assertEqual(len(crud.list_items(db, self.account.id)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
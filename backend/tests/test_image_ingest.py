@@ -0,0 +1,152 @@
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base, get_session
+import app.crud as crud
+import app.image_store as image_store
+import app.main as main
+import app.schemas as schemas
+
+ORIENTATION = 0x0112
+USER_COMMENT = 0x9286
+
+
+def _phone_photo(size=(3000, 2000)) -> io.BytesIO:
+    """A landscape-encoded JPEG tagged "rotate 90° CW", carrying a bulky EXIF block."""
+    img = Image.new("RGB", size, (200, 180, 160))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, size[0] // 3, size[1] // 3), fill=(20, 40, 200))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[USER_COMMENT] = b"ASCII\0\0\0" + b"x" * 60_000
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=95, exif=exif.tobytes())
+    buf.seek(0)
+    return buf
+
+
+class ImageIngestTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+
+    def tearDown(self) -> None:
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def test_photo_is_rotated_scaled_and_stripped(self):
+        upload = _phone_photo()
+        original_bytes = len(upload.getvalue())
+        path = image_store.save_image(upload, "photo.jpeg")
+
+        self.assertTrue(path.endswith("photo.jpg"))
+        with Image.open(path) as stored:
+            self.assertEqual(stored.size, (1365, 2048))  # upright portrait within the budget
+            self.assertNotIn(ORIENTATION, stored.getexif())
+            self.assertNotIn("exif", stored.info)
+            # The blue block that was top-left in the encoded pixels is now top-right
+            self.assertGreater(stored.getpixel((1300, 50))[2], 150)
+        self.assertLess(Path(path).stat().st_size, original_bytes // 2)
+
+    def test_transparency_is_kept_as_png(self):
+        buf = io.BytesIO()
+        Image.new("RGBA", (64, 64), (255, 0, 0, 128)).save(buf, "PNG")
+        buf.seek(0)
+        path = image_store.save_image(buf, "icon.gif")
+        with Image.open(path) as stored:
+            self.assertEqual((stored.format, stored.mode), ("PNG", "RGBA"))
+
+    def test_non_images_are_rejected_without_writing(self):
+        with self.assertRaises(OSError):
+            image_store.save_image(io.BytesIO(b"not an image"), "bad.jpg")
+        self.assertEqual(list(self.media.iterdir()), [])
+
+    def test_item_records_stored_dimensions(self):
+        engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine, expire_on_commit=False, future=True)() as db:
+            account, _ = crud.create_account(
+                db, schemas.AccountCreate(name="Ingest Co", owner_email="ingest@example.com", owner_password="secret123"),
+            )
+            path = image_store.save_image(_phone_photo((800, 600)), "small.jpg")
+            item = crud.add_item(db, account.id, schemas.ItemCreate(name="Widget"), image_path=path)
+            self.assertEqual((item.image_width, item.image_height), (600, 800))
+            crud.clear_item_image(db, item)
+            self.assertIsNone(item.image_width)
+        engine.dispose()
+
+
+class UploadRouteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        SessionLocal = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False, future=True)
+
+        def session_override():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[get_session] = session_override
+        with SessionLocal() as db:
+            account, _ = crud.create_account(
+                db, schemas.AccountCreate(name="Upload Co", owner_email="upload@example.com", owner_password="secret123"),
+            )
+            self.tote = crud.create_tote(db, schemas.ToteCreate(name="Bin"), account.id)
+            self.item = crud.add_item(db, account.id, schemas.ItemCreate(name="Drill"), tote_id=self.tote.id)
+        self.client = TestClient(main.app)
+        token = self.client.post(
+            "/auth/token", data={"username": "upload@example.com", "password": "secret123"},
+        ).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def tearDown(self) -> None:
+        main.app.dependency_overrides.pop(get_session, None)
+        self.engine.dispose()
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def test_unreadable_uploads_are_rejected_with_400(self):
+        pdf = {"image": ("manual.pdf", b"%PDF-1.4 not an image", "application/pdf")}
+        created = self.client.post(f"/totes/{self.tote.id}/items", data={"name": "Saw"}, files=pdf, headers=self.headers)
+        updated = self.client.put(f"/items/{self.item.id}", data={"name": "Drill"}, files=pdf, headers=self.headers)
+        for response in (created, updated):
+            self.assertEqual((response.status_code, response.json()["detail"]), (400, "Not a readable image"))
+        self.assertEqual([p for p in self.media.rglob("*") if p.is_file()], [])
+
+    def test_decompression_bombs_are_rejected_with_400(self):
+        buf = io.BytesIO()
+        Image.new("L", (100, 100)).save(buf, "PNG")
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, 1000
+        try:
+            response = self.client.post(
+                "/items", data={"name": "Bomb"}, files={"image": ("bomb.png", buf.getvalue(), "image/png")},
+                headers=self.headers,
+            )
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.image_store as image_store
+import app.models as models
+import app.schemas as schemas
+
+
+def _photo(seed: int, size=(640, 480)) -> Image.Image:
+    """A deterministic 'photo': shapes whose layout depends on the seed."""
+    img = Image.new("RGB", size, (30 * seed % 255, 90, 160))
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for n in range(6):
+        x, y = (seed * 97 + n * 131) % w, (seed * 53 + n * 71) % h
+        draw.ellipse((x, y, x + w // 4, y + h // 4), fill=((n * 40 + seed * 17) % 255, 200 - n * 20, n * 35))
+    return img
+
+
+def _jpeg(img: Image.Image, quality=90) -> io.BytesIO:
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    buf.seek(0)
+    return buf
+
+
+class ImageSimilarityTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Photo Co", owner_email="photo@example.com", owner_password="secret123"),
+        )
+        self.items = {seed: self._item(f"Part {seed}", _photo(seed)) for seed in range(1, 6)}
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def _item(self, name, img):
+        path = image_store.save_image(_jpeg(img), f"{name.replace(' ', '_')}.jpg")
+        item = crud.add_item(self.db, self.account.id, schemas.ItemCreate(name=name), image_path=path)
+        self.assertTrue(crud.index_item_image(self.db, self.account.id, item.id, path))
+        return item
+
+    def test_hash_survives_resize_and_recompression(self):
+        original = image_store.perceptual_hash(_jpeg(_photo(3)))
+        copy = image_store.perceptual_hash(_jpeg(_photo(3).resize((320, 240)), quality=40))
+        other = image_store.perceptual_hash(_jpeg(_photo(4)))
+        self.assertLessEqual((original ^ copy).bit_count(), 3)
+        self.assertGreater((original ^ other).bit_count(), crud.HASH_MATCH_DISTANCE)
+
+    def test_lookup_finds_matching_item(self):
+        query = image_store.perceptual_hash(_jpeg(_photo(2).resize((400, 300)), quality=50))
+        matches = crud.find_similar_images(self.db, self.account.id, query)
+        self.assertEqual([item.id for item, _ in matches], [self.items[2].id])
+
+    def test_backfill_hashes_images_uploaded_before_hashing(self):
+        path = image_store.save_image(_jpeg(_photo(7)), "legacy.jpg")
+        legacy = crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Legacy"), image_path=path)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Lost"), image_path="media/lost.jpg")
+        self.assertEqual(crud.backfill_image_hashes(self.db, batch_size=1), {"hashed": 1, "failed": 1})
+        query = image_store.perceptual_hash(_jpeg(_photo(7)))
+        self.assertEqual([item.id for item, _ in crud.find_similar_images(self.db, self.account.id, query)], [legacy.id])
+
+    def test_replaced_or_deleted_images_leave_the_index(self):
+        item = self.items[1]
+        phash = item.image_phash & (1 << 64) - 1
+        new_path = image_store.save_image(_jpeg(_photo(9)), "replacement.jpg")
+        crud.update_item(self.db, item, schemas.ItemUpdate(), image_path=new_path)
+        self.assertIsNone(item.image_phash)
+        self.assertEqual(crud.find_similar_images(self.db, self.account.id, phash), [])
+        # A stale background job for the old image is a no-op
+        self.assertFalse(crud.index_item_image(self.db, self.account.id, item.id, "media/gone.jpg"))
+        crud.purge_deletion(self.db, crud.delete_item(self.db, self.items[5]))
+        self.assertEqual(self.db.query(models.ItemImageBand).filter_by(item_id=self.items[5].id).count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+# Each supported filter/sort and the index its query must be able to use
+ITEM_FILTER_INDEXES = {
+    "tote_id": ({"tote_id": "t"}, "ix_items_account_tote"),
+    "location_id": ({"location_id": "l"}, "ix_totes_account_location"),
+    # uq_checked_out_items_account_item (SQLite names the backing index itself)
+    "checked_out": ({"checked_out": True}, "COVERING INDEX sqlite_autoindex_checked_out_items"),
+    "min_quantity": ({"min_quantity": 2}, "ix_items_account_quantity"),
+    "max_quantity": ({"max_quantity": 2}, "ix_items_account_quantity"),
+    "name_prefix": ({"name_prefix": "scr"}, "ix_items_account_lower_name"),
+    "sort=name": ({"sort": "name"}, "ix_items_account_lower_name"),
+    "sort=-quantity": ({"sort": "-quantity"}, "ix_items_account_quantity"),
+}
+TOTE_FILTER_INDEXES = {
+    "location_id": ({"location_id": "l"}, "ix_totes_account_location"),
+    "name_prefix": ({"name_prefix": "bo"}, "ix_totes_account_lower_name"),
+    "sort=name": ({"sort": "name"}, "ix_totes_account_lower_name"),
+    "attribute": ({"attribute_filters": [("color", ":", "red")]}, "ix_tote_attributes_value"),
+}
+
+
+class ListFilterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, self.owner = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Filter Co", owner_email="filter@example.com", owner_password="secret123"),
+        )
+        self.shop = crud.create_location(self.db, schemas.LocationCreate(name="Shop"), self.account.id)
+        self.bin = crud.create_tote(self.db, schemas.ToteCreate(name="Bin", location_id=self.shop.id), self.account.id)
+        self.box = crud.create_tote(self.db, schemas.ToteCreate(name="box"), self.account.id)
+        for name, qty, tote in (("Screwdriver", 2, self.bin), ("screws", 200, self.bin), ("Hammer", 1, self.box)):
+            crud.add_item(self.db, self.account.id, schemas.ItemCreate(name=name, quantity=qty), tote_id=tote.id)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Scrap", quantity=5))
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _names(self, **filters):
+        return [i.name for i in crud.list_items(self.db, self.account.id, **filters)]
+
+    def _plan(self, query) -> str:
+        sql = str(query.statement.compile(self.engine, compile_kwargs={"literal_binds": True}))
+        return " | ".join(str(row[-1]) for row in self.db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+
+    def test_item_filters(self):
+        self.assertEqual(self._names(name_prefix="SCR", sort="name"), ["Scrap", "Screwdriver", "screws"])
+        self.assertEqual(self._names(location_id=self.shop.id, sort="-quantity"), ["screws", "Screwdriver"])
+        self.assertEqual(self._names(min_quantity=2, max_quantity=5, sort="quantity"), ["Screwdriver", "Scrap"])
+        hammer = crud.list_items(self.db, self.account.id, tote_id=self.box.id)[0]
+        crud.checkout_item(self.db, hammer.id, self.owner)
+        self.assertEqual(self._names(checked_out=True), ["Hammer"])
+        self.assertNotIn("Hammer", self._names(checked_out=False))
+
+    def test_prefix_wildcards_are_literal(self):
+        self.assertEqual(self._names(name_prefix="scr%"), [])
+
+    def test_tote_filters(self):
+        totes = crud.list_totes(self.db, self.account.id, name_prefix="B", sort="-name")
+        self.assertEqual([t.name for t in totes], ["box", "Bin"])
+
+    def test_unknown_sort_field_rejected(self):
+        with self.assertRaises(ValueError):
+            crud.list_items(self.db, self.account.id, sort="description")
+
+    def test_every_filter_uses_an_index(self):
+        for label, (filters, index) in ITEM_FILTER_INDEXES.items():
+            with self.subTest(filter=label):
+                plan = self._plan(crud.items_query(self.db, self.account.id, **filters))
+                self.assertIn(index, plan)
+                self.assertNotRegex(plan, r"SCAN (items|totes)(?! USING)")
+        for label, (filters, index) in TOTE_FILTER_INDEXES.items():
+            with self.subTest(filter=f"totes {label}"):
+                plan = self._plan(crud.totes_query(self.db, self.account.id, **filters))
+                self.assertIn(index, plan)
+                self.assertNotRegex(plan, r"SCAN (totes|tote_attributes)(?! USING)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+
+class LocationHierarchyTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Warehouse Co", owner_email="wh@example.com", owner_password="secret123"),
+        )
+        self.building = self._loc("Building A")
+        self.room = self._loc("Room 1", self.building)
+        self.shelf = self._loc("Shelf 3", self.room)
+        self.other_building = self._loc("Building B")
+        self.shelf_tote = self._tote("Bolts", self.shelf)
+        self.room_tote = self._tote("Cables", self.room)
+        self._tote("Elsewhere", self.other_building)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="M6 bolt"), tote_id=self.shelf_tote.id)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="USB-C"), tote_id=self.room_tote.id)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _loc(self, name, parent=None):
+        return crud.create_location(
+            self.db, schemas.LocationCreate(name=name, parent_id=parent.id if parent else None), self.account.id,
+        )
+
+    def _tote(self, name, location):
+        return crud.create_tote(self.db, schemas.ToteCreate(name=name, location_id=location.id), self.account.id)
+
+    def test_paths_encode_ancestry(self):
+        self.assertEqual(self.shelf.path, f"/{self.building.id}/{self.room.id}/{self.shelf.id}/")
+
+    def test_recursive_totes_and_stats(self):
+        names = {t.name for t in crud.list_totes_in_location(self.db, self.building, recursive=True)}
+        self.assertEqual(names, {"Bolts", "Cables"})
+        self.assertEqual(crud.list_totes_in_location(self.db, self.building), [])
+        stats = crud.get_location_subtree_stats(self.db, self.building)
+        self.assertEqual((stats["locations_count"], stats["totes_count"], stats["items_count"]), (3, 2, 2))
+
+    def test_move_rewrites_descendant_paths(self):
+        crud.update_location(self.db, self.room, schemas.LocationUpdate(parent_id=self.other_building.id))
+        self.db.refresh(self.shelf)
+        self.assertEqual(self.shelf.path, f"/{self.other_building.id}/{self.room.id}/{self.shelf.id}/")
+        stats = crud.get_location_subtree_stats(self.db, self.other_building)
+        self.assertEqual(stats["totes_count"], 3)
+
+    def test_cannot_move_beneath_own_subtree(self):
+        with self.assertRaises(ValueError):
+            crud.update_location(self.db, self.building, schemas.LocationUpdate(parent_id=self.shelf.id))
+
+    def test_delete_reparents_children(self):
+        crud.delete_location(self.db, self.room)
+        self.db.refresh(self.shelf)
+        self.assertEqual(self.shelf.parent_id, self.building.id)
+        self.assertEqual(self.shelf.path, f"/{self.building.id}/{self.shelf.id}/")
+
+    def test_delete_reassigns_totes_in_batches(self):
+        for n in range(4):
+            self._tote(f"Spare {n}", self.room)
+        commits = []
+        listener = commits.append
+        event.listen(self.db, "after_commit", listener)
+        crud.delete_location(self.db, self.room, reassign_to=self.other_building.id, batch_size=2)
+        event.remove(self.db, "after_commit", listener)
+        self.assertEqual(len(commits), 4)  # three batches of totes, then the location itself
+        names = {t.name for t in crud.list_totes_in_location(self.db, self.other_building)}
+        self.assertEqual(names, {"Elsewhere", "Cables", "Spare 0", "Spare 1", "Spare 2", "Spare 3"})
+        self.assertIsNone(crud.get_location(self.db, self.room.id, self.account.id))
+
+    def test_delete_rejects_unknown_target(self):
+        for target in (self.room.id, "missing"):
+            with self.assertRaises(ValueError):
+                crud.delete_location(self.db, self.room, reassign_to=target)
+        self.assertIsNotNone(crud.get_location(self.db, self.room.id, self.account.id))
+
+    def test_subtree_query_is_an_index_range(self):
+        plan = self.db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM locations WHERE account_id = :a AND path >= :lo AND path < :hi"
+        ), {"a": self.account.id, "lo": self.building.path, "hi": self.building.path[:-1] + "0"}).all()
+        self.assertIn("ix_locations_account_path", " ".join(str(row[-1]) for row in plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
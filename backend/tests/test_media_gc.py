@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.image_store as image_store
+import app.media_gc as media_gc
+import app.schemas as schemas
+
+
+class MediaGCTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)()
+        self.account, _ = crud.create_account(
+            self.db, schemas.AccountCreate(name="Media Co", owner_email="media@example.com", owner_password="secret123"),
+        )
+        an_hour_ago = time.time() - 3600
+        self.kept = self._file("kept.jpg", 100, an_hour_ago)
+        self.orphan = self._file("orphan.jpg", 250, an_hour_ago)
+        self.fresh = self._file("fresh.jpg", 40, time.time())
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Kept"), image_path=f"media/{self.kept.name}")
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Lost"), image_path="media/lost.jpg")
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def _file(self, name, size, mtime):
+        path = self.media / name
+        path.write_bytes(b"\0" * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_dry_run_reports_without_deleting(self):
+        report = media_gc.collect_garbage(self.db, grace_seconds=60)
+        self.assertEqual(
+            report,
+            {"dry_run": True, "scanned_files": 3, "orphaned_files": 1, "orphaned_bytes": 250,
+             "reclaimed_bytes": 0, "missing_files": 1},
+        )
+        self.assertTrue(self.orphan.exists())
+
+    def test_delete_keeps_referenced_and_recent_files(self):
+        report = media_gc.collect_garbage(self.db, dry_run=False, grace_seconds=60)
+        self.assertEqual(report["reclaimed_bytes"], 250)
+        self.assertEqual(sorted(p.name for p in self.media.iterdir()), ["fresh.jpg", "kept.jpg"])
+
+    def test_abandoned_staging_files_are_reclaimed(self):
+        (self.media / image_store.STAGING_DIRNAME).mkdir()
+        stale = self._file(f"{image_store.STAGING_DIRNAME}/upload.jpg", 70, time.time() - 3600)
+        report = media_gc.collect_garbage(self.db, dry_run=False, grace_seconds=60)
+        self.assertEqual(report["reclaimed_bytes"], 320)
+        self.assertFalse(stale.exists())
+
+    def test_file_rewritten_after_scan_is_kept(self):
+        cutoff = time.time() - 60
+        self._file("orphan.jpg", 250, time.time())
+        self.assertFalse(image_store.delete_media_file("orphan.jpg", older_than=cutoff))
+        self.assertTrue(self.orphan.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.image_store as image_store
+import app.schemas as schemas
+
+
+def _png(color=(10, 120, 200)) -> io.BytesIO:
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 30), color).save(buf, "PNG")
+    buf.seek(0)
+    return buf
+
+
+class MediaTransactionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db, schemas.AccountCreate(name="Txn Co", owner_email="txn@example.com", owner_password="secret123"),
+        )
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def _published(self):
+        return sorted(p.name for p in self.media.iterdir() if p.is_file())
+
+    def _staged(self):
+        return list((self.media / image_store.STAGING_DIRNAME).iterdir())
+
+    def test_upload_is_published_on_commit(self):
+        path = image_store.stage_image(self.db, _png(), "widget.png")
+        self.assertEqual(self._published(), [])
+        item = crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Widget"), image_path=path)
+        self.assertEqual(self._published(), [Path(path).name])
+        self.assertEqual(self._staged(), [])
+        self.assertEqual((item.image_width, item.image_height), (40, 30))
+
+    def test_rolled_back_or_abandoned_upload_is_removed(self):
+        image_store.stage_image(self.db, _png(), "widget.png")
+        self.db.rollback()
+        with self.SessionLocal() as other:
+            image_store.stage_image(other, _png(), "gadget.png")
+        self.assertEqual((self._published(), self._staged()), ([], []))
+
+    def test_replaced_image_is_deleted_only_after_commit(self):
+        first = image_store.stage_image(self.db, _png(), "widget.png")
+        item = crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Widget"), image_path=first)
+
+        image_store.discard_image(self.db, item.image_path)
+        self.db.rollback()
+        self.assertEqual(self._published(), [Path(first).name])
+
+        second = image_store.stage_image(self.db, _png((200, 0, 0)), "widget.png")
+        self.assertNotEqual(first, second)
+        crud.update_item(self.db, item, schemas.ItemUpdate(), image_path=second)
+        self.assertEqual(self._published(), [Path(second).name])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import re
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.models as models
+import app.partitioning as partitioning
+import app.schemas as schemas
+
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+import bench_partitioning
+
+# Scratch PostgreSQL database for the benchmark; every table in it is dropped
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "")
+
+
+def _postgres_available() -> bool:
+    if not BENCH_DATABASE_URL.startswith("postgresql"):
+        return False
+    try:
+        engine = create_engine(BENCH_DATABASE_URL)
+    except ImportError:  # no PostgreSQL driver installed
+        return False
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except OperationalError:
+        return False
+    finally:
+        engine.dispose()
+
+
+class PartitioningDDLTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stmts = partitioning.conversion_statements(postgresql.dialect(), 4)
+
+    def test_tables_are_hash_partitioned_by_account(self):
+        for table in ("items", "checked_out_items"):
+            self.assertIn(
+                f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY HASH (account_id)",
+                self.stmts,
+            )
+            partitions = [s for s in self.stmts if f"PARTITION OF {table} " in s]
+            self.assertEqual(len(partitions), 4)
+            self.assertIn(f"ALTER TABLE {table} ADD PRIMARY KEY (account_id, id)", self.stmts)
+
+    def test_rows_are_copied_before_old_tables_are_dropped(self):
+        copy = self.stmts.index("INSERT INTO items SELECT * FROM items_unpartitioned")
+        drop = next(i for i, s in enumerate(self.stmts) if s.startswith("DROP TABLE"))
+        self.assertLess(copy, drop)
+
+    def test_keys_between_partitioned_tables_include_account(self):
+        ddl = "\n".join(self.stmts)
+        self.assertIn("FOREIGN KEY (account_id, item_id) REFERENCES items (account_id, id)", ddl)
+        self.assertNotIn("FOREIGN KEY(item_id) REFERENCES items", ddl)
+        self.assertIn("UNIQUE (account_id, item_id)", ddl)
+
+    def test_model_indexes_are_recreated(self):
+        ddl = "\n".join(self.stmts)
+        for index in models.Item.__table__.indexes:
+            self.assertIn(f"CREATE INDEX {index.name} ON items", ddl)
+
+    def test_conversion_requires_postgres(self):
+        engine = create_engine("sqlite:///:memory:", future=True)
+        with self.assertRaises(ValueError):
+            partitioning.convert_tables(engine, 4)
+
+
+class CheckoutAccountScopeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def test_checkouts_carry_the_account_partition_key(self):
+        account, owner = crud.create_account(
+            self.db, schemas.AccountCreate(name="Acme", owner_email="o@example.com", owner_password="secret123"),
+        )
+        single = crud.add_item(self.db, account.id, schemas.ItemCreate(name="Drill"))
+        batch = crud.add_item(self.db, account.id, schemas.ItemCreate(name="Saw"))
+        crud.checkout_item(self.db, single.id, owner)
+        crud.checkout_items(self.db, [batch.id], owner)
+        rows = self.db.query(models.CheckedOutItem).all()
+        self.assertEqual({r.item_id for r in rows}, {single.id, batch.id})
+        self.assertEqual({r.account_id for r in rows}, {account.id})
+        self.assertEqual(len(crud.get_checked_out_items(self.db, account.id)), 2)
+
+    def test_reads_and_lazy_loads_filter_on_the_partition_key(self):
+        account, owner = crud.create_account(
+            self.db, schemas.AccountCreate(name="Acme", owner_email="o@example.com", owner_password="secret123"),
+        )
+        location = crud.create_location(self.db, schemas.LocationCreate(name="Dock"), account.id)
+        tote = crud.create_tote(self.db, schemas.ToteCreate(name="Bin", location_id=location.id), account.id)
+        item = crud.add_item(self.db, account.id, schemas.ItemCreate(name="Drill"), tote_id=tote.id)
+        crud.checkout_item(self.db, item.id, owner)
+        self.db.expunge_all()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            tote = crud.get_tote(self.db, tote.id, account.id)
+            self.assertEqual([i.name for i in tote.items], ["Drill"])
+            self.assertEqual(tote.items[0].checkout.user_id, owner.id)
+            crud.list_tote_contents(self.db, tote)
+            crud.get_location_subtree_stats(self.db, location)
+            crud.find_similar_images(self.db, account.id, 0)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        for table in ("items", "checked_out_items"):
+            touching = [s for s in statements if re.search(rf"\b(FROM|JOIN) {table}\b", s)]
+            self.assertTrue(touching, table)
+            for statement in touching:
+                self.assertIn(f"{table}.account_id", statement)
+
+
+@unittest.skipUnless(_postgres_available(), "set BENCH_DATABASE_URL to a scratch PostgreSQL database")
+class PartitionBenchmarkTests(unittest.TestCase):
+    def test_tenant_latency_does_not_grow_with_tenant_count(self):
+        few, many = bench_partitioning.run_benchmark(BENCH_DATABASE_URL, [10, 400], items=100, partitions=16)
+        # Ten times less data per partition scanned would show as a much larger gap
+        for query in ("list_items", "get_item"):
+            self.assertLess(many[query]["p50_ms"], few[query]["p50_ms"] * 2 + 1, (query, few, many))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base, get_session
+import app.crud as crud
+import app.main as main
+import app.profiling as profiling
+import app.schemas as schemas
+from app import security
+
+
+def _profiled_app(store: profiling.ProfileStore, **options) -> FastAPI:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    app = FastAPI()
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.ProfilingMiddleware, store=store, **options)
+
+    @app.get("/items")
+    def items(delay: float = 0):
+        time.sleep(delay)
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    return app
+
+
+class ProfilingMiddlewareTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+        self.store = profiling.ProfileStore(self.dir)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dir)
+
+    def test_superuser_header_records_sql_and_cpu_profile(self):
+        client = TestClient(_profiled_app(self.store, slow_ms=0))
+        token = security.create_access_token("admin", account_id="acct", superuser=True)
+        response = client.get("/items", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"})
+        profile = self.store.get(response.headers["x-profile-id"])
+        self.assertEqual((profile["trigger"], profile["account_id"], profile["status_code"]), ("header", "acct", 200))
+        self.assertEqual(profile["sql"], [{"statement": "SELECT 1", "count": 3, "total_ms": profile["sql_ms"]}])
+        self.assertIn("items", [entry["function"] for entry in profile["cpu"]])
+
+    def test_header_from_other_users_is_ignored(self):
+        client = TestClient(_profiled_app(self.store, slow_ms=0))
+        token = security.create_access_token("clerk", account_id="acct")
+        response = client.get("/items", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"})
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(self.store.recent(), [])
+
+    def test_header_must_ask_for_a_profile(self):
+        client = TestClient(_profiled_app(self.store, slow_ms=0))
+        token = security.create_access_token("admin", account_id="acct", superuser=True)
+        response = client.get("/items", headers={"Authorization": f"Bearer {token}", "X-Profile": "0"})
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(self.store.recent(), [])
+
+    def test_streams_are_never_profiled(self):
+        app = _profiled_app(self.store, slow_ms=1, sample_rate=0)
+
+        @app.get("/events")
+        def events():
+            time.sleep(0.01)
+            return {}
+
+        TestClient(app).get("/events")
+        self.assertEqual(self.store.recent(), [])
+
+    def test_only_requests_over_the_threshold_are_kept(self):
+        client = TestClient(_profiled_app(self.store, slow_ms=50, sample_rate=0))
+        client.get("/items")
+        client.get("/items", params={"delay": 0.06})
+        [profile] = self.store.recent()
+        self.assertEqual((profile["trigger"], profile["query"], profile["sql_count"]), ("slow", "delay=0.06", 3))
+        self.assertGreaterEqual(profile["duration_ms"], 50)
+        self.assertIsNone(profile["cpu"])
+
+
+class ProfileStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dir)
+
+    def test_keeps_only_the_newest_profiles_within_budget(self):
+        store = profiling.ProfileStore(self.dir, keep=3, max_bytes=10_000)
+        ids = [f"{n:013d}-0000000{n}" for n in range(5)]
+        for profile_id in ids:
+            store.save({"id": profile_id, "padding": "x" * 100})
+        self.assertEqual([p["id"] for p in store.recent()], ids[:1:-1])
+        store.max_bytes = 350
+        store.save({"id": f"{9:013d}-00000009", "padding": "x" * 100})
+        self.assertEqual(len(store.recent()), 2)
+
+    def test_ids_cannot_escape_the_directory(self):
+        self.assertIsNone(profiling.ProfileStore(self.dir).get("../secrets"))
+
+
+class ProfileRouteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+        self._store, profiling.store = profiling.store, profiling.ProfileStore(self.dir)
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        SessionLocal = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False, future=True)
+
+        def session_override():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[get_session] = session_override
+        with SessionLocal() as db:
+            self.account, _ = crud.create_account(
+                db, schemas.AccountCreate(name="Slow Co", owner_email="slow@example.com", owner_password="secret123"),
+            )
+        self.client = TestClient(main.app)
+        token = self.client.post(
+            "/auth/token", data={"username": "slow@example.com", "password": "secret123"},
+        ).json()["access_token"]
+        self.assertTrue(security.decode_token_claims(token)["su"])
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def tearDown(self) -> None:
+        main.app.dependency_overrides.pop(get_session, None)
+        profiling.store = self._store
+        self.engine.dispose()
+        shutil.rmtree(self.dir)
+
+    def test_profiles_are_listed_per_account(self):
+        record = {"trigger": "slow", "method": "GET", "path": "/items", "query": "", "status_code": 200,
+                  "started_at": "2026-01-01T00:00:00", "duration_ms": 1200.0, "sql_count": 1, "sql_ms": 900.0,
+                  "sql": [{"statement": "SELECT 1", "count": 1, "total_ms": 900.0}], "cpu": None}
+        profiling.store.save({**record, "id": "0000000000001-aaaaaaaa", "account_id": self.account.id})
+        profiling.store.save({**record, "id": "0000000000002-bbbbbbbb", "account_id": "another-account"})
+
+        listed = self.client.get("/admin/profiles", headers=self.headers).json()
+        self.assertEqual([p["id"] for p in listed], ["0000000000001-aaaaaaaa"])
+        detail = self.client.get("/admin/profiles/0000000000001-aaaaaaaa", headers=self.headers)
+        self.assertEqual(detail.json()["sql"][0]["total_ms"], 900.0)
+        other = self.client.get("/admin/profiles/0000000000002-bbbbbbbb", headers=self.headers)
+        self.assertEqual(other.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base, get_session
+import app.crud as crud
+import app.main as main
+import app.schemas as schemas
+
+# Statements each mutation may issue, including the token's user lookup.
+# None of these may grow with the number of items or nested totes involved.
+QUERY_BUDGETS = {
+    "PUT /totes/{id}": 8,
+    "PUT /totes/{id} (move)": 8,
+    "DELETE /totes/{id}": 10,
+    "PUT /locations/{id}": 5,
+    "PUT /items/{id}": 7,
+    "DELETE /items/{id}": 7,
+}
+
+
+class QueryCountTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False, future=True)
+
+        def session_override():
+            db = self.SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[get_session] = session_override
+        with self.SessionLocal() as db:
+            self.account, _ = crud.create_account(
+                db, schemas.AccountCreate(name="Count Co", owner_email="count@example.com", owner_password="secret123"),
+            )
+            self.shelf = crud.create_location(db, schemas.LocationCreate(name="Shelf"), self.account.id)
+            self.pallet = crud.create_tote(db, schemas.ToteCreate(name="Pallet"), self.account.id)
+            self.crate = crud.create_tote(db, schemas.ToteCreate(name="Crate", attributes={"color": "red"}), self.account.id)
+            for n in range(3):
+                crud.create_tote(db, schemas.ToteCreate(name=f"Box {n}", parent_tote_id=self.crate.id), self.account.id)
+            self.items = [
+                crud.add_item(db, self.account.id, schemas.ItemCreate(name=f"Bolt {n}"), tote_id=self.crate.id)
+                for n in range(5)
+            ]
+        self.client = TestClient(main.app)
+        token = self.client.post(
+            "/auth/token", data={"username": "count@example.com", "password": "secret123"},
+        ).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        main.app.dependency_overrides.pop(get_session, None)
+        self.engine.dispose()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def _assert_budget(self, route, method, url, status=200, **kwargs):
+        self.statements.clear()
+        response = self.client.request(method, url, headers=self.headers, **kwargs)
+        self.assertEqual(response.status_code, status, response.text)
+        self.assertLessEqual(len(self.statements), QUERY_BUDGETS[route], "\n".join(self.statements))
+
+    def test_tote_routes(self):
+        self._assert_budget("PUT /totes/{id}", "PUT", f"/totes/{self.crate.id}", json={"name": "Red crate"})
+        self._assert_budget(
+            "PUT /totes/{id} (move)", "PUT", f"/totes/{self.crate.id}", json={"parent_tote_id": self.pallet.id},
+        )
+        self._assert_budget("DELETE /totes/{id}", "DELETE", f"/totes/{self.crate.id}", status=202)
+        with self.SessionLocal() as db:
+            boxes = crud.list_tote_contents(db, crud.get_tote(db, self.pallet.id, self.account.id))[0]
+            self.assertEqual(sorted(t.name for t in boxes), ["Box 0", "Box 1", "Box 2"])
+            self.assertEqual(crud.list_items(db, self.account.id), [])
+
+    def test_location_route(self):
+        self._assert_budget("PUT /locations/{id}", "PUT", f"/locations/{self.shelf.id}", json={"name": "Top shelf"})
+
+    def test_item_routes(self):
+        item = self.items[0]
+        self._assert_budget("PUT /items/{id}", "PUT", f"/items/{item.id}", data={"name": "Hex bolt", "quantity": "4"})
+        self._assert_budget("DELETE /items/{id}", "DELETE", f"/items/{item.id}", status=202)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import app.ratelimit as ratelimit
+from app import security
+
+
+def _scope(token: str | None = None, path: str = "/items"):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "client": ("10.0.0.1", 1234)}
+
+
+async def _call(middleware, scope) -> int:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return sent[0]["status"]
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_refill(self):
+        store = ratelimit.InMemoryBucketStore()
+        self.assertTrue(all(store.take("k", rate=1000, burst=3) == 0 for _ in range(3)))
+        wait = store.take("k", rate=1000, burst=3)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.001)
+
+
+class AdmissionMiddlewareTests(unittest.TestCase):
+    def test_rate_limit_is_per_user(self):
+        noisy = security.create_access_token("noisy", account_id="acct-a")
+        quiet = security.create_access_token("quiet", account_id="acct-b")
+        middleware = ratelimit.AdmissionMiddleware(_ok_app, store=ratelimit.InMemoryBucketStore())
+
+        async def scenario():
+            statuses = [await _call(middleware, _scope(noisy)) for _ in range(int(ratelimit.USER_BURST) + 5)]
+            self.assertEqual(statuses.count(429), 5)
+            self.assertEqual(await _call(middleware, _scope(quiet)), 200)
+
+        before = ratelimit.metrics.snapshot()["rate_limited"]
+        asyncio.run(scenario())
+        self.assertEqual(ratelimit.metrics.snapshot()["rate_limited"] - before, 5)
+
+    def test_exempt_paths_skip_admission(self):
+        middleware = ratelimit.AdmissionMiddleware(_ok_app, store=ratelimit.InMemoryBucketStore(), max_concurrent=0)
+        self.assertEqual(asyncio.run(_call(middleware, _scope(path="/events"))), 200)
+
+    def test_saturated_pool_sheds_load(self):
+        release = None
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await _ok_app(scope, receive, send)
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            middleware = ratelimit.AdmissionMiddleware(
+                slow_app, store=ratelimit.InMemoryBucketStore(), max_concurrent=2, queue_timeout=0.05,
+            )
+            tokens = [security.create_access_token(f"user-{n}") for n in range(3)]
+            holders = [asyncio.create_task(_call(middleware, _scope(t))) for t in tokens[:2]]
+            await asyncio.sleep(0.01)
+            self.assertEqual(await _call(middleware, _scope(tokens[2])), 503)
+            release.set()
+            self.assertEqual(await asyncio.gather(*holders), [200, 200])
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
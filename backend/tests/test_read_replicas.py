@@ -0,0 +1,121 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import app.db as db_module
+from app.db import Base, ReplicaRouter, get_session, read_session
+import app.crud as crud
+import app.main as main
+import app.schemas as schemas
+
+
+class ReadReplicaRoutingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.primary = create_engine(f"sqlite:///{self.tmp.name}/primary.db", future=True)
+        self.replica = create_engine(f"sqlite:///{self.tmp.name}/replica.db", future=True)
+        for bind in (self.primary, self.replica):
+            Base.metadata.create_all(bind=bind)
+        self.SessionLocal = sessionmaker(bind=self.primary, expire_on_commit=False, future=True)
+        self.router = ReplicaRouter([self.replica], sticky_seconds=60, retry_seconds=60)
+        # Route commits made in these tests to this router instead of the app-wide one
+        self._global_router = db_module.router
+        db_module.router = self.router
+        with self.SessionLocal() as db:
+            self.account, _ = crud.create_account(
+                db,
+                schemas.AccountCreate(name="Replica Co", owner_email="replica@example.com", owner_password="secret123"),
+            )
+        # Account bootstrap doesn't go through the change log, so nothing is sticky yet
+        self.router._last_write.clear()
+
+    def tearDown(self) -> None:
+        db_module.router = self._global_router
+        self.primary.dispose()
+        self.replica.dispose()
+        self.tmp.cleanup()
+
+    def _bind_for_read(self):
+        gen = read_session(self.account.id, self.router, self.SessionLocal)
+        db = next(gen)
+        bind = db.get_bind()
+        gen.close()
+        return bind
+
+    def test_reads_go_to_replica(self):
+        self.assertIs(self._bind_for_read(), self.replica)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        with self.SessionLocal() as db:
+            crud.create_tote(db, schemas.ToteCreate(name="Fresh"), self.account.id)
+        self.assertIs(self._bind_for_read(), self.primary)
+        self.router.sticky_seconds = 0
+        self.assertIs(self._bind_for_read(), self.replica)
+
+    def test_rolled_back_write_is_not_sticky(self):
+        with self.SessionLocal() as db:
+            crud._record_changes(db, self.account.id, "tote", ["draft"])
+            db.rollback()
+        self.assertIs(self._bind_for_read(), self.replica)
+
+    def test_unreachable_replica_fails_over_to_primary(self):
+        broken = create_engine(f"sqlite:///{self.tmp.name}/missing/dir/replica.db", future=True)
+        router = ReplicaRouter([broken], retry_seconds=60)
+        gen = read_session(self.account.id, router, self.SessionLocal)
+        self.assertIs(next(gen).get_bind(), self.primary)
+        gen.close()
+        self.assertIsNone(router.replica_for(self.account.id))
+        broken.dispose()
+
+    def test_primary_reads_use_the_given_session(self):
+        with self.SessionLocal() as primary:
+            gen = read_session(self.account.id, ReplicaRouter([]), self.SessionLocal, primary=primary)
+            self.assertIs(next(gen), primary)
+            gen.close()
+
+
+class ReadRouteOverrideTests(unittest.TestCase):
+    def test_read_routes_follow_the_get_session_override(self):
+        engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}, future=True,
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+
+        def session_override():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[get_session] = session_override
+        try:
+            with SessionLocal() as db:
+                account, _ = crud.create_account(
+                    db, schemas.AccountCreate(name="Reads Co", owner_email="reads@example.com", owner_password="secret123"),
+                )
+                crud.create_tote(db, schemas.ToteCreate(name="Only here"), account.id)
+            client = TestClient(main.app)
+            token = client.post(
+                "/auth/token", data={"username": "reads@example.com", "password": "secret123"},
+            ).json()["access_token"]
+            totes = client.get("/totes", headers={"Authorization": f"Bearer {token}"}).json()
+            self.assertEqual([tote["name"] for tote in totes], ["Only here"])
+        finally:
+            main.app.dependency_overrides.pop(get_session, None)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.image_store as image_store
+import app.models as models
+import app.purge as purge
+import app.schemas as schemas
+
+
+class SoftDeleteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.media = Path(tempfile.mkdtemp())
+        self._media_dir, image_store.MEDIA_DIR = image_store.MEDIA_DIR, self.media
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)()
+        self.account, self.owner = crud.create_account(
+            self.db, schemas.AccountCreate(name="Trash Co", owner_email="t@example.com", owner_password="secret123"),
+        )
+        aid = self.account.id
+        self.shelf = crud.create_location(self.db, schemas.LocationCreate(name="Shelf"), aid)
+        self.pallet = crud.create_tote(self.db, schemas.ToteCreate(name="Pallet", location_id=self.shelf.id), aid)
+        self.crate = crud.create_tote(self.db, schemas.ToteCreate(name="Crate", parent_tote_id=self.pallet.id), aid)
+        self.box = crud.create_tote(self.db, schemas.ToteCreate(name="Box", parent_tote_id=self.crate.id), aid)
+        image = self.media / "bolt.jpg"
+        image.write_bytes(b"jpeg")
+        self.items = [
+            crud.add_item(self.db, aid, schemas.ItemCreate(name=f"Bolt {n}"), tote_id=self.crate.id,
+                          image_path=str(image) if n == 0 else None)
+            for n in range(5)
+        ]
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+        image_store.MEDIA_DIR = self._media_dir
+        shutil.rmtree(self.media)
+
+    def _all_rows(self, model):
+        return self.db.execute(select(model.id).execution_options(include_deleted=True)).scalars().all()
+
+    def test_deleted_tote_and_items_are_hidden_until_purged(self):
+        deletion = crud.delete_tote(self.db, self.crate)
+        aid = self.account.id
+        self.assertIsNone(crud.get_tote(self.db, self.crate.id, aid))
+        self.assertEqual(crud.list_items(self.db, aid), [])
+        self.assertEqual(crud.get_statistics(self.db, aid)["items_count"], 0)
+        self.assertIsNone(crud.checkout_item(self.db, self.items[1].id, self.owner))
+        # Still stored, and the nested box has moved up as before
+        self.assertEqual(len(self._all_rows(models.Item)), 5)
+        box = crud.get_tote(self.db, self.box.id, aid)
+        self.assertEqual((box.parent_tote_id, box.path), (self.pallet.id, f"/{self.pallet.id}/{self.box.id}/"))
+        self.assertEqual(crud.get_deletion(self.db, aid, "tote", self.crate.id).id, deletion.id)
+
+    def test_restore_brings_back_tote_with_its_items(self):
+        crud.delete_tote(self.db, self.crate)
+        crud.delete_tote(self.db, self.pallet)
+        deletion = crud.get_deletion(self.db, self.account.id, "tote", self.crate.id)
+        crate = crud.restore_deletion(self.db, deletion)
+        # Its parent is gone, so it comes back at the top level, keeping the location it had
+        self.assertEqual((crate.parent_tote_id, crate.path, crate.location_id), (None, f"/{crate.id}/", self.shelf.id))
+        self.assertEqual(len(crud.list_items_in_tote(self.db, crate.id, self.account.id)), 5)
+        self.assertIsNone(crud.get_deletion(self.db, self.account.id, "tote", self.crate.id))
+        _, changes = crud.get_changes_since(self.db, self.account.id, 0)
+        self.assertEqual(changes["tote"][crate.id], crud.CHANGE_UPSERT)
+
+    def test_restore_window_expires(self):
+        deletion = crud.delete_item(self.db, self.items[0])
+        deletion.deleted_at -= crud.DELETE_RETENTION + timedelta(seconds=1)
+        self.db.commit()
+        self.assertIsNone(crud.get_deletion(self.db, self.account.id, "item", self.items[0].id))
+
+    def test_purge_removes_rows_and_images_in_batches(self):
+        crud.delete_item(self.db, self.items[4])
+        deletion = crud.delete_tote(self.db, self.crate)
+        commits = []
+        listener = commits.append
+        event.listen(self.db, "after_commit", listener)
+        try:
+            report = crud.purge_deletions(self.db, datetime.utcnow() + timedelta(seconds=1), batch_size=2)
+        finally:
+            event.remove(self.db, "after_commit", listener)
+        self.assertEqual(report, {"purged_deletions": 2, "purged_rows": 6})
+        # One commit per batch of items plus one to finish each deletion:
+        # the separately deleted item, then the tote's 4 items two at a time
+        self.assertEqual(len(commits), (1 + 1) + (2 + 1))
+        self.assertEqual(self._all_rows(models.Item), [])
+        self.assertEqual(sorted(self._all_rows(models.Tote)), sorted([self.pallet.id, self.box.id]))
+        self.assertEqual(self.db.query(models.ItemTrigram).count(), 0)
+        self.assertEqual(list(self.media.glob("*.jpg")), [])
+        self.assertIsNone(crud.get_deletion(self.db, self.account.id, "tote", deletion.entity_id))
+
+    def test_purge_clears_references_from_other_deletions(self):
+        crud.delete_item(self.db, self.items[0])
+        crud.delete_tote(self.db, self.crate)
+        crud.delete_location(self.db, self.shelf)
+        tote_deletion = crud.get_deletion(self.db, self.account.id, "tote", self.crate.id)
+        crud.purge_deletion(self.db, tote_deletion)
+        item = crud.restore_deletion(self.db, crud.get_deletion(self.db, self.account.id, "item", self.items[0].id))
+        self.assertIsNone(item.tote_id)
+
+    def test_worker_purges_only_expired_deletions(self):
+        crud.delete_tote(self.db, self.crate)
+        self.assertEqual(purge.purge_expired(self.db), {"purged_deletions": 0, "purged_rows": 0})
+        later = datetime.utcnow() + crud.DELETE_RETENTION + timedelta(seconds=1)
+        self.assertEqual(purge.purge_expired(self.db, now=later), {"purged_deletions": 1, "purged_rows": 6})
+
+    def test_account_purge_leaves_other_accounts_alone(self):
+        other, _ = crud.create_account(
+            self.db, schemas.AccountCreate(name="Other Co", owner_email="o@example.com", owner_password="secret123"),
+        )
+        theirs = crud.create_tote(self.db, schemas.ToteCreate(name="Theirs"), other.id)
+        crud.delete_tote(self.db, theirs)
+        crud.delete_tote(self.db, self.crate)
+        later = datetime.utcnow() + crud.DELETE_RETENTION + timedelta(seconds=1)
+        report = purge.purge_expired(self.db, now=later, account_id=self.account.id)
+        self.assertEqual(report, {"purged_deletions": 1, "purged_rows": 6})
+        self.assertIsNotNone(crud.get_deletion(self.db, other.id, "tote", theirs.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.startup import startup_lock
+
+# Wall-clock budget for importing the app in a fresh interpreter
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0"))
+DEFERRED_MODULES = ["PIL", "passlib", "jose", "bcrypt", "cryptography"]
+
+COLD_IMPORT = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+
+class StartupLockTests(unittest.TestCase):
+    def test_sqlite_lock_serialises_concurrent_startups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{tmp}/boot.db")
+            active, overlaps = [], []
+
+            def boot():
+                with startup_lock(engine):
+                    active.append(1)
+                    if len(active) > 1:
+                        overlaps.append(len(active))
+                    time.sleep(0.05)
+                    active.pop()
+
+            threads = [threading.Thread(target=boot) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            engine.dispose()
+            self.assertEqual(overlaps, [])
+
+
+class ColdStartTests(unittest.TestCase):
+    def test_app_import_is_within_budget_and_side_effect_free(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = subprocess.run(
+                [sys.executable, "-c", COLD_IMPORT, str(PROJECT_ROOT), json.dumps(DEFERRED_MODULES)],
+                cwd=tmp,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            # Importing must not touch the filesystem: no database file, no media dir
+            self.assertEqual(os.listdir(tmp), [])
+        self.assertEqual(result["loaded"], [])
+        self.assertLess(result["elapsed"], STARTUP_BUDGET_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+
+class DeltaSyncTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        with self.SessionLocal() as db:
+            self.account, self.owner = crud.create_account(
+                db,
+                schemas.AccountCreate(
+                    name="Sync Co",
+                    owner_email="sync@example.com",
+                    owner_password="secret123",
+                ),
+            )
+
+    def tearDown(self) -> None:
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def test_changes_since_version(self):
+        with self.SessionLocal() as db:
+            tote = crud.create_tote(db, schemas.ToteCreate(name="Bin"), self.account.id)
+            item = crud.add_item(db, self.account.id, schemas.ItemCreate(name="Drill"), tote_id=tote.id)
+            version, changes = crud.get_changes_since(db, self.account.id, 0)
+            self.assertEqual(version, 2)
+            self.assertEqual(changes, {"tote": {tote.id: "upsert"}, "item": {item.id: "upsert"}})
+
+            crud.checkout_item(db, item.id, self.owner)
+            crud.delete_tote(db, tote)
+            version2, changes = crud.get_changes_since(db, self.account.id, version)
+            self.assertGreater(version2, version)
+            # Latest op wins per entity
+            self.assertEqual(changes, {"tote": {tote.id: "delete"}, "item": {item.id: "delete"}})
+
+            self.assertEqual(crud.get_changes_since(db, self.account.id, version2), (version2, {}))
+
+    def test_future_version_requires_full_resync(self):
+        with self.SessionLocal() as db:
+            crud.create_location(db, schemas.LocationCreate(name="Garage"), self.account.id)
+            self.assertIsNone(crud.get_changes_since(db, self.account.id, 99))
+
+    def test_sequences_are_per_account(self):
+        with self.SessionLocal() as db:
+            other, _ = crud.create_account(
+                db,
+                schemas.AccountCreate(
+                    name="Other Co",
+                    owner_email="other@example.com",
+                    owner_password="secret123",
+                ),
+            )
+            crud.create_tote(db, schemas.ToteCreate(name="Mine"), self.account.id)
+            crud.create_tote(db, schemas.ToteCreate(name="Theirs"), other.id)
+            version, changes = crud.get_changes_since(db, other.id, 0)
+            self.assertEqual(version, 1)
+            self.assertEqual(len(changes["tote"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
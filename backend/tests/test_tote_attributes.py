@@ -0,0 +1,79 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+
+class ToteAttributeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Attr Co", owner_email="attr@example.com", owner_password="secret123"),
+        )
+        self.garage = crud.create_location(self.db, schemas.LocationCreate(name="Garage"), self.account.id)
+        self.big_red = self._tote("Big red", {"capacity_gal": 27, "color": "red"}, self.garage.id)
+        self.small_red = self._tote("Small red", {"capacity_gal": "12", "color": "red"}, self.garage.id)
+        self.big_blue = self._tote("Big blue", {"capacity_gal": 27.0, "color": "blue"}, self.garage.id)
+        self.attic_red = self._tote("Attic red", {"capacity_gal": 27, "color": "red"})
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _tote(self, name, attributes, location_id=None):
+        return crud.create_tote(
+            self.db, schemas.ToteCreate(name=name, attributes=attributes, location_id=location_id), self.account.id,
+        )
+
+    def _names(self, *exprs, location_id=None):
+        filters = [crud.parse_attribute_filter(e) for e in exprs]
+        totes = crud.list_totes(self.db, self.account.id, attribute_filters=filters, location_id=location_id)
+        return {t.name for t in totes}
+
+    def test_equality_filters_combine_with_location(self):
+        self.assertEqual(self._names("capacity_gal:27", "color:red", location_id=self.garage.id), {"Big red"})
+        self.assertEqual(self._names("capacity_gal:27.0"), {"Big red", "Big blue", "Attic red"})
+
+    def test_numeric_range_filter(self):
+        self.assertEqual(self._names("capacity_gal<20"), {"Small red"})
+        self.assertEqual(self._names("capacity_gal>=27", "color:blue"), {"Big blue"})
+
+    def test_invalid_filters_rejected(self):
+        for expr in ("color", "capacity_gal>=big"):
+            with self.assertRaises(ValueError):
+                crud.parse_attribute_filter(expr)
+
+    def test_update_replaces_attribute_set(self):
+        crud.update_tote(self.db, self.big_red, schemas.ToteUpdate(attributes={"color": "green"}))
+        self.db.expire_all()
+        self.assertEqual(crud.get_tote(self.db, self.big_red.id, self.account.id).attributes, {"color": "green"})
+        self.assertEqual(self._names("color:green"), {"Big red"})
+        self.assertNotIn("Big red", self._names("capacity_gal:27"))
+
+    def test_attribute_filter_uses_index(self):
+        Attr = crud.models.ToteAttribute
+        stmt = crud.select(Attr.tote_id).where(
+            Attr.account_id == self.account.id, Attr.key == "color", crud._attribute_condition(":", "red"),
+        )
+        sql = str(stmt.compile(self.engine, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(str(row[-1]) for row in self.db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+        self.assertIn("ix_tote_attributes_value", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from app.db import Base
+import app.crud as crud
+import app.schemas as schemas
+
+
+class ToteNestingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = self.SessionLocal()
+        self.account, _ = crud.create_account(
+            self.db,
+            schemas.AccountCreate(name="Pallet Co", owner_email="pallet@example.com", owner_password="secret123"),
+        )
+        self.dock = crud.create_location(self.db, schemas.LocationCreate(name="Dock"), self.account.id)
+        self.rack = crud.create_location(self.db, schemas.LocationCreate(name="Rack"), self.account.id)
+        self.pallet = self._tote("Pallet", location_id=self.dock.id)
+        self.crate = self._tote("Crate", parent=self.pallet)
+        self.box = self._tote("Box", parent=self.crate)
+        self.loose = self._tote("Loose", location_id=self.rack.id)
+        self.screw = crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Screw"), tote_id=self.box.id)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Drill"), tote_id=self.crate.id)
+        crud.add_item(self.db, self.account.id, schemas.ItemCreate(name="Tape"), tote_id=self.loose.id)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def _tote(self, name, parent=None, location_id=None):
+        return crud.create_tote(
+            self.db,
+            schemas.ToteCreate(name=name, parent_tote_id=parent.id if parent else None, location_id=location_id),
+            self.account.id,
+        )
+
+    def test_nested_tote_inherits_location(self):
+        self.assertEqual(self.box.path, f"/{self.pallet.id}/{self.crate.id}/{self.box.id}/")
+        self.assertEqual(self.box.location_id, self.dock.id)
+
+    def test_contents_are_transitive(self):
+        totes, items = crud.list_tote_contents(self.db, self.pallet)
+        self.assertEqual([t.name for t in totes], ["Crate", "Box"])
+        self.assertEqual({i.name for i in items}, {"Screw", "Drill"})
+
+    def test_item_path_is_outermost_first(self):
+        path = crud.get_item_tote_path(self.db, self.screw)
+        self.assertEqual([t.name for t in path], ["Pallet", "Crate", "Box"])
+
+    def test_subtree_move_is_set_based(self):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            crud.update_tote(self.db, self.crate, schemas.ToteUpdate(parent_tote_id=self.loose.id))
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(sum(s.lstrip().upper().startswith("UPDATE TOTES") for s in statements), 1)
+        self.assertEqual((self.crate.parent_tote_id, self.crate.location_id), (self.loose.id, self.rack.id))
+        self.db.refresh(self.box)
+        self.assertEqual(self.box.path, f"/{self.loose.id}/{self.crate.id}/{self.box.id}/")
+        self.assertEqual(self.box.location_id, self.rack.id)
+        self.assertEqual([t.name for t in crud.get_item_tote_path(self.db, self.screw)], ["Loose", "Crate", "Box"])
+
+    def test_nesting_under_unlocated_tote_clears_location(self):
+        shelf = self._tote("Shelf")
+        crud.update_tote(self.db, self.crate, schemas.ToteUpdate(parent_tote_id=shelf.id))
+        self.assertIsNone(self.crate.location_id)
+        self.db.refresh(self.box)
+        self.assertIsNone(self.box.location_id)
+
+    def test_bulk_move_is_one_update(self):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            results = crud.move_totes(
+                self.db, self.account.id, [self.pallet.id, self.loose.id, self.crate.id, "missing"], self.rack.id,
+            )
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(
+            results,
+            {self.pallet.id: "moved", self.loose.id: "already_there", self.crate.id: "nested", "missing": "not_found"},
+        )
+        self.assertEqual(sum(s.lstrip().upper().startswith("UPDATE TOTES") for s in statements), 1)
+        self.db.refresh(self.box)
+        self.assertEqual(self.box.location_id, self.rack.id)
+        with self.assertRaises(ValueError):
+            crud.move_totes(self.db, self.account.id, [self.pallet.id], "missing")
+
+    def test_cannot_nest_inside_itself(self):
+        with self.assertRaises(ValueError):
+            crud.update_tote(self.db, self.pallet, schemas.ToteUpdate(parent_tote_id=self.box.id))
+
+    def test_delete_moves_nested_totes_up(self):
+        crud.delete_tote(self.db, self.crate)
+        self.db.refresh(self.box)
+        self.assertEqual(self.box.parent_tote_id, self.pallet.id)
+        self.assertEqual(self.box.path, f"/{self.pallet.id}/{self.box.id}/")
+
+
+if __name__ == "__main__":
+    unittest.main()
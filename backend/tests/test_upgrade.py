@@ -0,0 +1,102 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, UniqueConstraint, create_engine,
+    insert, inspect,
+)
+from sqlalchemy.orm import sessionmaker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import app.crud as crud
+import app.models as models
+import app.schemas as schemas
+import app.upgrade as upgrade
+
+# The schema as the first release created it
+old = MetaData()
+Table("accounts", old, Column("id", String, primary_key=True), Column("name", String, nullable=False, unique=True),
+      Column("created_at", DateTime, nullable=False), Column("updated_at", DateTime, nullable=False))
+Table("locations", old, Column("id", String, primary_key=True),
+      Column("account_id", String, ForeignKey("accounts.id"), nullable=False),
+      Column("name", String, nullable=False), Column("description", Text))
+Table("totes", old, Column("id", String, primary_key=True),
+      Column("account_id", String, ForeignKey("accounts.id"), nullable=False), Column("name", String),
+      Column("location", String), Column("location_id", String, ForeignKey("locations.id")),
+      Column("metadata_json", Text), Column("description", Text))
+Table("items", old, Column("id", String, primary_key=True), Column("tote_id", String, ForeignKey("totes.id")),
+      Column("account_id", String, ForeignKey("accounts.id"), nullable=False), Column("name", String, nullable=False),
+      Column("description", Text), Column("quantity", Integer, nullable=False), Column("image_path", String))
+Table("users", old, Column("id", String, primary_key=True),
+      Column("account_id", String, ForeignKey("accounts.id"), nullable=False),
+      Column("email", String, nullable=False), Column("full_name", String),
+      Column("is_active", Boolean, nullable=False), Column("is_superuser", Boolean, nullable=False),
+      Column("hashed_password", String, nullable=False), Column("reset_token_hash", String),
+      Column("reset_token_expires", DateTime), Column("created_at", DateTime, nullable=False),
+      Column("updated_at", DateTime, nullable=False), UniqueConstraint("email", name="uq_users_email"))
+Table("checked_out_items", old, Column("id", String, primary_key=True),
+      Column("item_id", String, ForeignKey("items.id"), nullable=False),
+      Column("user_id", String, ForeignKey("users.id"), nullable=False),
+      Column("checked_out_at", DateTime, nullable=False),
+      UniqueConstraint("item_id", name="uq_checked_out_items_item_id"))
+
+
+class UpgradeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", future=True)
+        old.create_all(bind=self.engine)
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(insert(old.tables["accounts"]).values(id="a1", name="Old Co", created_at=now, updated_at=now))
+            conn.execute(insert(old.tables["locations"]).values(id="l1", account_id="a1", name="Shed"))
+            conn.execute(insert(old.tables["totes"]).values(id="t1", account_id="a1", name="Bin", location_id="l1"))
+            conn.execute(insert(old.tables["items"]), [
+                {"id": "i1", "tote_id": "t1", "account_id": "a1", "name": "Drill", "quantity": 1},
+                {"id": "i2", "tote_id": "t1", "account_id": "a1", "name": "Saw", "quantity": 1},
+            ])
+            conn.execute(insert(old.tables["users"]).values(
+                id="u1", account_id="a1", email="old@example.com", is_active=True, is_superuser=True,
+                hashed_password="x", created_at=now, updated_at=now,
+            ))
+            conn.execute(insert(old.tables["checked_out_items"]).values(
+                id="c1", item_id="i1", user_id="u1", checked_out_at=now,
+            ))
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def test_old_database_is_brought_up_to_date(self):
+        self.assertIn("accounts.change_seq", upgrade.missing_columns(self.engine))
+        report = upgrade.upgrade(self.engine)
+        self.assertEqual(upgrade.missing_columns(self.engine), [])
+        self.assertIn("deletions", report["created_tables"])
+        self.assertEqual(report["backfilled"], {"locations.path": 1, "totes.path": 1, "checked_out_items.account_id": 1})
+        self.assertIn("ix_items_account_tote", report["created_indexes"])
+
+        with self.SessionLocal() as db:
+            tote = crud.get_tote(db, "t1", "a1")
+            self.assertEqual(tote.path, "/t1/")
+            self.assertEqual({i.name for i in crud.list_tote_contents(db, tote)[1]}, {"Drill", "Saw"})
+            self.assertEqual([c.account_id for c in crud.get_checked_out_items(db, "a1")], ["a1"])
+            user = db.get(models.User, "u1")
+            self.assertEqual(crud.checkout_items(db, ["i1", "i2"], user), {"i1": "already_checked_out", "i2": "checked_out"})
+            crud.create_tote(db, schemas.ToteCreate(name="Crate", parent_tote_id="t1"), "a1")
+            self.assertEqual(db.get(models.Account, "a1").change_seq, 2)
+
+    def test_running_it_again_changes_nothing(self):
+        upgrade.upgrade(self.engine)
+        report = upgrade.upgrade(self.engine)
+        self.assertEqual(report, {"created_tables": [], "added_columns": [], "backfilled": {}, "created_indexes": [],
+                                  "constraints": []})
+        unique = {i["name"] for i in inspect(self.engine).get_indexes("checked_out_items") if i["unique"]}
+        self.assertIn(upgrade.CHECKOUT_CONSTRAINT, unique)
+
+
+if __name__ == "__main__":
+    unittest.main()
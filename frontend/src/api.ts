@@ -6,6 +6,20 @@ import type { Tote, Item, User, Location, CheckedOutItem, ItemWithCheckoutStatus
 const baseURL = import.meta.env.VITE_API_BASE ?? '/api'
 export const http = axios.create({ baseURL })
 
+// A 429 is rejected before the request is handled, so it is always safe to send again
+// once the server's Retry-After has passed; this keeps long CSV imports from failing partway
+const MAX_RATE_LIMIT_RETRIES = 5
+http.interceptors.response.use(undefined, async (error) => {
+    const config = error.config
+    if (error.response?.status !== 429 || !config) throw error
+    const attempt = (config._rateLimitRetries ?? 0) + 1
+    if (attempt > MAX_RATE_LIMIT_RETRIES) throw error
+    config._rateLimitRetries = attempt
+    const seconds = Number(error.response.headers['retry-after'])
+    await new Promise((resolve) => setTimeout(resolve, (seconds > 0 ? seconds : attempt) * 1000))
+    return http.request(config)
+})
+
 // Attach token helper
 export function setAuthToken(token: string | null) {
     if (token) {